@@ -0,0 +1,144 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+cache.py - Content-addressed on-disk cache for PLIP results.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import os
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+if os.name != 'nt':  # File locking not available for Windows
+    import fcntl
+
+# Own modules
+from serialization import dump_sets, load_sets, SETS_FILE
+from supplemental import atomic_write
+import config
+
+
+def thresholds(settings=None):
+    """Returns all thresholds of the settings (by default the current ones from the config module) as a sorted list
+    of (name, value) tuples."""
+    return sorted((config.Settings() if settings is None else settings).as_dict().items())
+
+
+class ResultCache():
+    """Stores reports and serialized interaction sets for each analyzed structure. Entries are addressed by a hash
+    of the input file, the thresholds, the ligand selection, the report format and the PLIP version. If the total
+    size exceeds max_size (in bytes), the least recently used entries are removed. Several processes can use the same
+    cache directory."""
+
+    def __init__(self, path, max_size=1024**3):
+        self.path = os.path.expanduser(path)
+        self.max_size = max_size
+        if not os.path.exists(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:  # Created by another process in the meantime
+                pass
+
+    def key(self, pdbpath, version, selection=None, settings=None, as_string=False, options=None):
+        """Hash of the input file content and all settings influencing the results. With as_string=True, the
+        content is given directly instead of a path. Options changing the format of the cached reports (e.g. compact
+        XML) are given as dictionary."""
+        sha = hashlib.sha1()
+        if as_string:
+            sha.update(pdbpath)
+        else:
+            with open(pdbpath, 'rb') as f:
+                for chunk in iter(lambda: f.read(2**20), b''):
+                    sha.update(chunk)
+        sha.update(repr((thresholds(settings), selection, version, sorted((options or {}).items()))))
+        return sha.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    @contextmanager
+    def locked(self):
+        """Exclusive lock on the cache directory, used for changes affecting several entries."""
+        if os.name == 'nt':
+            yield
+            return
+        with open(os.path.join(self.path, '.lock'), 'a') as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+    def load(self, key):
+        """Returns the cached DetachedComplex for the key or None. Marks the entry as recently used. Entries which
+        can't be read are treated as missing."""
+        entry = self.entry_path(key)
+        try:
+            with open(os.path.join(entry, SETS_FILE), 'rb') as f:
+                _, mol = load_sets(f)
+            os.utime(entry, None)
+        except Exception:  # Missing, evicted, incomplete or damaged entry
+            return None
+        return mol
+
+    def restore(self, key, filename, outpath):
+        """Copies a cached report file to the output folder. Returns False if the file is not in the cache."""
+        try:
+            with open(os.path.join(self.entry_path(key), filename), 'rb') as source:
+                with atomic_write(os.path.join(outpath, filename), 'wb') as target:
+                    shutil.copyfileobj(source, target)
+        except (IOError, OSError):
+            return False
+        return True
+
+    def store(self, key, mol, outpath, filenames):
+        """Adds the interaction sets of a complex and the given report files from the output folder to the cache.
+        The entry is prepared in a temporary folder and renamed, so other processes never see partial entries."""
+        tmpdir = tempfile.mkdtemp(prefix='.tmp', dir=self.path)
+        try:
+            with open(os.path.join(tmpdir, SETS_FILE), 'wb') as f:
+                dump_sets(mol, f, embed=False)  # The structure is given again when results are reused
+            for filename in filenames:
+                shutil.copyfile(os.path.join(outpath, filename), os.path.join(tmpdir, filename))
+            entry = self.entry_path(key)
+            with self.locked():
+                if not os.path.exists(os.path.dirname(entry)):
+                    os.makedirs(os.path.dirname(entry))
+                if os.path.exists(entry):  # Stored by another process, replace it with the more complete entry
+                    shutil.rmtree(entry)
+                os.rename(tmpdir, entry)
+                self.evict()
+        finally:
+            if os.path.exists(tmpdir):
+                shutil.rmtree(tmpdir)
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits into max_size. Needs to be locked."""
+        entries = []
+        for prefix in os.listdir(self.path):
+            prefixdir = os.path.join(self.path, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefixdir):
+                continue
+            for key in os.listdir(prefixdir):
+                entry = os.path.join(prefixdir, key)
+                size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, entry))
+        total = sum(size for mtime, size, entry in entries)
+        for mtime, size, entry in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
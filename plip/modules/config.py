@@ -40,4 +40,35 @@ WATER_BRIDGE_MINDIST = 2.5  # Min. distance between water oxygen and polar atom
 WATER_BRIDGE_MAXDIST = 4.0  # Max. distance between water oxygen and polar atom (Jiang et al., 2005) +0.4
 WATER_BRIDGE_OMEGA_MIN = 75  # Min. angle between acceptor, water oxygen and donor hydrogen (Jiang et al., 2005) - 5
 WATER_BRIDGE_OMEGA_MAX = 140  # Max. angle between acceptor, water oxygen and donor hydrogen (Jiang et al., 2005)
-WATER_BRIDGE_THETA_MIN = 100  # Min. angle between water oxygen, donor hydrogen and donor atom (Jiang et al., 2005)
\ No newline at end of file
+WATER_BRIDGE_THETA_MIN = 100  # Min. angle between water oxygen, donor hydrogen and donor atom (Jiang et al., 2005)
+# Names of all thresholds, in the order given above
+THRESHOLDS = ['BS_DIST', 'AROMATIC_PLANARITY', 'HYDROPH_DIST_MAX', 'HBOND_DIST_MAX', 'HBOND_DON_ANGLE_MIN',
+              'PISTACK_DIST_MAX', 'PISTACK_ANG_DEV', 'PISTACK_OFFSET_MAX', 'PICATION_DIST_MAX', 'SALTBRIDGE_DIST_MAX',
+              'HALOGEN_DIST_MAX', 'HALOGEN_ACC_ANGLE', 'HALOGEN_DON_ANGLE', 'HALOGEN_ANGLE_DEV', 'WATER_BRIDGE_MINDIST',
+              'WATER_BRIDGE_MAXDIST', 'WATER_BRIDGE_OMEGA_MIN', 'WATER_BRIDGE_OMEGA_MAX', 'WATER_BRIDGE_THETA_MIN']
+
+
+class Settings():
+    """Set of thresholds for the detection of interactions. Thresholds which are not given (as keyword arguments,
+    upper or lower case) are taken from the global variables of this module at the time of creation. Several
+    settings can be used side by side in one process."""
+
+    def __init__(self, **thresholds):
+        thresholds = {name.upper(): value for name, value in thresholds.items()}
+        unknown = set(thresholds) - set(THRESHOLDS)
+        if unknown:
+            raise ValueError('Unknown thresholds: %s' % ', '.join(sorted(unknown)))
+        for name in THRESHOLDS:
+            setattr(self, name, thresholds.get(name, globals()[name]))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in THRESHOLDS}
+
+    def replace(self, **thresholds):
+        """Returns a copy of the settings with some thresholds changed."""
+        changed = self.as_dict()
+        changed.update({name.upper(): value for name, value in thresholds.items()})
+        return Settings(**changed)
+
+    def __repr__(self):
+        return 'Settings(%s)' % ', '.join('%s=%r' % (name, getattr(self, name)) for name in THRESHOLDS)
@@ -0,0 +1,144 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+database.py - Store the results of many structures in an indexed SQLite database.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+
+# Own modules
+from tables import TABLES, FEATURE_TYPES, columns
+
+SQL_TYPES = {'i8': 'INTEGER', 'f8': 'REAL', '?': 'INTEGER', 'S': 'TEXT'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS structures (
+    id INTEGER PRIMARY KEY, pdbid TEXT NOT NULL, source TEXT NOT NULL, plipversion TEXT, created TEXT);
+CREATE INDEX IF NOT EXISTS structures_pdbid ON structures (pdbid);
+CREATE TABLE IF NOT EXISTS bindingsites (
+    id INTEGER PRIMARY KEY, structure_id INTEGER NOT NULL REFERENCES structures (id) ON DELETE CASCADE,
+    bsid TEXT, hetid TEXT, chain TEXT, position INTEGER, composite INTEGER, has_interactions INTEGER);
+CREATE INDEX IF NOT EXISTS bindingsites_structure ON bindingsites (structure_id);
+CREATE INDEX IF NOT EXISTS bindingsites_hetid ON bindingsites (hetid);
+CREATE TABLE IF NOT EXISTS members (
+    site_id INTEGER NOT NULL REFERENCES bindingsites (id) ON DELETE CASCADE, hetid TEXT, chain TEXT, position INTEGER);
+CREATE INDEX IF NOT EXISTS members_site ON members (site_id);
+CREATE INDEX IF NOT EXISTS members_hetid ON members (hetid);
+"""
+
+
+def interaction_columns(table):
+    """Columns of an interaction table, the PDB ID and binding site are given by the site_id."""
+    return [(name, SQL_TYPES[dtype]) for name, dtype in columns(table) if name not in ('pdbid', 'bsid')]
+
+
+def interaction_schema():
+    """Tables for all interaction types with indexes on the residues, and a view combining all types."""
+    statements, selects = [], []
+    for table in sorted(TABLES):
+        cols = ', '.join('"%s" %s' % col for col in interaction_columns(table))
+        statements.append('CREATE TABLE IF NOT EXISTS %s (site_id INTEGER NOT NULL REFERENCES bindingsites (id) '
+                          'ON DELETE CASCADE, %s);' % (table, cols))
+        statements.append('CREATE INDEX IF NOT EXISTS %s_site ON %s (site_id);' % (table, table))
+        statements.append('CREATE INDEX IF NOT EXISTS %s_residue ON %s (restype, resnr, reschain);' % (table, table))
+        selects.append("SELECT site_id, '%s' AS type, resnr, restype, reschain FROM %s" % (table, table))
+    statements.append('CREATE VIEW IF NOT EXISTS interactions AS %s;' % ' UNION ALL '.join(selects))
+    return '\n'.join(statements)
+
+
+def member_values(member):
+    """Splits a member of a binding site ('HETID-CHAIN-POSITION') into its values."""
+    hetid, chain, position = member.split('-')
+    return hetid, chain, int(position)
+
+
+def interaction_values(table, contact):
+    """Column values of an interaction given as in the JSON Lines report (see TextOutput.generate_record())."""
+    values = []
+    for feature in TABLES[table]:
+        value = contact[feature.lower()]
+        if FEATURE_TYPES[feature] == 'coo':
+            values.extend(value)
+        elif feature == 'LIG_IDX_LIST':
+            values.append(','.join(str(idx) for idx in value))
+        else:
+            values.append(value)
+    return tuple(values)
+
+
+class ResultStore():
+    """Stores structures, binding sites, ligand members and interactions in a SQLite database with one table per
+    interaction type. All rows of a structure are inserted in one transaction, replacing earlier results for the same
+    input. The database uses write-ahead logging, so several processes can write to it while others read it. Writers
+    wait up to timeout seconds for the lock."""
+
+    def __init__(self, path, timeout=600):
+        self.path = os.path.expanduser(path)
+        # Transactions are handled explicitly, see transaction()
+        self.connection = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')  # Safe with WAL, only the last commits may be lost
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        self.connection.executescript(SCHEMA + interaction_schema())
+
+    @contextmanager
+    def transaction(self):
+        """Transaction holding the write lock from the start, so concurrent writers wait instead of failing."""
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            yield cursor
+        except:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+
+    def add_structure(self, pdbid, version, records, source=None):
+        """Adds a structure with its binding sites, given as records of the JSON Lines report. Results of earlier runs
+        for the same PDB ID and input file are replaced."""
+        source = source or ''
+        rows = {table: [] for table in TABLES}
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM structures WHERE pdbid = ? AND source = ?', (pdbid, source))
+            cursor.execute('INSERT INTO structures (pdbid, source, plipversion, created) VALUES (?, ?, ?, ?)',
+                           (pdbid, source, version, time.strftime('%Y-%m-%dT%H:%M:%S')))
+            structure_id = cursor.lastrowid
+            for record in records:
+                cursor.execute('INSERT INTO bindingsites (structure_id, bsid, hetid, chain, position, composite, '
+                               'has_interactions) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               (structure_id, record['bsid'], record['hetid'], record['chain'], record['position'],
+                                record['composite'], record['has_interactions']))
+                site_id = cursor.lastrowid
+                cursor.executemany('INSERT INTO members VALUES (?, ?, ?, ?)',
+                                   [(site_id, ) + member_values(member) for member in record['members']])
+                for table in TABLES:
+                    rows[table].extend((site_id, ) + interaction_values(table, contact)
+                                       for contact in record['interactions'][table])
+            for table in TABLES:
+                if rows[table]:
+                    placeholders = ', '.join('?' * (len(interaction_columns(table)) + 1))
+                    cursor.executemany('INSERT INTO %s VALUES (%s)' % (table, placeholders), rows[table])
+        return structure_id
+
+    def query(self, sql, parameters=()):
+        """Returns all rows of a query."""
+        return self.connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        self.connection.close()
@@ -21,6 +21,7 @@ import itertools
 
 # Own modules
 from supplemental import *
+from profiling import detector
 import config
 
 
@@ -28,7 +29,8 @@ import config
 # FUNCTIONS FOR DETECTION OF SPECIFIC INTERACTIONS
 ##################################################
 
-def hydrophobic_interactions(atom_set_a, atom_set_b):
+@detector('hydrophobic', lambda atom_set_a, atom_set_b, *rest: len(atom_set_a.atoms) * len(atom_set_b.atoms))
+def hydrophobic_interactions(atom_set_a, atom_set_b, settings):
     """Detection of hydrophobic pliprofiler between atom_set_a (binding site) and atom_set_b (ligand).
     Definition: All pairs of qualified carbon atoms within a distance of HYDROPH_DIST_MAX
     """
@@ -36,14 +38,15 @@ def hydrophobic_interactions(atom_set_a, atom_set_b):
     pairings = []
     for a, b in itertools.product(atom_set_a.atoms, atom_set_b.atoms):
         e = euclidean3d(a.coords, b.coords)
-        if e < config.HYDROPH_DIST_MAX:
+        if e < settings.HYDROPH_DIST_MAX:
             contact = data(bsatom=a, ligatom=b, distance=e, restype=whichrestype(a),
                            resnr=whichresnumber(a), reschain=whichchain(a))
             pairings.append(contact)
     return pairings
 
 
-def hbonds(acceptors, donor_pairs, protisdon, typ):
+@detector('hbonds', lambda acceptors, donor_pairs, *rest: len(acceptors) * len(donor_pairs))
+def hbonds(acceptors, donor_pairs, protisdon, typ, settings):
     """Detection of hydrogen bonds between sets of acceptors and donor pairs.
     Definition: All pairs of hydrogen bond acceptor and donors with
     donor hydrogens and acceptor showing a distance within HBOND DIST MIN and HBOND DIST MAX
@@ -55,10 +58,10 @@ def hbonds(acceptors, donor_pairs, protisdon, typ):
         if typ == 'strong':  # Regular (strong) hydrogen bonds
             dist_ah = euclidean3d(acc.a.coords, don.h.coords)
             dist_ad = euclidean3d(acc.a.coords, don.d.coords)
-            if dist_ad < config.HBOND_DIST_MAX:
+            if dist_ad < settings.HBOND_DIST_MAX:
                 vec1, vec2 = vector(don.h.coords, don.d.coords), vector(don.h.coords, acc.a.coords)
                 v = vecangle(vec1, vec2)
-                if v > config.HBOND_DON_ANGLE_MIN:
+                if v > settings.HBOND_DON_ANGLE_MIN:
                     restype = whichrestype(don.d) if protisdon else whichrestype(acc.a)
                     reschain = whichchain(don.d) if protisdon else whichchain(acc.a)
                     protatom = don.d.OBAtom if protisdon else acc.a.OBAtom
@@ -71,7 +74,8 @@ def hbonds(acceptors, donor_pairs, protisdon, typ):
     return pairings
 
 
-def pistacking(rings_bs, rings_lig):
+@detector('pistacking', lambda rings_bs, rings_lig, *rest: len(rings_bs) * len(rings_lig))
+def pistacking(rings_bs, rings_lig, settings):
     """Return all pi-stackings between the given aromatic ring systems in receptor and ligand."""
     data = namedtuple('pistack', 'proteinring ligandring distance angle offset type restype resnr reschain')
     pairings = []
@@ -90,12 +94,12 @@ def pistacking(rings_bs, rings_lig):
         resnr, restype, reschain = whichresnumber(r.atoms[0]), whichrestype(r.atoms[0]), whichchain(r.atoms[0])
 
         # SELECTION BY DISTANCE, ANGLE AND OFFSET
-        if d < config.PISTACK_DIST_MAX:
-            if 0 < a < config.PISTACK_ANG_DEV and offset < config.PISTACK_OFFSET_MAX:
+        if d < settings.PISTACK_DIST_MAX:
+            if 0 < a < settings.PISTACK_ANG_DEV and offset < settings.PISTACK_OFFSET_MAX:
                 contact = data(proteinring=r, ligandring=l, distance=d, angle=a, offset=offset,
                                type='P', resnr=resnr, restype=restype, reschain=reschain)
                 pairings.append(contact)
-            if 90-config.PISTACK_ANG_DEV < a < 90+config.PISTACK_ANG_DEV and offset < config.PISTACK_OFFSET_MAX:
+            if 90-settings.PISTACK_ANG_DEV < a < 90+settings.PISTACK_ANG_DEV and offset < settings.PISTACK_OFFSET_MAX:
                 contact = data(proteinring=r, ligandring=l, distance=d, angle=a, offset=offset,
                                type='T', resnr=resnr, restype=restype, reschain=reschain)
                 pairings.append(contact)
@@ -103,7 +107,8 @@ def pistacking(rings_bs, rings_lig):
     return pairings
 
 
-def pication(rings, pos_charged, protcharged):
+@detector('pication', lambda rings, pos_charged, *rest: len(rings) * len(pos_charged))
+def pication(rings, pos_charged, protcharged, settings):
     """Return all pi-Cation interaction between aromatic rings and positively charged groups.
     For tertiary and quaternary amines, check also the angle between the ring and the nitrogen.
     """
@@ -117,7 +122,7 @@ def pication(rings, pos_charged, protcharged):
                 # Project the center of charge into the ring and measure distance to ring center
                 proj = projection(ring.normal, ring.center, p.center)
                 offset = euclidean3d(proj, ring.center)
-                if d < config.PICATION_DIST_MAX and offset < config.PISTACK_OFFSET_MAX:
+                if d < settings.PICATION_DIST_MAX and offset < settings.PISTACK_OFFSET_MAX:
                     if type(p).__name__ == 'lcharge' and p.fgroup == 'tertamine':
                         # Special case here if the ligand has a tertiary amine, check an additional angle
                         # Otherwise, we might have have a pi-cation interaction 'through' the ligand
@@ -144,12 +149,13 @@ def pication(rings, pos_charged, protcharged):
     return pairings
 
 
-def saltbridge(poscenter, negcenter, protispos):
+@detector('saltbridge', lambda poscenter, negcenter, *rest: len(poscenter) * len(negcenter))
+def saltbridge(poscenter, negcenter, protispos, settings):
     """Detect all salt bridges (pliprofiler between centers of positive and negative charge)"""
     data = namedtuple('saltbridge', 'positive negative distance protispos resnr restype reschain')
     pairings = []
     for pc, nc in itertools.product(poscenter, negcenter):
-        if euclidean3d(pc.center, nc.center) < config.SALTBRIDGE_DIST_MAX:
+        if euclidean3d(pc.center, nc.center) < settings.SALTBRIDGE_DIST_MAX:
             resnr = pc.resnr if protispos else nc.resnr
             restype = pc.restype if protispos else nc.restype
             reschain = pc.reschain if protispos else nc.reschain
@@ -159,18 +165,19 @@ def saltbridge(poscenter, negcenter, protispos):
     return pairings
 
 
-def halogen(acceptor, donor):
+@detector('halogen', lambda acceptor, donor, *rest: len(acceptor) * len(donor))
+def halogen(acceptor, donor, settings):
     """Detect all halogen bonds of the type Y-O...X-C"""
     data = namedtuple('halogenbond', 'acc don distance don_angle acc_angle restype resnr reschain donortype acctype')
     pairings = []
     for acc, don in itertools.product(acceptor, donor):
         dist = euclidean3d(acc.o.coords, don.x.coords)
-        if dist < config.HALOGEN_DIST_MAX:
+        if dist < settings.HALOGEN_DIST_MAX:
             vec1, vec2 = vector(acc.o.coords, acc.y.coords), vector(acc.o.coords, don.x.coords)
             vec3, vec4 = vector(don.x.coords, acc.o.coords), vector(don.x.coords, don.c.coords)
             acc_angle, don_angle = vecangle(vec1, vec2), vecangle(vec3, vec4)
-            if config.HALOGEN_ACC_ANGLE-config.HALOGEN_ANGLE_DEV < acc_angle < config.HALOGEN_ACC_ANGLE+config.HALOGEN_ANGLE_DEV:
-                if config.HALOGEN_DON_ANGLE-config.HALOGEN_ANGLE_DEV < don_angle < config.HALOGEN_DON_ANGLE+config.HALOGEN_ANGLE_DEV:
+            if settings.HALOGEN_ACC_ANGLE-settings.HALOGEN_ANGLE_DEV < acc_angle < settings.HALOGEN_ACC_ANGLE+settings.HALOGEN_ANGLE_DEV:
+                if settings.HALOGEN_DON_ANGLE-settings.HALOGEN_ANGLE_DEV < don_angle < settings.HALOGEN_DON_ANGLE+settings.HALOGEN_ANGLE_DEV:
                     contact = data(acc=acc, don=don, distance=dist, don_angle=don_angle, acc_angle=acc_angle,
                                    restype=whichrestype(acc.o), resnr=whichresnumber(acc.o),
                                    reschain=whichchain(acc.o), donortype=don.x.OBAtom.GetType(), acctype=acc.o.type)
@@ -178,7 +185,9 @@ def halogen(acceptor, donor):
     return pairings
 
 
-def water_bridges(bs_hba, lig_hba, bs_hbd, lig_hbd, water):
+@detector('water_bridges', lambda bs_hba, lig_hba, bs_hbd, lig_hbd, water, *rest:
+          (len(bs_hba) + len(lig_hba) + len(bs_hbd) + len(lig_hbd)) * len(water))
+def water_bridges(bs_hba, lig_hba, bs_hbd, lig_hbd, water, settings):
     """Find water-bridged hydrogen bonds between ligand and protein. For now only considers bridged of first degree."""
     data = namedtuple('waterbridge', 'a atype d dtype h water distance_aw distance_dw d_angle w_angle type resnr restype reschain protisdon')
     pairings = []
@@ -188,21 +197,21 @@ def water_bridges(bs_hba, lig_hba, bs_hbd, lig_hbd, water):
     for w in water:
         for acc1 in lig_hba:
             dist = euclidean3d(acc1.a.coords, w.coords)
-            if config.WATER_BRIDGE_MINDIST <= dist <= config.WATER_BRIDGE_MAXDIST:
+            if settings.WATER_BRIDGE_MINDIST <= dist <= settings.WATER_BRIDGE_MAXDIST:
                 lig_aw.append((acc1, w, dist))
         for acc2 in bs_hba:
             dist = euclidean3d(acc2.a.coords, w.coords)
-            if config.WATER_BRIDGE_MINDIST <= dist <= config.WATER_BRIDGE_MAXDIST:
+            if settings.WATER_BRIDGE_MINDIST <= dist <= settings.WATER_BRIDGE_MAXDIST:
                 prot_aw.append((acc2, w, dist))
         for don1 in lig_hbd:
             dist = euclidean3d(don1.d.coords, w.coords)
             d_angle = vecangle(vector(don1.h.coords, don1.d.coords), vector(don1.h.coords, w.coords))
-            if config.WATER_BRIDGE_MINDIST <= dist <= config.WATER_BRIDGE_MAXDIST and d_angle > config.WATER_BRIDGE_THETA_MIN:
+            if settings.WATER_BRIDGE_MINDIST <= dist <= settings.WATER_BRIDGE_MAXDIST and d_angle > settings.WATER_BRIDGE_THETA_MIN:
                 lig_dw.append((don1, w, dist, d_angle))
         for don2 in bs_hbd:
             dist = euclidean3d(don2.d.coords, w.coords)
             d_angle = vecangle(vector(don2.h.coords, don2.d.coords), vector(don2.h.coords, w.coords))
-            if config.WATER_BRIDGE_MINDIST <= dist <= config.WATER_BRIDGE_MAXDIST and d_angle > config.WATER_BRIDGE_THETA_MIN:
+            if settings.WATER_BRIDGE_MINDIST <= dist <= settings.WATER_BRIDGE_MAXDIST and d_angle > settings.WATER_BRIDGE_THETA_MIN:
                 prot_hw.append((don2, w, dist, d_angle))
 
     for l, p in itertools.product(lig_aw, prot_hw):
@@ -210,7 +219,7 @@ def water_bridges(bs_hba, lig_hba, bs_hbd, lig_hbd, water):
         don, wd, distance_dw, d_angle = p
         if wl == wd:  # Same water molecule and angle within omega
             w_angle = vecangle(vector(acc.a.coords, wl.coords), vector(wl.coords, don.h.coords))
-            if config.WATER_BRIDGE_OMEGA_MIN < w_angle < config.WATER_BRIDGE_OMEGA_MAX:
+            if settings.WATER_BRIDGE_OMEGA_MIN < w_angle < settings.WATER_BRIDGE_OMEGA_MAX:
                 contact = data(a=acc.a, atype=acc.a.type, d=don.d, dtype=don.d.type, h=don.h, water=wl,
                                distance_aw=distance_aw, distance_dw=distance_dw,
                                d_angle=d_angle, w_angle=w_angle, type='first_deg', resnr=whichresnumber(don.d),
@@ -221,7 +230,7 @@ def water_bridges(bs_hba, lig_hba, bs_hbd, lig_hbd, water):
         don, wd, distance_dw, d_angle = l
         if wl == wd:  # Same water molecule and angle within omega
             w_angle = vecangle(vector(acc.a.coords, wl.coords), vector(wl.coords, don.h.coords))
-            if config.WATER_BRIDGE_OMEGA_MIN < w_angle < config.WATER_BRIDGE_OMEGA_MAX:
+            if settings.WATER_BRIDGE_OMEGA_MIN < w_angle < settings.WATER_BRIDGE_OMEGA_MAX:
                 contact = data(a=acc.a, atype=acc.a.type, d=don.d, dtype=don.d.type, h=don.h, water=wl,
                                distance_aw=distance_aw, distance_dw=distance_dw, d_angle=d_angle, w_angle=w_angle,
                                type='first_deg', resnr=whichresnumber(acc.a),
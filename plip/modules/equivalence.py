@@ -0,0 +1,213 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+equivalence.py - Check that alternative (e.g. optimized) engines detect exactly the same interactions.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import random
+import pickle
+import importlib
+from cStringIO import StringIO
+from collections import namedtuple, Counter
+
+# Own modules
+from preparation import PDBComplex
+from serialization import detach, dump_sets, load_sets, DetachedComplex, AtomRecord, DetachedTuple, INTERACTION_LISTS
+import config
+
+# External libraries
+import numpy as np
+
+# Default tolerances for floating point values, in Angstrom for distances and coordinates and degree for angles
+DISTANCE_TOLERANCE = 1e-4
+ANGLE_TOLERANCE = 1e-3
+
+# One difference between reference and candidate. Site is None for differences of the whole structure.
+difference = namedtuple('difference', 'site kind detail')
+
+###########
+# Engines #
+###########
+# An engine takes a structure as string in PDB or mmCIF format and settings, and returns an analyzed complex
+# (PDBComplex or DetachedComplex).
+
+
+def reference_engine(pdbstring, settings=None):
+    """Sequential analysis as done by default."""
+    mol = PDBComplex(settings)
+    mol.load_pdb(pdbstring, as_string=True)
+    return mol
+
+
+def parallel_engine(pdbstring, settings=None):
+    """Binding sites analyzed by forked worker processes."""
+    mol = PDBComplex(settings)
+    mol.load_pdb(pdbstring, maxthreads=4, as_string=True)
+    return mol
+
+
+def pickled_engine(pdbstring, settings=None):
+    """Results restored from the pickled detached complex, as transferred from worker processes."""
+    return pickle.loads(pickle.dumps(DetachedComplex(reference_engine(pdbstring, settings)), pickle.HIGHEST_PROTOCOL))
+
+
+def saved_engine(pdbstring, settings=None):
+    """Results restored from saved interaction sets, as done by the result cache and for --render."""
+    f = StringIO()
+    dump_sets(reference_engine(pdbstring, settings), f, embed=False)
+    f.seek(0)
+    return load_sets(f)[1]
+
+
+def sweep_engine(pdbstring, settings=None):
+    """Interactions detected with looser thresholds and filtered, as done in sweep mode."""
+    from sweep import loosest, sweep
+    settings = config.Settings() if settings is None else settings
+    looser = settings.replace(**{name: getattr(settings, name) * 1.2 for name in ['HYDROPH_DIST_MAX', 'HBOND_DIST_MAX',
+                                                                               'PISTACK_DIST_MAX']})
+    mol = PDBComplex(loosest([settings, looser]))
+    mol.load_pdb(pdbstring, as_string=True)
+    return sweep(mol, [settings])[0]
+
+
+ENGINES = {'reference': reference_engine, 'parallel': parallel_engine, 'pickled': pickled_engine,
+           'saved': saved_engine, 'sweep': sweep_engine}
+
+
+def get_engine(name):
+    """Returns a built-in engine or a function given as 'module:function'."""
+    if name in ENGINES:
+        return ENGINES[name]
+    modulename, _, function = name.partition(':')
+    return getattr(importlib.import_module(modulename), function)
+
+
+#################
+# Normalization #
+#################
+
+def canonical(obj):
+    """Converts an interaction record (after detach()) into nested tuples of plain values. Atoms are represented by
+    their index only, other OpenBabel objects are gone after detach()."""
+    if isinstance(obj, AtomRecord):
+        return ('atom', obj.idx)
+    if isinstance(obj, DetachedTuple):
+        return (obj.typename, tuple((field, canonical(value)) for field, value in zip(obj.fields, obj.values)))
+    if isinstance(obj, np.ndarray):
+        return tuple(float(value) for value in obj.flat)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (list, tuple)):
+        return tuple(canonical(value) for value in obj)
+    return obj
+
+
+def identity(record):
+    """A record without its floating point values, which identifies it independently of rounding."""
+    if isinstance(record, float):
+        return '~'
+    if isinstance(record, tuple):
+        return tuple(identity(value) for value in record)
+    return record
+
+
+def compare_values(reference, candidate, field=None, distance_tol=DISTANCE_TOLERANCE, angle_tol=ANGLE_TOLERANCE):
+    """Returns a description of the first deviation between two canonical records, None if they are equivalent.
+    Floating point values of fields named *angle* are compared with the angle tolerance, all others with the
+    distance tolerance."""
+    if isinstance(reference, float) and isinstance(candidate, (float, int, long)):
+        tolerance = angle_tol if field is not None and 'angle' in field else distance_tol
+        if abs(reference - candidate) > tolerance:
+            return '%s: %r != %r' % (field, reference, candidate)
+        return None
+    if isinstance(reference, tuple) and isinstance(candidate, tuple) and len(reference) == len(candidate):
+        if len(reference) == 2 and isinstance(reference[0], str) and reference[0] == candidate[0]:
+            field = reference[0]  # (field, value) pair
+        for ref, cand in zip(reference, candidate):
+            deviation = compare_values(ref, cand, field, distance_tol, angle_tol)
+            if deviation is not None:
+                return deviation
+        return None
+    if reference != candidate:
+        return '%s: %r != %r' % (field, reference, candidate)
+    return None
+
+
+##############
+# Comparison #
+##############
+
+def compare_lists(site, kind, reference, candidate, distance_tol=DISTANCE_TOLERANCE, angle_tol=ANGLE_TOLERANCE):
+    """Compares two lists of interactions record by record, independent of their order."""
+    differences = []
+    ref = sorted((canonical(detach(r)) for r in reference), key=lambda r: repr(identity(r)))
+    cand = sorted((canonical(detach(c)) for c in candidate), key=lambda c: repr(identity(c)))
+    ref_ids = Counter(repr(identity(r)) for r in ref)
+    cand_ids = Counter(repr(identity(c)) for c in cand)
+    for record_id, number in sorted((ref_ids - cand_ids).items()):
+        differences.append(difference(site, kind, 'missing in candidate (%ix): %s' % (number, record_id)))
+    for record_id, number in sorted((cand_ids - ref_ids).items()):
+        differences.append(difference(site, kind, 'only in candidate (%ix): %s' % (number, record_id)))
+    if not differences:  # Same records, compare the floating point values
+        for r, c in zip(ref, cand):
+            deviation = compare_values(r, c, None, distance_tol, angle_tol)
+            if deviation is not None:
+                differences.append(difference(site, kind, deviation))
+    return differences
+
+
+def compare_complexes(reference, candidate, distance_tol=DISTANCE_TOLERANCE, angle_tol=ANGLE_TOLERANCE):
+    """Compares the interaction sets of two analyzed complexes and returns a list of differences."""
+    differences = []
+    ref_sites, cand_sites = set(reference.interaction_sets), set(candidate.interaction_sets)
+    for site in sorted(ref_sites - cand_sites):
+        differences.append(difference(site, 'site', 'missing in candidate'))
+    for site in sorted(cand_sites - ref_sites):
+        differences.append(difference(site, 'site', 'only in candidate'))
+    for site in sorted(ref_sites & cand_sites):
+        ref, cand = reference.interaction_sets[site], candidate.interaction_sets[site]
+        if ref.no_interactions != cand.no_interactions:
+            differences.append(difference(site, 'no_interactions', '%s != %s' % (ref.no_interactions,
+                                                                                 cand.no_interactions)))
+        for kind in INTERACTION_LISTS:
+            differences.extend(compare_lists(site, kind, getattr(ref, kind), getattr(cand, kind), distance_tol,
+                                             angle_tol))
+    return differences
+
+
+def perturb(pdbstring, magnitude, seed=0):
+    """Moves all atoms of a structure in PDB format by random offsets of up to magnitude Angstrom per axis."""
+    rng = random.Random(seed)
+    lines = []
+    for line in pdbstring.splitlines(True):
+        if line.startswith(('ATOM', 'HETATM')) and len(line) >= 54:
+            coords = [float(line[i:i+8]) + rng.uniform(-magnitude, magnitude) for i in (30, 38, 46)]
+            line = '%s%8.3f%8.3f%8.3f%s' % (line[:30], coords[0], coords[1], coords[2], line[54:])
+        lines.append(line)
+    return ''.join(lines)
+
+
+def check_equivalence(pdbstring, candidate, reference=reference_engine, settings=None, perturbations=0,
+                      magnitude=0.1, seed=0, distance_tol=DISTANCE_TOLERANCE, angle_tol=ANGLE_TOLERANCE):
+    """Runs reference and candidate engine on a structure and on randomly perturbed copies of it. Returns a
+    dictionary with the list of differences for each variant ('original', 'perturbed-1', ...)."""
+    variants = [('original', pdbstring)]
+    variants.extend(('perturbed-%i' % (n + 1), perturb(pdbstring, magnitude, seed + n)) for n in range(perturbations))
+    results = {}
+    for name, structure in variants:
+        results[name] = compare_complexes(reference(structure, settings), candidate(structure, settings),
+                                          distance_tol, angle_tol)
+    return results
@@ -0,0 +1,225 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+fetch.py - Retrieve structures from a local mirror, a download cache or the PDB server.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import os
+import socket
+import hashlib
+import httplib
+import threading
+from collections import namedtuple
+from urlparse import urlparse
+from multiprocessing.pool import ThreadPool
+
+# Own modules
+from supplemental import atomic_write
+from mmcif import is_mmcif
+
+DEFAULT_URL = 'http://www.rcsb.org/pdb'
+STATUS_BATCH_SIZE = 100  # Number of PDB IDs per status request
+
+# Result for one PDB ID. Status is 'CURRENT', 'OBSOLETE', 'UNKNOWN', 'UNAVAILABLE' (neither PDB nor mmCIF file) or
+# 'FAILED' (download failed, see error). Path is a local (possibly compressed) file with the structure if available,
+# which is read only when the structure is processed. Content holds the structure only if there is no such file.
+fetchresult = namedtuple('fetchresult', 'pdbid current status content path error')
+
+
+class FetchError(IOError):
+    """The PDB server could not be reached or answered with an error, so the status of entries is not known."""
+
+
+def file_extension(content):
+    """Returns the file extension for a structure, depending on its format."""
+    return 'cif' if is_mmcif(content) else 'pdb'
+
+
+class StructureFetcher():
+    """Looks up PDB structures in a local mirror first, then in a content-addressed download cache and finally
+    downloads missing ones. Status lookups are batched and downloads use a pool of persistent connections."""
+
+    def __init__(self, mirror=None, cache=None, base_url=DEFAULT_URL, connections=4):
+        self.mirror = os.path.expanduser(mirror) if mirror is not None else None
+        self.cache = os.path.expanduser(cache) if cache is not None else None
+        self.base_url = urlparse(base_url.rstrip('/'))
+        self.connections = connections
+        self.local = threading.local()  # One connection per thread, reused for several requests
+
+    #################
+    # Local sources #
+    #################
+
+    def mirror_paths(self, pdbid):
+        """Possible locations of an entry in the mirror, including the divided layout of the wwPDB archive."""
+        divided = os.path.join(self.mirror, pdbid[1:3])
+        names = ['%s.pdb' % pdbid, 'pdb%s.ent' % pdbid, 'pdb%s.ent.gz' % pdbid, '%s.cif' % pdbid, '%s.cif.gz' % pdbid]
+        return [os.path.join(folder, name) for folder in [self.mirror, divided] for name in names]
+
+    def from_mirror(self, pdbid):
+        """Returns the entry from the local mirror or None."""
+        if self.mirror is None:
+            return None
+        for path in self.mirror_paths(pdbid):
+            if os.path.isfile(path):  # Compressed files are used directly
+                return fetchresult(pdbid=pdbid, current=pdbid, status='CURRENT', content=None, path=path, error=None)
+        return None
+
+    def object_path(self, filename):
+        return os.path.join(self.cache, 'objects', filename[:2], filename)
+
+    def index_path(self, pdbid):
+        return os.path.join(self.cache, 'ids', pdbid)
+
+    def from_cache(self, pdbid):
+        """Returns a previously downloaded entry or None. The index maps PDB IDs to files named by the hash of their
+        content."""
+        if self.cache is None:
+            return None
+        try:
+            with open(self.index_path(pdbid)) as f:
+                current, filename = f.read().split()
+            path = self.object_path(filename)
+            if not os.path.isfile(path):
+                return None
+            return fetchresult(pdbid=pdbid, current=current, status='CURRENT' if current == pdbid else 'OBSOLETE',
+                               content=None, path=path, error=None)
+        except (IOError, ValueError):
+            return None
+
+    def write_atomic(self, path, content):
+        """Writes a file via a temporary file and rename, safe for several processes sharing the cache."""
+        folder = os.path.dirname(path)
+        if not os.path.exists(folder):
+            try:
+                os.makedirs(folder)
+            except OSError:  # Created by another process in the meantime
+                pass
+        with atomic_write(path, 'wb') as f:
+            f.write(content)
+
+    def add_to_cache(self, pdbid, current, content):
+        """Stores a download under the hash of its content and returns the path of the file."""
+        filename = '%s.%s' % (hashlib.sha1(content).hexdigest(), file_extension(content))
+        path = self.object_path(filename)
+        if not os.path.exists(path):
+            self.write_atomic(path, content)
+        for entry in set([pdbid, current]):
+            self.write_atomic(self.index_path(entry), '%s %s\n' % (current, filename))
+        return path
+
+    ############
+    # Download #
+    ############
+
+    def connection(self, fresh=False):
+        """Returns the persistent connection of the current thread."""
+        if fresh or getattr(self.local, 'connection', None) is None:
+            if self.base_url.scheme == 'https':
+                self.local.connection = httplib.HTTPSConnection(self.base_url.netloc, timeout=60)
+            else:
+                self.local.connection = httplib.HTTPConnection(self.base_url.netloc, timeout=60)
+        return self.local.connection
+
+    def get(self, resource):
+        """GET request relative to the base URL. Returns the status code and the body of the response, raises
+        FetchError if the server can't be reached."""
+        url = '%s/%s' % (self.base_url.path, resource)
+        for attempt in range(2):  # The server may have closed the connection in the meantime, try once more
+            try:
+                conn = self.connection(fresh=attempt > 0)
+                conn.request('GET', url)
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (httplib.HTTPException, socket.error) as e:
+                self.local.connection = None
+                if attempt > 0:
+                    raise FetchError('Request for %s failed: %s' % (url, e))
+
+    def check_status(self, pdbids):
+        """Returns a dictionary with status and current entry for all PDB IDs, using few requests. Raises FetchError
+        if the server fails to report the status of any of them, as they are not necessarily unknown."""
+        import lxml.etree as et
+        batches = [pdbids[i:i+STATUS_BATCH_SIZE] for i in range(0, len(pdbids), STATUS_BATCH_SIZE)]
+        pool = ThreadPool(max(1, min(self.connections, len(batches))))
+        try:
+            responses = pool.map(lambda batch: self.get('rest/idStatus?structureId=%s' % ','.join(batch)), batches)
+        finally:
+            pool.close()
+            pool.join()
+        status = {}
+        for code, body in responses:
+            if code != 200:
+                raise FetchError('Status request failed with HTTP status %i.' % code)
+            for df in et.fromstring(body).xpath('//record'):
+                pdbid = df.attrib['structureId'].lower()
+                # Status of an entry can be either 'UNKWOWN', 'OBSOLETE', or 'CURRENT'
+                current = df.attrib['replacedBy'].lower() if df.attrib['status'] == 'OBSOLETE' else pdbid
+                status[pdbid] = (df.attrib['status'], current)
+        missing = [pdbid for pdbid in pdbids if pdbid not in status]
+        if missing:
+            raise FetchError('No status reported for %s.' % ', '.join(missing))
+        return status
+
+    def download(self, pdbid, state, current):
+        """Downloads the current entry for a PDB ID. Large structures are only available in mmCIF format."""
+        code, content = self.get('files/%s.pdb' % current)
+        if code == 404:
+            code, content = self.get('files/%s.cif' % current)
+        if code == 404:
+            return fetchresult(pdbid=pdbid, current=current, status='UNAVAILABLE', content=None, path=None, error=None)
+        if code != 200:
+            raise FetchError('Download of %s failed with HTTP status %i.' % (current, code))
+        if self.cache is not None:  # Read again from the cache when processed, so downloads are not kept in memory
+            return fetchresult(pdbid=pdbid, current=current, status=state, content=None,
+                               path=self.add_to_cache(pdbid, current, content), error=None)
+        return fetchresult(pdbid=pdbid, current=current, status=state, content=content, path=None, error=None)
+
+    def try_download(self, pdbid, state, current):
+        """Same as download(), but a failed download is returned as result with status 'FAILED', so other entries are
+        not affected."""
+        try:
+            return self.download(pdbid, state, current)
+        except FetchError as e:
+            return fetchresult(pdbid=pdbid, current=current, status='FAILED', content=None, path=None, error=str(e))
+
+    def fetch(self, pdbids):
+        """Returns a dictionary with a fetchresult for each PDB ID. Only entries which are neither in the mirror
+        nor in the cache are looked up and downloaded. Raises FetchError if the status of the entries can't be looked
+        up, failed downloads are reported for each entry."""
+        pdbids = [pdbid.lower() for pdbid in pdbids]
+        results, missing = {}, []
+        for pdbid in pdbids:
+            result = self.from_mirror(pdbid) or self.from_cache(pdbid)
+            if result is not None:
+                results[pdbid] = result
+            elif pdbid not in missing:
+                missing.append(pdbid)
+        if missing:
+            status = self.check_status(missing)
+            for pdbid in missing:
+                if status[pdbid][0] == 'UNKNOWN':
+                    results[pdbid] = fetchresult(pdbid=pdbid, current=pdbid, status='UNKNOWN', content=None, path=None,
+                                                 error=None)
+            downloads = [pdbid for pdbid in missing if pdbid not in results]
+            pool = ThreadPool(max(1, min(self.connections, len(downloads))))
+            try:
+                for result in pool.map(lambda p: self.try_download(p, *status[p]), downloads):
+                    results[result.pdbid] = result
+            finally:
+                pool.close()
+                pool.join()
+        return results
@@ -0,0 +1,334 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+fingerprints.py - Interaction fingerprints as bit vectors, stored in memory-mapped files for similarity searches.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import os
+import json
+from contextlib import contextmanager
+if os.name != 'nt':  # File locking not available for Windows
+    import fcntl
+
+# Own modules
+from mmcif import original_residue
+
+# External libraries
+import numpy as np
+
+LAYOUT_VERSION = 1
+# Interaction types of the fingerprint with the attributes of PLInteraction objects holding them
+INTERACTION_TYPES = [('hydrophobic', 'hydrophobic_contacts'), ('hbond_pdon', 'hbonds_pdon'),
+                     ('hbond_ldon', 'hbonds_ldon'), ('waterbridge', 'water_bridges'),
+                     ('saltbridge_ppos', 'saltbridge_lneg'), ('saltbridge_pneg', 'saltbridge_pneg'),
+                     ('pistacking', 'pistacking'), ('pication_pcharged', 'pication_laro'),
+                     ('pication_lcharged', 'pication_paro'), ('halogen', 'halogen_bonds')]
+# Residue types of the default layout, all others are counted as OTHER
+RESIDUE_TYPES = ['ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLN', 'GLU', 'GLY', 'HIS', 'ILE', 'LEU', 'LYS', 'MET', 'PHE',
+                 'PRO', 'SER', 'THR', 'TRP', 'TYR', 'VAL', 'OTHER']
+# Number of set bits for each byte value
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class FingerprintLayout():
+    """Fixed assignment of bits to pairs of residues and interaction types. By default, residues are grouped by their
+    type, so fingerprints of any structures can be compared. For structures of the same protein, a list of
+    (residue number, chain) pairs can be given instead, interactions with other residues are not part of the
+    fingerprint then."""
+
+    def __init__(self, residues=None):
+        self.residues = [tuple(residue) for residue in residues] if residues is not None else None
+        keys = self.residues if self.residues is not None else RESIDUE_TYPES
+        self.positions = {key: i for i, key in enumerate(keys)}
+        self.nbits = len(keys) * len(INTERACTION_TYPES)
+        self.nwords = (self.nbits + 63) // 64
+
+    def bit(self, itype, interaction, residue_ids=None):
+        """Bit of an interaction of the given type (index in INTERACTION_TYPES), None for residues not in the layout.
+        Residues renamed for mmCIF input are looked up with their original IDs (see mmcif.rename_residues)."""
+        if self.residues is not None:
+            chain, resnr = original_residue(residue_ids or {}, interaction.reschain, interaction.resnr)
+            position = self.positions.get((resnr, chain))
+        else:
+            position = self.positions.get(interaction.restype, self.positions['OTHER'])
+        return None if position is None else position * len(INTERACTION_TYPES) + itype
+
+    def as_dict(self):
+        return {'version': LAYOUT_VERSION, 'types': [name for name, _ in INTERACTION_TYPES],
+                'residues': [list(residue) for residue in self.residues] if self.residues is not None else None,
+                'residue_types': RESIDUE_TYPES if self.residues is None else None}
+
+    def __eq__(self, other):
+        return self.as_dict() == other.as_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def fingerprint(pli, layout):
+    """Returns the fingerprint of the interactions of a PLInteraction object as uint64 array."""
+    bits = np.zeros(layout.nwords * 64, dtype=bool)
+    for itype, (_, attr) in enumerate(INTERACTION_TYPES):
+        for interaction in getattr(pli, attr):
+            bit = layout.bit(itype, interaction, pli.residue_ids)
+            if bit is not None:
+                bits[bit] = True
+    # Bit i is bit i % 64 of word i // 64
+    return np.packbits(bits.reshape(-1, 8)[:, ::-1]).view('<u8').astype(np.uint64)
+
+
+def popcount(words):
+    """Number of set bits in each row of a 2D uint64 array (or in a single fingerprint)."""
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    return POPCOUNT[words.view(np.uint8)].reshape(words.shape[:-1] + (-1, )).sum(axis=-1, dtype=np.int64)
+
+
+def similarity(query, fingerprints, metric='tanimoto', chunk_size=2**16):
+    """Similarity of a fingerprint to each row of a 2D array of fingerprints, e.g. a memory-mapped file. Rows are
+    processed in chunks, so memory usage doesn't depend on the number of fingerprints. Two empty fingerprints have a
+    similarity of zero."""
+    query = np.asarray(query, dtype=np.uint64)
+    a = popcount(query)
+    result = np.empty(len(fingerprints), dtype=np.float64)
+    for start in range(0, len(fingerprints), chunk_size):
+        chunk = np.asarray(fingerprints[start:start + chunk_size])
+        common = popcount(chunk & query)
+        total = a + popcount(chunk)
+        union = total - common if metric == 'tanimoto' else total
+        shared = common if metric == 'tanimoto' else 2 * common
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[start:start + len(chunk)] = np.where(union > 0, shared / union.astype(np.float64), 0.0)
+    return result
+
+
+def tanimoto(query, fingerprints, chunk_size=2**16):
+    return similarity(query, fingerprints, 'tanimoto', chunk_size)
+
+
+def dice(query, fingerprints, chunk_size=2**16):
+    return similarity(query, fingerprints, 'dice', chunk_size)
+
+
+class FingerprintStore():
+    """Append-only store of fingerprints in a folder. The fingerprints are kept in a binary file, which is read as
+    memory-mapped array, and their binding sites in a text file with one line per fingerprint. All fingerprints of a
+    store have the same layout. Several processes can add to a store."""
+
+    def __init__(self, folder, layout=None):
+        self.folder = os.path.expanduser(folder)
+        if not os.path.exists(self.folder):
+            try:
+                os.makedirs(self.folder)
+            except OSError:  # Created by another process in the meantime
+                pass
+        self.data_path = os.path.join(self.folder, 'fingerprints.bin')
+        self.ids_path = os.path.join(self.folder, 'fingerprints.ids')
+        layout_path = os.path.join(self.folder, 'layout.json')
+        with self.locked():
+            if os.path.exists(layout_path):
+                with open(layout_path) as f:
+                    stored = json.load(f)
+                if stored['version'] != LAYOUT_VERSION:
+                    raise ValueError('Fingerprints in %s have layout version %s.' % (self.folder, stored['version']))
+                stored = FingerprintLayout(stored['residues'])
+                if layout is not None and layout != stored:
+                    raise ValueError('Fingerprints in %s have a different layout.' % self.folder)
+                layout = stored
+            else:
+                layout = layout if layout is not None else FingerprintLayout()
+                with open(layout_path, 'w') as f:
+                    json.dump(layout.as_dict(), f, indent=2, sort_keys=True)
+        self.layout = layout
+
+    @contextmanager
+    def locked(self):
+        """Exclusive lock on the store, used while adding fingerprints."""
+        if os.name == 'nt':
+            yield
+            return
+        with open(os.path.join(self.folder, '.lock'), 'a') as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+    def add(self, entries):
+        """Adds fingerprints given as (pdbid, bsid, fingerprint) tuples."""
+        if not entries:
+            return
+        data = np.array([fp for _, _, fp in entries], dtype='<u8')
+        with self.locked():
+            self.repair()
+            with open(self.data_path, 'ab') as f:
+                f.write(data.tobytes())
+            with open(self.ids_path, 'a') as f:  # Written last, so only complete fingerprints have an ID
+                f.write(''.join('%s\t%s\n' % (pdbid, bsid) for pdbid, bsid, _ in entries))
+
+    def repair(self):
+        """Removes fingerprints without ID and an incomplete last ID, left by a process which ended while adding.
+        Otherwise the fingerprints added next would be assigned to the wrong IDs. Needs to be locked."""
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, 'rb+') as f:
+                content = f.read()
+                f.truncate(content.rfind('\n') + 1)
+        if os.path.exists(self.data_path):
+            size = len(self.ids()) * self.layout.nwords * 8
+            if os.path.getsize(self.data_path) > size:
+                with open(self.data_path, 'rb+') as f:
+                    f.truncate(size)
+
+    def ids(self):
+        """(pdbid, bsid) for all fingerprints"""
+        if not os.path.exists(self.ids_path):
+            return []
+        with open(self.ids_path) as f:
+            return [tuple(line.rstrip('\n').split('\t')) for line in f]
+
+    def fingerprints(self, count=None):
+        """All fingerprints (or the first count) as read-only memory-mapped 2D array."""
+        rows = len(self.ids()) if count is None else count
+        if rows == 0:
+            return np.zeros((0, self.layout.nwords), dtype=np.uint64)
+        return np.memmap(self.data_path, dtype='<u8', mode='r', shape=(rows, self.layout.nwords))
+
+    def search(self, query, metric='tanimoto', k=10):
+        """The k most similar fingerprints as list of ((pdbid, bsid), similarity)."""
+        ids = self.ids()
+        scores = similarity(query, self.fingerprints(len(ids)), metric)
+        best = np.argsort(-scores, kind='mergesort')[:k]
+        return [(ids[i], float(scores[i])) for i in best]
+
+
+def unpack(fingerprints):
+    """Bits of a 2D array of fingerprints as boolean array, bit i of each row is bit i % 64 of word i // 64."""
+    data = np.ascontiguousarray(fingerprints, dtype='<u8').view(np.uint8)
+    return np.unpackbits(data, axis=1).reshape(len(data), -1, 8)[:, :, ::-1].reshape(len(data), -1).astype(bool)
+
+
+class FingerprintIndex():
+    """Index for similarity searches in a FingerprintStore using MinHash signatures and locality-sensitive hashing.
+    Each signature is split into bands, fingerprints sharing the hash of at least one band are candidates, which are
+    then scored exactly. With b bands of r rows, pairs with a Jaccard (Tanimoto) similarity s are found with a
+    probability of 1 - (1 - s^r)^b. The band hashes are kept next to the store and extended with fingerprints added
+    later, see update(). Searches only read the store, fingerprints which are not indexed yet are hashed in memory."""
+
+    PRIME = 2**31 - 1
+
+    def __init__(self, store, bands=32, rows=4, seed=0):
+        self.store = store
+        self.params_path = os.path.join(store.folder, 'lsh.json')
+        self.keys_path = os.path.join(store.folder, 'lsh-keys.bin')
+        if os.path.exists(self.params_path):  # Parameters of an existing index are used
+            with open(self.params_path) as f:
+                params = json.load(f)
+            bands, rows, seed = params['bands'], params['rows'], params['seed']
+        self.bands, self.rows, self.seed = bands, rows, seed
+        # Hash functions (a * bit + b) mod PRIME for all bit positions, same for all runs with the same seed
+        rng = np.random.RandomState(seed)
+        a = rng.randint(1, self.PRIME, size=bands * rows).astype(np.int64)
+        b = rng.randint(0, self.PRIME, size=bands * rows).astype(np.int64)
+        positions = np.arange(store.layout.nwords * 64, dtype=np.int64)
+        self.hashes = (a[:, None] * positions[None, :] + b[:, None]) % self.PRIME
+        # Random odd multipliers combining the rows of a band into one 64 bit key
+        self.multipliers = rng.randint(1, 2**62, size=rows).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+        self.keys = None
+        self.order = None  # Sorted order of the keys of each band for lookups
+
+    def signatures(self, fingerprints):
+        """MinHash signatures of a 2D array of fingerprints. Empty fingerprints get the maximum value."""
+        bits = unpack(fingerprints)
+        signatures = np.full((len(bits), self.bands * self.rows), self.PRIME, dtype=np.int64)
+        for position in np.nonzero(bits.any(axis=0))[0]:
+            rows = bits[:, position]
+            signatures[rows] = np.minimum(signatures[rows], self.hashes[:, position])
+        return signatures
+
+    def band_keys(self, fingerprints):
+        """Hashes of the bands of the signatures as (n, bands) array."""
+        signatures = self.signatures(fingerprints).astype(np.uint64).reshape(len(fingerprints), self.bands, self.rows)
+        with np.errstate(over='ignore'):  # Multiplication modulo 2^64
+            return (signatures * self.multipliers).sum(axis=2, dtype=np.uint64)
+
+    def load(self):
+        """Reads the band hashes of all indexed fingerprints."""
+        if os.path.exists(self.keys_path):
+            keys = np.fromfile(self.keys_path, dtype='<u8')
+            self.keys = keys[:len(keys) // self.bands * self.bands].reshape(-1, self.bands)
+        else:
+            self.keys = np.zeros((0, self.bands), dtype=np.uint64)
+        self.order = None
+
+    def missing_keys(self, total, chunk_size):
+        """Yields the band hashes of the fingerprints of the store which are not in the index, in chunks."""
+        fingerprints = self.store.fingerprints(total)
+        for start in range(len(self.keys), total, chunk_size):
+            yield self.band_keys(np.asarray(fingerprints[start:min(start + chunk_size, total)]))
+
+    def update(self, chunk_size=2**16):
+        """Adds the fingerprints added to the store since the last update to the index. Returns their number."""
+        with self.store.locked():
+            self.load()
+            total = len(self.store.ids())
+            if not os.path.exists(self.params_path):
+                with open(self.params_path, 'w') as f:
+                    json.dump({'bands': self.bands, 'rows': self.rows, 'seed': self.seed}, f)
+            indexed, added = len(self.keys), [self.keys]
+            with open(self.keys_path, 'ab') as f:
+                for keys in self.missing_keys(total, chunk_size):
+                    f.write(keys.astype('<u8').tobytes())
+                    added.append(keys)
+        self.keys = np.concatenate(added)
+        return len(self.keys) - indexed
+
+    def refresh(self, total, chunk_size=2**16):
+        """Adds the fingerprints added to the store since the last update to the index in memory only, nothing is
+        written. Returns their number."""
+        if self.keys is None:
+            self.load()
+        indexed = len(self.keys)
+        if total > indexed:
+            self.keys = np.concatenate([self.keys] + list(self.missing_keys(total, chunk_size)))
+            self.order = None
+        return len(self.keys) - indexed
+
+    def candidates(self, query):
+        """Indices of all fingerprints sharing at least one band with the query."""
+        if not popcount(query):  # Not similar to anything
+            return np.zeros(0, dtype=np.int64)
+        if self.keys is None:
+            self.load()
+        if self.order is None:
+            self.order = np.argsort(self.keys, axis=0, kind='mergesort')
+        qkeys = self.band_keys(np.asarray(query, dtype=np.uint64)[None, :])[0]
+        found = []
+        for band in range(self.bands):
+            column = self.keys[self.order[:, band], band]
+            left, right = np.searchsorted(column, qkeys[band], 'left'), np.searchsorted(column, qkeys[band], 'right')
+            found.append(self.order[left:right, band])
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    def search(self, query, k=10, metric='tanimoto'):
+        """The k most similar of the candidate fingerprints, scored exactly, as list of ((pdbid, bsid), similarity).
+        Fingerprints added to the store since the last update are included, but not written to the index."""
+        ids = self.store.ids()
+        self.refresh(len(ids))
+        candidates = self.candidates(query)
+        if len(candidates) == 0:
+            return []
+        scores = similarity(query, self.store.fingerprints(len(ids))[candidates], metric)  # Reads only candidates
+        best = np.argsort(-scores, kind='mergesort')[:k]
+        return [(ids[candidates[i]], float(scores[i])) for i in best]
@@ -0,0 +1,78 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+journal.py - Durable record of finished, failed and running structures in batch runs.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import os
+import json
+import time
+
+
+class Journal():
+    """Append-only journal of a batch run with one JSON record per line. Each record is flushed to disk before
+    processing continues, so the journal survives interruptions and crashes. Entries which were started but never
+    finished count as failed attempts when the run is resumed."""
+
+    def __init__(self, path, resume=False):
+        self.path = os.path.expanduser(path)
+        self.state = {}  # Last state of each entry ('started', 'done' or 'failed')
+        self.attempts = {}  # Number of times processing of each entry was started
+        if resume and os.path.exists(self.path):
+            self.read()
+            self.truncate()
+        self.f = open(self.path, 'a' if resume else 'w')
+
+    def read(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # Incomplete last line after a crash
+                    continue
+                self.state[record['entry']] = record['state']
+                if record['state'] == 'started':
+                    self.attempts[record['entry']] = self.attempts.get(record['entry'], 0) + 1
+
+    def truncate(self):
+        """Removes an incomplete last line, which would otherwise be continued by the next record."""
+        with open(self.path, 'rb+') as f:
+            content = f.read()
+            f.truncate(content.rfind('\n') + 1)
+
+    def write(self, entry, state, **info):
+        record = dict(info, entry=entry, state=state, time=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        self.f.write(json.dumps(record, sort_keys=True) + '\n')
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.state[entry] = state
+
+    def start(self, entry):
+        self.attempts[entry] = self.attempts.get(entry, 0) + 1
+        self.write(entry, 'started', attempt=self.attempts[entry])
+
+    def done(self, entry):
+        self.write(entry, 'done')
+
+    def fail(self, entry, error):
+        self.write(entry, 'failed', error=error)
+
+    def skip(self, entry, max_retries):
+        """Checks if an entry can be skipped, either because it is finished or because it failed too often."""
+        return self.state.get(entry) == 'done' or self.attempts.get(entry, 0) > max_retries
+
+    def close(self):
+        self.f.close()
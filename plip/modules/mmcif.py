@@ -0,0 +1,272 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+mmcif.py - Read structures in mmCIF/PDBx format.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import re
+import string
+from collections import namedtuple, OrderedDict
+
+# Categories needed by PLIP, everything else is skipped while reading
+CATEGORIES = {'_entry', '_atom_site', '_struct_conn', '_pdbx_struct_mod_residue'}
+# Connection types written as LINK records in PDB format
+LINK_TYPES = ('covale', 'metalc')
+
+# IDs for chains which don't fit into PDB format, usable in PyMOL selections
+CHAIN_IDS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+# Largest residue number in PDB format
+MAX_RESNR = 9999
+
+# Quoted values end only at a quote followed by whitespace, so they may contain quotes (e.g. "O5'")
+TOKEN = re.compile(r"""'(?:[^']|'(?=\S))*'(?=\s|$)|"(?:[^"]|"(?=\S))*"(?=\s|$)|\S+""")
+
+covlinkage = namedtuple("covlinkage", "id1 chain1 pos1 conf1 id2 chain2 pos2 conf2")
+# Same information as gathered from PDB files by parse_pdb() and get_altconf_atoms(), plus the coordinate
+# section converted to PDB format for OpenBabel and the original IDs of residues which had to be renamed for it
+mmcifstructure = namedtuple('mmcifstructure', 'pdbid pdbstring idx_to_pdb modres covalent altconf residue_ids')
+
+
+class UnsupportedStructure(ValueError):
+    """Structure with more residues than can be renamed to fit into PDB format."""
+
+
+def is_mmcif(firstline):
+    """Checks if a file is in mmCIF format, judging from its first line."""
+    return firstline.startswith(('data_', '#'))
+
+
+def tokenize(lines):
+    """Yields the tokens of a CIF file line by line. Quoted values and text fields keep their delimiters,
+    see unquote(). Most lines contain no quotes and are simply split."""
+    text = None  # Lines of the current multi-line text field
+    for line in lines:
+        if text is not None:
+            if not line.startswith(';'):
+                text.append(line.rstrip('\r\n'))
+                continue
+            yield ';%s' % '\n'.join(text)
+            text, line = None, line[1:]
+        elif line.startswith(';'):
+            text = [line[1:].rstrip('\r\n')]
+            continue
+        for token in TOKEN.findall(line) if "'" in line or '"' in line else line.split():
+            if token[0] == '#':  # Comment until the end of the line
+                break
+            yield token
+
+
+def unquote(token):
+    """Removes quotes and text field delimiters from a token."""
+    if token[0] in '\'"':
+        return token[1:-1]
+    if token[0] == ';':
+        return token[1:]
+    return token
+
+
+def read_categories(lines, categories=CATEGORIES):
+    """Reads the first data block of a CIF file and returns a dictionary with a table (columns, rows) for each of the
+    given categories. Items given as single key-value pairs are returned as a table with one row."""
+    tables = {}
+    tokens = tokenize(lines)
+    token = next(tokens, None)
+    blocks = 0
+    while token is not None:
+        if token.startswith('data_'):
+            blocks += 1
+            if blocks > 1:
+                break
+            token = next(tokens, None)
+        elif token == 'loop_':
+            columns = []
+            token = next(tokens, None)
+            while token is not None and token[0] == '_':
+                columns.append(token)
+                token = next(tokens, None)
+            category = columns[0].split('.')[0] if columns else None
+            keep = category in categories
+            rows, row, width = [], [], len(columns)
+            while token is not None and token[0] != '_' and token != 'loop_' and not token.startswith('data_'):
+                if keep:
+                    row.append(unquote(token))
+                    if len(row) == width:
+                        rows.append(row)
+                        row = []
+                token = next(tokens, None)
+            if keep:
+                tables[category] = ([column.split('.', 1)[1] for column in columns], rows)
+        elif token[0] == '_':
+            category, _, item = token.partition('.')
+            value = next(tokens, None)
+            if category in categories and value is not None:
+                columns, rows = tables.setdefault(category, ([], [[]]))
+                columns.append(item)
+                rows[0].append(unquote(value))
+            token = next(tokens, None)
+        else:  # Global or save frame tokens, not used in mmCIF files from the PDB
+            token = next(tokens, None)
+    return tables
+
+
+def column_getter(columns, *names):
+    """Returns a function getting the value of the first available of the given columns from a row.
+    Missing columns and unknown values ('?', '.') give an empty string."""
+    for name in names:
+        if name in columns:
+            index = columns.index(name)
+            return lambda row: '' if row[index] in ('?', '.') else row[index]
+    return lambda row: ''
+
+
+def pdb_charge(charge):
+    """Converts a formal charge to PDB format, e.g. -1 to '1-'."""
+    if charge in ('', '0'):
+        return ''
+    return '%i%s' % (abs(int(charge)), '-' if int(charge) < 0 else '+')
+
+
+def pdb_atom_name(name, element):
+    """Aligns an atom name as in PDB files, names of one-letter elements start in the second column."""
+    if len(name) < 4 and len(element) == 1:
+        return ' %-3s' % name
+    return '%-4s' % name
+
+
+def fits_pdb(chain, resnrs):
+    """Checks if a chain ID and residue numbers fit into PDB records."""
+    return len(chain) == 1 and all(resnr == '' or -999 <= int(resnr) <= MAX_RESNR for resnr in resnrs)
+
+
+def rename_residues(chains):
+    """Assigns IDs fitting into PDB records to residues of chains given as (chain ID, residue numbers) in order of
+    appearance. Chains with a one-character ID and residue numbers of up to four characters keep their IDs. Residues
+    of all other chains are numbered from 1 in a chain with an unused one-character ID. If there are not enough
+    unused IDs, several chains share one. Returns a dictionary from the original (chain ID, residue number) to the
+    new one for all renamed residues."""
+    kept = set(chain for chain, resnrs in chains if fits_pdb(chain, resnrs))
+    renamed = [(chain, resnrs) for chain, resnrs in chains if chain not in kept]
+    free = [chain for chain in CHAIN_IDS if chain not in kept]
+    shared = len(renamed) > len(free)
+    mapping, slot, number = {}, -1, MAX_RESNR
+    for chain, resnrs in renamed:
+        if not shared or number + len(resnrs) > MAX_RESNR:  # Start with a new chain ID
+            slot, number = slot + 1, 0
+        for resnr in resnrs:
+            if number == MAX_RESNR:  # Long chains are continued with the next ID
+                slot, number = slot + 1, 0
+            if slot >= len(free):
+                raise UnsupportedStructure('Structure has too many residues to be renamed for PDB format.')
+            number += 1
+            mapping[(chain, resnr)] = (free[slot], number)
+    return mapping
+
+
+def original_residue(residue_ids, chain, resnr):
+    """Original chain ID and residue number of a residue renamed by convert_atom_site(), or the given ones."""
+    return residue_ids.get((chain, int(resnr)), (chain, resnr))
+
+
+def original_site(residue_ids, site):
+    """Name of a binding site (e.g. NFT-A-283) with the original chain ID and residue number."""
+    hetid, chain, resnr = site.split('-', 2)
+    return '-'.join([hetid] + [str(value) for value in original_residue(residue_ids, chain, resnr)])
+
+
+def convert_atom_site(table):
+    """Converts the atoms of the first model to ATOM/HETATM records. Atoms are numbered continuously, so there is no
+    limit for the number of atoms. Chain IDs and residue numbers which don't fit into the records are renamed, see
+    rename_residues(). Returns the records, the mapping to the atom IDs, the alternate conformations, the renamed
+    residues and the original (chain ID, residue number) for the new IDs of the renamed residues."""
+    columns, rows = table
+    group, atomid = column_getter(columns, 'group_PDB'), column_getter(columns, 'id')
+    element = column_getter(columns, 'type_symbol')
+    name = column_getter(columns, 'auth_atom_id', 'label_atom_id')
+    altloc = column_getter(columns, 'label_alt_id')
+    resname = column_getter(columns, 'auth_comp_id', 'label_comp_id')
+    chain = column_getter(columns, 'auth_asym_id', 'label_asym_id')
+    resnr = column_getter(columns, 'auth_seq_id', 'label_seq_id')
+    icode = column_getter(columns, 'pdbx_PDB_ins_code')
+    x, y, z = [column_getter(columns, 'Cartn_%s' % axis) for axis in 'xyz']
+    occupancy, bfactor = column_getter(columns, 'occupancy'), column_getter(columns, 'B_iso_or_equiv')
+    charge, model = column_getter(columns, 'pdbx_formal_charge'), column_getter(columns, 'pdbx_PDB_model_num')
+    records, idx_to_pdb, altconf = [], {}, []
+    first_model = model(rows[0]) if rows else ''
+    rows = [row for row in rows if model(row) == first_model]
+    residues = OrderedDict()  # Residue numbers of each chain in order of appearance
+    for row in rows:
+        residues.setdefault(chain(row), OrderedDict())[resnr(row)] = None
+    renamed = rename_residues([(chainid, list(resnrs)) for chainid, resnrs in residues.items()])
+    residue_ids = {new: (old[0], int(old[1]) if old[1] else old[1]) for old, new in renamed.items()}
+    for row in rows:
+        idx = len(records) + 1
+        pdbid = int(atomid(row))
+        idx_to_pdb[idx] = pdbid
+        location = altloc(row)
+        if location not in ('', 'A'):
+            altconf.append(pdbid)
+        rchain, rnumber = renamed.get((chain(row), resnr(row)), (chain(row), resnr(row)))
+        records.append('%-6s%5i %s%1s%3s %1s%4s%1s   %8.3f%8.3f%8.3f%6.2f%6.2f          %2s%2s\n'
+                       % (group(row) or 'ATOM', idx % 100000, pdb_atom_name(name(row), element(row)), location[:1],
+                          resname(row), rchain, rnumber, icode(row)[:1], float(x(row)), float(y(row)),
+                          float(z(row)), float(occupancy(row) or 1.0), float(bfactor(row) or 0.0),
+                          element(row).upper(), pdb_charge(charge(row))))
+    return records, idx_to_pdb, altconf, renamed, residue_ids
+
+
+def convert_struct_conn(table, renamed):
+    """Returns covalent linkages and metal coordination as with LINK records, with the residues renamed by
+    convert_atom_site()."""
+    columns, rows = table
+    conntype = column_getter(columns, 'conn_type_id')
+    partners = []
+    for n in '12':
+        partners.append((column_getter(columns, 'ptnr%s_auth_comp_id' % n, 'ptnr%s_label_comp_id' % n),
+                         column_getter(columns, 'ptnr%s_auth_asym_id' % n, 'ptnr%s_label_asym_id' % n),
+                         column_getter(columns, 'ptnr%s_auth_seq_id' % n, 'ptnr%s_label_seq_id' % n),
+                         column_getter(columns, 'pdbx_ptnr%s_label_alt_id' % n)))
+    covalent = []
+    for row in rows:
+        if not conntype(row).startswith(LINK_TYPES):
+            continue
+        (id1, chain1, pos1, conf1), (id2, chain2, pos2, conf2) = [[get(row) for get in p] for p in partners]
+        if pos1 == '' or pos2 == '':  # e.g. links to residues without author numbering
+            continue
+        (chain1, pos1), (chain2, pos2) = [renamed.get(residue, residue) for residue in [(chain1, pos1), (chain2, pos2)]]
+        covalent.append(covlinkage(id1=id1, chain1=chain1, pos1=int(pos1), conf1=conf1,
+                                   id2=id2, chain2=chain2, pos2=int(pos2), conf2=conf2))
+    return covalent
+
+
+def parse_mmcif(lines):
+    """Reads a structure in mmCIF format. Returns the coordinates as string in PDB format for OpenBabel, together with
+    the mapping to the original atom IDs, modified residues, covalent linkages, atoms with alternate conformations and
+    the original IDs of residues renamed to fit into PDB format, see convert_atom_site()."""
+    tables = read_categories(lines)
+    if '_atom_site' not in tables:
+        return mmcifstructure(pdbid=None, pdbstring='', idx_to_pdb={}, modres=set(), covalent=[], altconf=[],
+                              residue_ids={})
+    records, idx_to_pdb, altconf, renamed, residue_ids = convert_atom_site(tables['_atom_site'])
+    modres = set()
+    if '_pdbx_struct_mod_residue' in tables:
+        resname = column_getter(tables['_pdbx_struct_mod_residue'][0], 'auth_comp_id', 'label_comp_id')
+        modres = set(resname(row) for row in tables['_pdbx_struct_mod_residue'][1])
+    covalent = convert_struct_conn(tables['_struct_conn'], renamed) if '_struct_conn' in tables else []
+    pdbid = None
+    if '_entry' in tables:
+        pdbid = column_getter(tables['_entry'][0], 'id')(tables['_entry'][1][0]).lower() or None
+    return mmcifstructure(pdbid=pdbid, pdbstring='%sEND\n' % ''.join(records), idx_to_pdb=idx_to_pdb, modres=modres,
+                          covalent=covalent, altconf=altconf, residue_ids=residue_ids)
@@ -0,0 +1,154 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+parallel.py - Distribute work on one structure over several processes.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import os
+import sys
+import time
+import multiprocessing
+
+# Data shared with forked worker processes. Set before the workers are created, so that each worker inherits it
+# copy-on-write instead of receiving a pickled copy with every task.
+_shared = None
+
+
+def forking_available():
+    """Checks if worker processes can inherit data from the main process (not possible on Windows)."""
+    return os.name != 'nt'
+
+
+def _run_shared(task):
+    """Executes a single task in a worker process using the inherited shared data."""
+    func, item = task
+    return func(_shared, item)
+
+
+def imap_shared(func, shared, items, processes):
+    """Applies func(shared, item) to all items using up to the given number of worker processes.
+    The shared object is never pickled, only the items and the results are transferred.
+    Results are yielded in the order of the items, each as soon as it and all before it are finished, so they can be
+    processed while the workers continue with the following items."""
+    global _shared
+    items = list(items)
+    processes = min(processes, len(items))
+    if processes <= 1 or not forking_available():
+        for item in items:
+            yield func(shared, item)
+        return
+    _shared = shared
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap(_run_shared, [(func, item) for item in items], chunksize=1):
+            yield result
+        pool.close()
+    except:  # Also if the caller stops early
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        _shared = None
+
+
+def map_shared(func, shared, items, processes):
+    """Same as imap_shared(), but returns the list of all results when all items are finished."""
+    return list(imap_shared(func, shared, items, processes))
+
+
+class JobScheduler():
+    """Bounded scheduler for jobs working on shared data. Up to the given number of forked worker processes execute
+    the jobs while the main process continues, e.g. with writing reports. join() blocks until all jobs are finished
+    and raises errors and timeouts of the workers in the main process. Without forking or for less than one process,
+    jobs are executed directly on submission."""
+
+    def __init__(self, func, shared, processes, timeout=None, fresh_workers=False):
+        global _shared
+        self.func = func
+        self.shared = shared
+        self.timeout = timeout  # Maximum time (in seconds) for each job
+        self.processes = processes if forking_available() else 0
+        self.jobs = []
+        self.started = []  # Start time of each job, its deadline for join() is given by the timeout
+        self.pool = None
+        # With fresh_workers, each job gets its own process (e.g. for libraries which can only start up once). The
+        # process is forked when the job starts, so it sees the shared data as it is at that time, e.g. including
+        # binding sites analyzed after the scheduler was created.
+        self.fresh_workers = fresh_workers
+        self.queued = []  # Items waiting for a free process (fresh_workers only)
+        self.running = []  # Pools of the started jobs with fresh workers
+        if self.processes >= 1 and not fresh_workers:
+            _shared = shared
+            self.pool = multiprocessing.Pool(processes)
+
+    def submit(self, item):
+        """Adds a job for the given item to the queue."""
+        if self.processes < 1:
+            self.jobs.append(self.func(self.shared, item))
+        elif self.fresh_workers:
+            self.queued.append(item)
+            self.start_queued()
+        else:  # The start of the job in the pool is not known, the time waiting for a worker counts as well
+            self.jobs.append(self.pool.apply_async(_run_shared, ((self.func, item),)))
+            self.started.append(time.time())
+
+    def start_queued(self):
+        """Starts queued jobs with fresh workers as long as less than the given number of them are running."""
+        global _shared
+        for pool, job in [(pool, job) for pool, job in self.running if job.ready()]:
+            pool.join()
+            self.running.remove((pool, job))
+        while self.queued and len(self.running) < self.processes:
+            _shared = self.shared  # Reset by imap_shared() in the meantime, e.g. while analyzing binding sites
+            sys.stdout.flush()  # Otherwise buffered output (e.g. a report on stdout) could be written twice
+            pool = multiprocessing.Pool(1)
+            self.jobs.append(pool.apply_async(_run_shared, ((self.func, self.queued.pop(0)),)))
+            self.started.append(time.time())
+            pool.close()  # The worker exits after its job
+            self.running.append((pool, self.jobs[-1]))
+
+    def pools(self):
+        """Pools with worker processes which may still be running."""
+        return [self.pool] if self.pool is not None else [pool for pool, job in self.running]
+
+    def remaining(self, i):
+        """Time left until the deadline of a job, None without timeout."""
+        if self.timeout is None:
+            return None
+        return max(0, self.started[i] + self.timeout - time.time())
+
+    def join(self):
+        """Waits for all jobs without polling and returns their results in the order of submission. Raises
+        multiprocessing.TimeoutError if a job is not finished within the timeout after its start."""
+        global _shared
+        if self.processes < 1:
+            return self.jobs
+        try:
+            results = []
+            while len(results) < len(self.jobs):
+                results.append(self.jobs[len(results)].get(self.remaining(len(results))))
+                self.start_queued()  # The finished job made room for another one
+            if self.pool is not None:
+                self.pool.close()
+        except:
+            for pool in self.pools():
+                pool.terminate()
+            raise
+        finally:
+            for pool in self.pools():
+                pool.join()
+            _shared = None
+        return results
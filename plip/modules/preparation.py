@@ -19,10 +19,16 @@ limitations under the License.
 
 # Python Standard Library
 from operator import itemgetter
+from StringIO import StringIO
+import itertools
 
 # Own modules
 from detection import *
 from supplemental import *
+from serialization import DetachedInteraction
+from parallel import imap_shared, forking_available
+from mmcif import is_mmcif, parse_mmcif
+import profiling
 import config
 
 ################
@@ -88,8 +94,9 @@ class Mol():
                     vec1, vec2 = vector(a.coords, n_coords[0]), vector(a.coords, n_coords[1])
                     normals.append(np.cross(vec1, vec2))
                 # Given all normals of ring atoms and their neighbors, the angle between any has to be 7.5 deg or less
+                planarity = self.complex.settings.AROMATIC_PLANARITY
                 for n1, n2 in itertools.product(normals, repeat=2):
-                    if config.AROMATIC_PLANARITY < vecangle(n1, n2) < 180.0-config.AROMATIC_PLANARITY:
+                    if planarity < vecangle(n1, n2) < 180.0-planarity:
                             aromatic = False
                             break
                 # Ring is aromatic either by OpenBabel's criteria or if sufficiently planar
@@ -139,8 +146,10 @@ class Mol():
 
 class PLInteraction():
     """Class to store a ligand, a protein and their interactions."""
-    def __init__(self, lig_obj, bs_obj, protcomplex):
-        """Detect all interactions when initializing"""
+    def __init__(self, lig_obj, bs_obj, protcomplex, settings=None):
+        """Detect all interactions when initializing. Thresholds are taken from the settings of the complex
+        if no other settings are given."""
+        self.settings = protcomplex.settings if settings is None else settings
         self.ligand = lig_obj
         self.name = lig_obj.name
         self.lig_members = lig_obj.members
@@ -150,40 +159,48 @@ class PLInteraction():
         self.lig_to_pdb = lig_obj.pymol_data.maptopdb
         self.output_path = protcomplex.output_path
         self.altconf = protcomplex.altconf
+        self.residue_ids = protcomplex.residue_ids
 
-        self.saltbridge_lneg = saltbridge(self.bindingsite.get_pos_charged(), self.ligand.get_neg_charged(), True)
-        self.saltbridge_pneg = saltbridge(self.ligand.get_pos_charged(), self.bindingsite.get_neg_charged(), False)
+        settings = self.settings
+        self.saltbridge_lneg = saltbridge(self.bindingsite.get_pos_charged(), self.ligand.get_neg_charged(), True,
+                                          settings)
+        self.saltbridge_pneg = saltbridge(self.ligand.get_pos_charged(), self.bindingsite.get_neg_charged(), False,
+                                          settings)
 
         self.all_hbonds_ldon = hbonds(self.bindingsite.get_hba(),
-                                      self.ligand.get_hbd(), False, 'strong')
+                                      self.ligand.get_hbd(), False, 'strong', settings)
         self.all_hbonds_pdon = hbonds(self.ligand.get_hba(),
-                                      self.bindingsite.get_hbd(), True, 'strong')
+                                      self.bindingsite.get_hbd(), True, 'strong', settings)
 
-        self.hbonds_ldon = self.refine_hbonds_ldon(self.all_hbonds_ldon, self.saltbridge_lneg,
-                                                   self.saltbridge_pneg)
-        self.hbonds_pdon = self.refine_hbonds_pdon(self.all_hbonds_pdon, self.saltbridge_lneg,
-                                                   self.saltbridge_pneg)
+        self.pistacking = pistacking(self.bindingsite.get_rings(), self.ligand.get_rings(), settings)
 
-        self.pistacking = pistacking(self.bindingsite.get_rings(), self.ligand.get_rings())
-
-        self.all_pi_cation_laro = pication(self.ligand.get_rings(), self.bindingsite.get_pos_charged(), True)
-        self.pication_paro = pication(self.bindingsite.get_rings(), self.ligand.get_pos_charged(), False)
-
-        self.pication_laro = self.refine_pi_cation_laro(self.all_pi_cation_laro, self.pistacking)
+        self.all_pi_cation_laro = pication(self.ligand.get_rings(), self.bindingsite.get_pos_charged(), True,
+                                           settings)
+        self.pication_paro = pication(self.bindingsite.get_rings(), self.ligand.get_pos_charged(), False, settings)
 
         self.all_hydrophobic_contacts = hydrophobic_interactions(self.bindingsite.get_hydrophobic_atoms(),
-                                                                 self.ligand.get_hydrophobic_atoms())
-        self.hydrophobic_contacts = self.refine_hydrophobic(self.all_hydrophobic_contacts, self.pistacking)
-        self.halogen_bonds = halogen(self.bindingsite.halogenbond_acc, self.ligand.halogenbond_don)
-        self.water_bridges = water_bridges(self.bindingsite.get_hba(), self.ligand.get_hba(),
-                                           self.bindingsite.get_hbd(), self.ligand.get_hbd(),
-                                           self.ligand.water)
-
-        self.water_bridges = self.refine_water_bridges(self.water_bridges, self.hbonds_ldon, self.hbonds_pdon)
-        self.no_interactions = all(len(i) == 0 for i in [self.saltbridge_lneg, self.saltbridge_pneg, self.hbonds_ldon,
-                                                         self.hbonds_pdon, self.pistacking, self.pication_paro,
-                                                         self.pication_paro, self.hydrophobic_contacts,
-                                                         self.halogen_bonds, self.water_bridges])
+                                                                 self.ligand.get_hydrophobic_atoms(), settings)
+        self.halogen_bonds = halogen(self.bindingsite.halogenbond_acc, self.ligand.halogenbond_don, settings)
+        self.all_water_bridges = water_bridges(self.bindingsite.get_hba(), self.ligand.get_hba(),
+                                               self.bindingsite.get_hbd(), self.ligand.get_hbd(),
+                                               self.ligand.water, settings)
+        self.refine()
+
+    def refine(self):
+        """Selects the final interactions from all detected ones. Called again after filtering in sweep mode."""
+        with profiling.stage('refine'):
+            self.hbonds_ldon = self.refine_hbonds_ldon(self.all_hbonds_ldon, self.saltbridge_lneg,
+                                                       self.saltbridge_pneg)
+            self.hbonds_pdon = self.refine_hbonds_pdon(self.all_hbonds_pdon, self.saltbridge_lneg,
+                                                       self.saltbridge_pneg)
+            self.pication_laro = self.refine_pi_cation_laro(self.all_pi_cation_laro, self.pistacking)
+            self.hydrophobic_contacts = self.refine_hydrophobic(self.all_hydrophobic_contacts, self.pistacking)
+            self.water_bridges = self.refine_water_bridges(self.all_water_bridges, self.hbonds_ldon, self.hbonds_pdon)
+            self.no_interactions = all(len(i) == 0 for i in [self.saltbridge_lneg, self.saltbridge_pneg,
+                                                             self.hbonds_ldon, self.hbonds_pdon, self.pistacking,
+                                                             self.pication_paro, self.pication_paro,
+                                                             self.hydrophobic_contacts, self.halogen_bonds,
+                                                             self.water_bridges])
 
     def refine_hydrophobic(self, all_h, pistacks):
         """Apply several rules to reduce the number of hydrophobic interactions."""
@@ -450,7 +467,7 @@ class Ligand(Mol):
                     oxy = pybel.Atom(at)
             # There are some cases where there is no oxygen in a water residue, ignore those
             if not set([at.GetAtomicNum() for at in pybel.ob.OBResidueAtomIter(hoh)]) == {1} and oxy is not None:
-                if euclidean3d(self.centroid, oxy.coords) < self.max_dist_to_center + config.BS_DIST:
+                if euclidean3d(self.centroid, oxy.coords) < self.max_dist_to_center + cclass.settings.BS_DIST:
                     self.water.append(oxy)
         s = lig.title.split('-')
         data = namedtuple('pymol_data', 'hetid chain resid maptopdb bs_id')
@@ -527,8 +544,9 @@ class PDBComplex():
     such as PDB files.
     """
 
-    def __init__(self):
+    def __init__(self, settings=None):
         self.interaction_sets = {}  # Dictionary with site identifiers as keys and object as value
+        self.settings = config.Settings() if settings is None else settings  # Thresholds used for detection
         self.protcomplex = None
         self.atoms = {}  # Dictionary of Pybel atoms, accessible by their idx
         self.sourcefiles = {}
@@ -538,35 +556,99 @@ class PDBComplex():
         self.modres = set()
         self.altconf = []  # Atom idx of atoms with alternate conformations
         self.covalent = []  # Covalent linkages between ligands and protein residues/other ligands
-
-    def load_pdb(self, pdbpath):
-        """Loads a pdb file with protein AND ligand(s), separates and prepares them."""
-        self.sourcefiles['pdbcomplex'] = pdbpath
-        self.protcomplex = read_pdb(pdbpath, safe=False)  # Don't do safe reading
-        # Counting is different from PDB if TER records present
-        self.idx_to_pdb_mapping, self.modres, self.covalent = parse_pdb(open(tilde_expansion(pdbpath)).readlines())
-        # #@todo Include this in the parse_pdb function, return named tuple?
-        self.altconf = get_altconf_atoms(open(tilde_expansion(pdbpath)).readlines())
+        self.input_format = 'pdb'  # Format of the input file, 'pdb' or 'mmcif'
+        self.residue_ids = {}  # Original (chain, residue number) of residues renamed for OpenBabel (only mmCIF)
+
+    def load_pdb(self, pdbpath, maxthreads=1, as_string=False, name=None, callback=None):
+        """Loads a pdb file with protein AND ligand(s), separates and prepares them. Files in mmCIF format are
+        recognized by their content and converted while reading.
+        Instead of a path, the structure can be given as string (with as_string=True, also compressed), as file-like
+        object or as Pybel molecule, which is written in PDB format first. Such structures are kept in memory as
+        sourcefiles['pdbstring'] for visualization. The name is used as PDB ID if the structure has no HEADER, by
+        default it is taken from the file name.
+        With maxthreads > 1, binding sites are analyzed in parallel by forked worker processes. The interaction sets
+        are then stored as DetachedInteraction objects, which hold no OpenBabel objects.
+        Sites are analyzed in the order of their names. The callback is called with the name and the interaction set
+        of each site as soon as it is available, e.g. to write reports incrementally."""
+        if isinstance(pdbpath, pybel.Molecule):  # All records are parsed as for structures read from files
+            pdbpath, as_string = pdbpath.write('pdb'), True
+        if as_string or hasattr(pdbpath, 'read'):
+            content = decompress(pdbpath if as_string else pdbpath.read())
+            self.sourcefiles['pdbcomplex'], self.sourcefiles['pdbstring'] = None, content
+            filename = getattr(pdbpath, 'name', '') if not as_string else ''
+            with profiling.stage('parse_structure'):
+                pdbid, pdbstring = self.parse_structure(StringIO(content))
+        else:
+            self.sourcefiles['pdbcomplex'], filename = pdbpath, pdbpath
+            # The file is read (and decompressed if necessary) only once, the lines are used for all parsing steps
+            with open_structure(pdbpath) as f, profiling.stage('parse_structure'):
+                pdbid, pdbstring = self.parse_structure(f)
+        with profiling.stage('openbabel_read'):
+            self.protcomplex = read_pdb(self.sourcefiles['pdbcomplex'], safe=False, pdbstring=pdbstring)  # Not safe
         try:
-            self.pymol_name = self.protcomplex.data['HEADER'][56:60].lower()  # Get name from HEADER data
+            self.pymol_name = pdbid or self.protcomplex.data['HEADER'][56:60].lower()  # Get name from HEADER data
         except KeyError:  # Extract the PDBID from the filename
-            self.pymol_name = extract_pdbid(pdbpath.split('/')[-1])
-        self.protcomplex.OBMol.AddPolarHydrogens()
+            self.pymol_name = extract_pdbid((name or filename).split('/')[-1])
+        with profiling.stage('add_polar_hydrogens'):
+            self.protcomplex.OBMol.AddPolarHydrogens()
         for atm in self.protcomplex:
             self.atoms[atm.idx] = atm
-        ligands = getligs(self.protcomplex, self.altconf, self.idx_to_pdb_mapping, self.modres, self.covalent)
+        with profiling.stage('getligs'):
+            ligands = getligs(self.protcomplex, self.altconf, self.idx_to_pdb_mapping, self.modres, self.covalent)
+        ligands = sorted(ligands, key=lambda lig: lig.mol.title)
         resis = [obres for obres in pybel.ob.OBResidueIter(self.protcomplex.OBMol) if obres.GetResidueProperty(0)]
-        for ligand in ligands:
+        # Timings and counters of forked workers would be lost, so sites are analyzed sequentially while profiling
+        if maxthreads > 1 and len(ligands) > 1 and forking_available() and profiling.active() is None:
+            # The complex is inherited by the workers, only the ligand numbers and the results are transferred. Each
+            # site is passed to the callback as soon as it is finished, while the workers continue with the next ones.
+            results = imap_shared(characterize_site_detached, (self, ligands, resis), range(len(ligands)), maxthreads)
+            for ligand, pli_obj in zip(ligands, results):  # Merge in the same order as in sequential mode
+                pli_obj.idx_to_pdb, pli_obj.altconf = self.idx_to_pdb_mapping, self.altconf
+                pli_obj.residue_ids = self.residue_ids
+                self.interaction_sets[ligand.mol.title] = pli_obj
+                if callback is not None:
+                    callback(ligand.mol.title, pli_obj)
+        else:
+            for ligand in ligands:
+                with profiling.site(ligand.mol.title):
+                    self.interaction_sets[ligand.mol.title] = self.characterize_site(ligand, resis)
+                if callback is not None:
+                    callback(ligand.mol.title, self.interaction_sets[ligand.mol.title])
+
+    def parse_structure(self, f):
+        """Reads a structure in PDB or mmCIF format from an open file. Gathers the atom mapping, modified residues,
+        covalent linkages and alternate conformations and returns the PDB ID (for mmCIF) and the structure as
+        string in PDB format for OpenBabel."""
+        firstline = f.readline()
+        if is_mmcif(firstline):
+            self.input_format = 'mmcif'
+            structure = parse_mmcif(itertools.chain([firstline], f))
+            self.idx_to_pdb_mapping, self.modres = structure.idx_to_pdb, structure.modres
+            self.covalent, self.altconf = structure.covalent, structure.altconf
+            self.residue_ids = structure.residue_ids
+            return structure.pdbid, structure.pdbstring
+        pdblines = [firstline] + f.readlines()
+        # Counting is different from PDB if TER records present
+        self.idx_to_pdb_mapping, self.modres, self.covalent = parse_pdb(pdblines)
+        # #@todo Include this in the parse_pdb function, return named tuple?
+        self.altconf = get_altconf_atoms(pdblines)
+        return None, ''.join(pdblines)
+
+    def characterize_site(self, ligand, resis):
+        """Prepares ligand and binding site and detects all interactions between them."""
+        with profiling.stage('ligand_perception'):
             lig_obj = Ligand(ligand.mol, self, ligand.mapping, ligand.water, self.altconf, ligand.members)
-            cutoff = lig_obj.max_dist_to_center + config.BS_DIST
+        cutoff = lig_obj.max_dist_to_center + self.settings.BS_DIST
+        with profiling.stage('extract_bs'):
             bs_res = self.extract_bs(cutoff, lig_obj.centroid, resis)
             # Get a list of all atoms belonging to the binding site, search by idx
             bs_atoms = [self.atoms[idx] for idx in [i for i in self.atoms.keys()
                                                     if self.atoms[i].OBAtom.GetResidue().GetIdx() in bs_res]
                         if idx in self.idx_to_pdb_mapping and self.idx_to_pdb_mapping[idx] not in self.altconf]
+        with profiling.stage('bindingsite_perception'):
             bs_obj = BindingSite(bs_atoms, self.protcomplex, self, self.altconf)
-            pli_obj = PLInteraction(lig_obj, bs_obj, self)
-            self.interaction_sets[ligand.mol.title] = pli_obj
+        profiling.count('binding_sites')
+        return PLInteraction(lig_obj, bs_obj, self)
 
     def extract_bs(self, cutoff, ligcentroid, resis):
         """Return list of ids from residues belonging to the binding site"""
@@ -592,3 +674,13 @@ class PDBComplex():
     @output_path.setter
     def output_path(self, path):
         self.output_path = tilde_expansion(path)
+
+
+def characterize_site_detached(shared, ligand_number):
+    """Worker function for the parallel analysis of binding sites. Returns the interactions without OpenBabel objects,
+    so they can be sent back to the main process."""
+    protcomplex, ligands, resis = shared
+    pli_obj = DetachedInteraction(protcomplex.characterize_site(ligands[ligand_number], resis))
+    # Restored by the main process, no need to send copies
+    pli_obj.idx_to_pdb, pli_obj.altconf, pli_obj.residue_ids = None, None, None
+    return pli_obj
@@ -0,0 +1,342 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+profiling.py - Stage timers and counters for finding out where the time of an analysis goes.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import os
+import sys
+import json
+import time
+from functools import wraps
+from collections import defaultdict
+if os.name != 'nt':  # Resource module not available for Windows
+    import resource
+try:  # Part of the standard library from Python 3.4 on, available as pytracemalloc for patched Python 2.7
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# OpenBabel classes whose method calls are counted, these make up most of the calls through SWIG
+SWIG_CLASSES = ['OBMol', 'OBAtom', 'OBBond', 'OBResidue', 'OBRing', 'OBConversion', 'OBAtomAtomIter',
+                'OBResidueIter', 'OBResidueAtomIter', 'OBMolAtomIter', 'OBAtomBondIter']
+
+_profiler = None  # Active profiler, see enable()
+
+
+##################
+# Memory reading #
+##################
+
+def current_rss_kb():
+    """Resident memory of the process in kB, None if unknown (only available on Linux)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (IOError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_kb():
+    """Peak resident memory in kB since the process start or the last reset_peak_rss()."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (IOError, ValueError):
+        pass
+    if os.name == 'nt':
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # Given in bytes on OS X
+
+
+def reset_peak_rss():
+    """Resets the peak resident memory to the current value (Linux 4.0 or later). Returns False if not supported,
+    then peak_rss_kb() stays the peak since the process start."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except IOError:
+        return False
+
+
+def python_allocated_kb():
+    """Memory allocated by Python objects in kB, None if tracemalloc isn't tracing."""
+    if tracemalloc is None or not tracemalloc.is_tracing():
+        return None
+    return tracemalloc.get_traced_memory()[0] // 1024
+
+
+def available_memory_kb():
+    """Memory available for new processes in kB, None if unknown (only available on Linux)."""
+    try:
+        with open('/proc/meminfo') as f:
+            info = dict(line.split(':', 1) for line in f)
+        return int((info.get('MemAvailable') or info['MemTotal']).split()[0])
+    except (IOError, KeyError, ValueError):
+        return None
+
+
+def memory_summary(peaks, available_kb=None, headroom=0.1):
+    """Summarizes the peak memory of several structures (dictionary of name and peak RSS in kB) and suggests the
+    number of worker processes which fit into the available memory of a node, keeping some headroom."""
+    peaks = {name: peak for name, peak in peaks.items() if peak is not None}
+    available_kb = available_memory_kb() if available_kb is None else available_kb
+    summary = {'structures': peaks, 'available_kb': available_kb, 'max_peak_rss_kb': None,
+               'median_peak_rss_kb': None, 'suggested_workers': None}
+    if peaks:
+        ordered = sorted(peaks.values())
+        summary['max_peak_rss_kb'] = ordered[-1]
+        summary['median_peak_rss_kb'] = (ordered[(len(ordered) - 1) // 2] + ordered[len(ordered) // 2]) // 2
+        if available_kb is not None:
+            summary['suggested_workers'] = max(1, int(available_kb * (1 - headroom)) // ordered[-1])
+    return summary
+
+
+class Profiler():
+    """Collects the time spent in named stages, the number of candidate and accepted pairs of each detector and
+    other counters. Hooks are called with (event, name, value) for the start and end of each stage (value is
+    None and the elapsed time in seconds) and for counters (value is the increment), e.g. for own tracing.
+    With memory=True, the change of resident memory, the peak resident memory and (with tracemalloc) the change of
+    memory allocated by Python objects are recorded for each stage and binding site."""
+
+    def __init__(self, swig=False, hooks=None, memory=False):
+        self.swig = swig  # Count calls of OpenBabel methods, slows down the analysis considerably
+        self.memory = memory
+        self.hooks = [] if hooks is None else list(hooks)
+        self.stages = defaultdict(lambda: {'seconds': 0.0, 'calls': 0})
+        self.sites = defaultdict(lambda: {'seconds': 0.0, 'calls': 0})
+        self.detectors = defaultdict(lambda: {'candidates': 0, 'accepted': 0})
+        self.counters = defaultdict(int)
+        self.swig_calls = defaultdict(int)
+        self.patched = []  # (class, name, original attribute) for methods wrapped for counting
+        self.open_stages = []  # Stages currently measuring memory
+        self.peak_rss = None
+        self.python_peak = None
+        self.started_tracemalloc = False
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def stage(self, name):
+        return Stage(self, name, self.stages)
+
+    def site(self, name):
+        return Stage(self, name, self.sites)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+        for hook in self.hooks:
+            hook('count', name, n)
+
+    def pairs(self, name, candidates, accepted):
+        """Records the number of checked and accepted pairs for one call of a detector."""
+        self.detectors[name]['candidates'] += candidates
+        self.detectors[name]['accepted'] += accepted
+
+    ####################
+    # SWIG call counts #
+    ####################
+
+    def counting_method(self, key, method):
+        counts = self.swig_calls
+
+        def counted(*args, **kwargs):
+            counts[key] += 1
+            return method(*args, **kwargs)
+        return counted
+
+    def patch_swig(self):
+        """Wraps the public methods of the OpenBabel proxy classes to count their calls."""
+        import pybel
+        for classname in SWIG_CLASSES:
+            cls = getattr(pybel.ob, classname, None)
+            if cls is None:
+                continue
+            for name, attribute in vars(cls).items():
+                if name.startswith('_') or not callable(attribute):
+                    continue
+                try:
+                    setattr(cls, name, self.counting_method('%s.%s' % (classname, name), getattr(cls, name)))
+                except (TypeError, AttributeError):  # Built-in types can't be changed
+                    break
+                self.patched.append((cls, name, attribute))
+
+    def unpatch_swig(self):
+        for cls, name, attribute in reversed(self.patched):
+            setattr(cls, name, attribute)
+        self.patched = []
+
+    ##########
+    # Memory #
+    ##########
+
+    def start_memory(self):
+        if tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        self.checkpoint()
+
+    def stop_memory(self):
+        self.checkpoint()
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            self.python_peak = tracemalloc.get_traced_memory()[1] // 1024
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+                self.started_tracemalloc = False
+
+    def checkpoint(self):
+        """Passes the peak resident memory since the last checkpoint to all open stages and resets it, so each stage
+        gets its own peak. Without reset support, the peak is the one since the process start."""
+        peak = peak_rss_kb()
+        if peak is None:
+            return
+        self.peak_rss = max(self.peak_rss, peak)
+        for stage in self.open_stages:
+            stage.peak_rss = max(stage.peak_rss, peak)
+        reset_peak_rss()
+
+    def open_memory_stage(self, stage):
+        self.checkpoint()
+        stage.peak_rss, stage.rss, stage.python = None, current_rss_kb(), python_allocated_kb()
+        self.open_stages.append(stage)
+
+    def close_memory_stage(self, stage, stats):
+        self.checkpoint()
+        self.open_stages.remove(stage)
+        rss, python = current_rss_kb(), python_allocated_kb()
+        if rss is not None:
+            stats['rss_delta_kb'] = stats.get('rss_delta_kb', 0) + rss - stage.rss
+        if stage.peak_rss is not None:
+            stats['peak_rss_kb'] = max(stats.get('peak_rss_kb'), stage.peak_rss)
+        if python is not None and stage.python is not None:
+            stats['python_delta_kb'] = stats.get('python_delta_kb', 0) + python - stage.python
+
+    ##########
+    # Output #
+    ##########
+
+    def as_dict(self):
+        result = {'stages': dict(self.stages), 'detectors': dict(self.detectors), 'counters': dict(self.counters),
+                  'swig_calls': dict(self.swig_calls), 'swig_calls_total': sum(self.swig_calls.values())}
+        if self.memory:
+            result.update(sites=dict(self.sites), peak_rss_kb=self.peak_rss, python_peak_kb=self.python_peak)
+        return result
+
+    def write(self, f):
+        """Writes all timings and counters as JSON to an open file."""
+        json.dump(self.as_dict(), f, indent=2, sort_keys=True)
+
+
+class Stage():
+    """Context manager timing one stage (or binding site) of a profiler and measuring its memory if requested."""
+
+    def __init__(self, profiler, name, table):
+        self.profiler, self.name, self.table = profiler, name, table
+
+    def __enter__(self):
+        for hook in self.profiler.hooks:
+            hook('start', self.name, None)
+        if self.profiler.memory:
+            self.profiler.open_memory_stage(self)
+        self.start = time.time()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.time() - self.start
+        stats = self.table[self.name]
+        stats['seconds'] += elapsed
+        stats['calls'] += 1
+        if self.profiler.memory:
+            self.profiler.close_memory_stage(self, stats)
+        for hook in self.profiler.hooks:
+            hook('end', self.name, elapsed)
+
+
+class NoStage():
+    """Stand-in for Stage while profiling is disabled."""
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NO_STAGE = NoStage()
+
+####################
+# Module-level API #
+####################
+
+def enable(profiler=None):
+    """Makes the given (or a new) profiler the active one and returns it."""
+    global _profiler
+    disable()
+    _profiler = Profiler() if profiler is None else profiler
+    if _profiler.swig:
+        _profiler.patch_swig()
+    if _profiler.memory:
+        _profiler.start_memory()
+    return _profiler
+
+
+def disable():
+    """Stops profiling and returns the profiler which was active."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.unpatch_swig()
+        if profiler.memory:
+            profiler.stop_memory()
+    return profiler
+
+
+def active():
+    return _profiler
+
+
+def stage(name):
+    """Context manager timing a stage of the active profiler, does nothing if profiling is disabled."""
+    return NO_STAGE if _profiler is None else _profiler.stage(name)
+
+
+def site(name):
+    """Context manager for the analysis of one binding site, does nothing if profiling is disabled."""
+    return NO_STAGE if _profiler is None else _profiler.site(name)
+
+
+def count(name, n=1):
+    if _profiler is not None:
+        _profiler.count(name, n)
+
+
+def detector(name, candidates):
+    """Decorator for detection functions. Times each call and records the number of candidate pairs (computed by
+    the candidates function from the arguments) and accepted pairs (the length of the result)."""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return function(*args, **kwargs)
+            with _profiler.stage('detect.%s' % name):
+                result = function(*args, **kwargs)
+            _profiler.pairs(name, candidates(*args), len(result))
+            return result
+        return wrapper
+    return decorate
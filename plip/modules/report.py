@@ -18,15 +18,312 @@ limitations under the License.
 
 
 # Python Standard Library
+import os
+import gzip
+import json
 import time
+import shutil
 from operator import itemgetter
+from contextlib import contextmanager, closing
+if os.name != 'nt':  # File locking not available for Windows
+    import fcntl
+
+# Own modules
+from supplemental import atomic_write
+from mmcif import original_residue, original_site
+import profiling
 
 # External libraries
-import lxml.etree as et
+# lxml is only imported when XML output is generated to keep the startup time low
+
+
+# Sections of the binding site reports: title in the rST report, element name in the XML report and JSON key,
+# prefix of the attributes with features and information in TextOutput
+SECTIONS = [('Hydrophobic Interactions', 'hydrophobic_interactions', 'hydrophobic'),
+            ('Hydrogen Bonds', 'hydrogen_bonds', 'hbond'),
+            ('Water Bridges', 'water_bridges', 'waterbridge'),
+            ('Salt Bridges', 'salt_bridges', 'saltbridge'),
+            ('pi-Stacking', 'pi_stacks', 'pistacking'),
+            ('pi-Cation Interactions', 'pi_cation_interactions', 'pication'),
+            ('Halogen Bonds', 'halogen_bonds', 'halogen')]
+
+# File names of the reports in the output folder
+REPORT_FILES = {'txt': 'report.rst.txt', 'xml': 'report.xml', 'jsonl': 'report.jsonl.gz'}
+
+
+@contextmanager
+def report_files(outpath, reports):
+    """Opens the files for the given reports ('txt', 'xml', 'jsonl') in the output folder and yields a dictionary with
+    the open files. All files are written to temporary files and renamed only if writing was completed, see
+    atomic_write(). The JSON Lines report is compressed."""
+    if not reports:
+        yield {}
+        return
+    with atomic_write(os.path.join(outpath, REPORT_FILES[reports[0]]), 'wb' if reports[0] == 'jsonl' else 'w') as f:
+        if reports[0] == 'jsonl':
+            with closing(gzip.GzipFile(filename='', fileobj=f, mode='wb')) as g:
+                with report_files(outpath, reports[1:]) as files:
+                    files[reports[0]] = g
+                    yield files
+        else:
+            with report_files(outpath, reports[1:]) as files:
+                files[reports[0]] = f
+                yield files
+
+
+def append_report(source, target):
+    """Appends a compressed report to a file collecting the reports of several structures, e.g. for batch runs.
+    Concatenated gzip files are valid gzip files. The target is locked, so several processes can append to it."""
+    with open(source, 'rb') as src, open(target, 'ab') as f:
+        if os.name != 'nt':
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            shutil.copyfileobj(src, f)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            if os.name != 'nt':
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def formatted(value):
+    """Formats a raw value of the report data as in all reports, distances and angles with two decimals."""
+    return '%.2f' % value if isinstance(value, float) else str(value)
+
+
+def raw(feature, value):
+    """Converts a value of the report data to plain numbers and lists for JSON, e.g. atom lists to integers."""
+    if feature == 'LIG_IDX_LIST':
+        return [int(idx) for idx in value.split(',')]
+    if isinstance(value, tuple):  # Coordinates
+        return [float(c) for c in value]
+    if isinstance(value, float):  # Also numpy floats
+        return float(value)
+    return value
+
+
+def site_record(pdbid, version, number, output, pli):
+    """Record of a binding site as in the JSON Lines report, see TextOutput.generate_record()."""
+    record = output.generate_record()
+    record.update(pdbid=pdbid, plipversion=version, id=number, has_interactions=not pli.no_interactions)
+    return record
+
+
+def original_contact(residue_ids, contact):
+    """Returns the report data of a contact with the original residue number and chain (first and third value) of
+    residues renamed for mmCIF input."""
+    chain, resnr = original_residue(residue_ids, contact[2], contact[0])
+    return (resnr, contact[1], chain) + contact[3:]
+
+
+def txt_header(pdbid, version):
+    """First lines of the rST report"""
+    title = 'Prediction of noncovalent interactions for PDB structure %s' % pdbid
+    return [title, '=' * len(title), 'Created on %s using PLIP v%s\n' % (time.strftime("%Y/%m/%d"), version)]
+
+
+def indent(element, level=0, space='  '):
+    """Adds whitespace to the element and its children for pretty printing at the given nesting level."""
+    children = list(element)
+    if children:
+        element.text = '\n' + space * (level + 1)
+        for child in children:
+            indent(child, level + 1, space)
+            child.tail = '\n' + space * (level + 1)
+        children[-1].tail = '\n' + space * level
+
+
+def xml_writer(f, version, pdbid):
+    """Coroutine writing the XML report incrementally. Send one bindingsite element at a time and None at the end.
+    The output is the same as for the pretty-printed tree of the whole report."""
+    import lxml.etree as et
+    with et.xmlfile(f, encoding='ASCII') as xf:
+        xf.write_declaration()
+        with xf.element('report'):
+            plipversion, pdbelement = et.Element('plipversion'), et.Element('pdbid')
+            plipversion.text, pdbelement.text = version, pdbid
+            element = plipversion
+            while element is not None:
+                indent(element, level=1)
+                element.tail = None
+                xf.write('\n  ')
+                xf.write(element)
+                element = pdbelement if element is plipversion else (yield)
+            xf.write('\n')
+    f.write('\n')
+
+
+class ReportWriter():
+    """Writes the rST, XML and JSON Lines reports incrementally, one binding site at a time, so each site can be
+    written as soon as it is analyzed. Sites have to be added in the order of their names. Rows for columnar tables
+    (see tables.TableWriter), the database (see database.ResultStore) and fingerprints (see
+    fingerprints.FingerprintStore) are added only when the structure is finished, so failed structures leave no rows."""
+
+    def __init__(self, version, txt=None, xml=None, compact=False, jsonl=None, tables=None, store=None,
+                 fingerprints=None):
+        self.version = version
+        self.txt, self.xml, self.jsonl = txt, xml, jsonl  # Open files, None for reports which are not needed
+        self.tables, self.store, self.fingerprints = tables, store, fingerprints
+        self.rows = {}  # Table rows of all sites written so far
+        self.records = []  # Records of all sites written so far for the database
+        self.fps = []  # Fingerprints of all sites written so far
+        self.compact = compact  # Coordinates as attributes in the XML report
+        self.xmlwriter = None
+        self.started = False
+        self.sites = []  # Names of all sites written so far and whether they have interactions
+
+    def start(self, mol):
+        self.pdbid = mol.pymol_name.upper()
+        if self.txt is not None:
+            for textline in txt_header(self.pdbid, self.version):
+                self.txt.write(textline + '\n')
+        if self.xml is not None:
+            self.xmlwriter = xml_writer(self.xml, self.version, self.pdbid)
+            next(self.xmlwriter)
+        self.started = True
+
+    def add_site(self, mol, site, pli):
+        """Writes the reports for one binding site."""
+        if not self.started:
+            self.start(mol)
+        self.sites.append((site, not pli.no_interactions))
+        if self.fingerprints is not None:
+            from fingerprints import fingerprint
+            with profiling.stage('fingerprint'):
+                self.fps.append((self.pdbid, original_site(pli.residue_ids, site),
+                                 fingerprint(pli, self.fingerprints.layout)))
+        if all(output is None for output in [self.txt, self.xml, self.jsonl, self.tables, self.store]):
+            return
+        with profiling.stage('textoutput'):
+            output = TextOutput(pli)
+        if self.txt is not None:
+            with profiling.stage('report_txt'):
+                for textline in output.generate_rst():
+                    self.txt.write(textline + '\n')
+                if pli.no_interactions:
+                    self.txt.write('No interactions detected.\n')
+        if self.xml is not None:
+            with profiling.stage('report_xml'):
+                bindingsite = output.generate_xml(self.compact)
+                bindingsite.set('id', str(len(self.sites)))
+                bindingsite.set('has_interactions', 'False' if pli.no_interactions else 'True')
+                self.xmlwriter.send(bindingsite)
+        if self.jsonl is not None or self.store is not None:
+            with profiling.stage('report_jsonl'):
+                record = site_record(self.pdbid, self.version, len(self.sites), output, pli)
+                if self.jsonl is not None:
+                    self.jsonl.write(json.dumps(record, sort_keys=True) + '\n')
+            if self.store is not None:
+                self.records.append(record)
+        if self.tables is not None:
+            from tables import site_rows
+            for table, rows in site_rows(self.pdbid, output.name, output).items():
+                self.rows.setdefault(table, []).extend(rows)
+
+    def finish(self, mol):
+        """Completes the reports after all sites were added."""
+        if not self.started:
+            self.start(mol)
+        if self.xmlwriter is not None:
+            try:
+                self.xmlwriter.send(None)
+            except StopIteration:
+                pass
+            self.xmlwriter = None
+        if self.tables is not None:
+            self.tables.add(self.rows)
+            self.rows = {}
+        if self.store is not None:
+            self.store.add_structure(self.pdbid, self.version, self.records, mol.sourcefiles.get('pdbcomplex'))
+            self.records = []
+        if self.fingerprints is not None:
+            self.fingerprints.add(self.fps)
+            self.fps = []
+
+
+class StructureReport():
+    """Creates reports (XML, rST or JSON) for all binding sites of one structure."""
+    def __init__(self, mol, version):
+        self.mol = mol
+        self.version = version
+        self.pdbid = mol.pymol_name.upper()
+        self.outputs = {}  # Report data for each site, shared by all formats
+
+    def output(self, site):
+        """Returns the report data for a binding site, gathered only once for all formats"""
+        if site not in self.outputs:
+            with profiling.stage('textoutput'):
+                self.outputs[site] = TextOutput(self.mol.interaction_sets[site])
+        return self.outputs[site]
+
+    def construct_xml_tree(self):
+        """Construct the basic XML tree with one element for each binding site"""
+        import lxml.etree as et
+        report = et.Element('report')
+        plipversion = et.SubElement(report, 'plipversion')
+        plipversion.text = self.version
+        pdbid = et.SubElement(report, 'pdbid')
+        pdbid.text = self.pdbid
+        for i, site in enumerate(sorted(self.mol.interaction_sets)):
+            s = self.mol.interaction_sets[site]
+            bindingsite = self.output(site).generate_xml()
+            bindingsite.set('id', str(i+1))
+            bindingsite.set('has_interactions', 'False' if s.no_interactions else 'True')
+            report.insert(i+1, bindingsite)
+        return report
+
+    def construct_txt_file(self):
+        """Construct the lines of the rST report with one section for each binding site"""
+        textlines = txt_header(self.pdbid, self.version)
+        for site in sorted(self.mol.interaction_sets):
+            s = self.mol.interaction_sets[site]
+            for itype in self.output(site).generate_rst():
+                textlines.append(itype)
+            if s.no_interactions:
+                textlines.append('No interactions detected.')
+        return textlines
+
+    def generate_json(self):
+        """Generates a dictionary with the results for all binding sites, suitable for JSON serialization. The
+        binding sites are given as in the JSON Lines report."""
+        return {'plipversion': self.version, 'pdbid': self.pdbid,
+                'bindingsites': [site_record(self.pdbid, self.version, i + 1, self.output(site),
+                                             self.mol.interaction_sets[site])
+                                 for i, site in enumerate(sorted(self.mol.interaction_sets))]}
+
+    def write_xml(self, outpath, compact=False):
+        """Write the XML report to the output folder"""
+        with atomic_write('%s/report.xml' % outpath) as f:
+            self.stream_xml(f, compact)
+
+    def write_txt(self, outpath):
+        """Write the rST report to the output folder"""
+        with atomic_write('%s/report.rst.txt' % outpath) as f:
+            self.stream_txt(f)
+
+    def stream_xml(self, f, compact=False):
+        """Write the XML report to an open file, e.g. sys.stdout"""
+        self.stream(xml=f, compact=compact)
+
+    def stream_txt(self, f):
+        """Write the rST report to an open file, e.g. sys.stdout"""
+        self.stream(txt=f)
+
+    def stream_jsonl(self, f):
+        """Write the JSON Lines report with one line for each binding site to an open file"""
+        self.stream(jsonl=f)
+
+    def stream(self, txt=None, xml=None, compact=False, jsonl=None):
+        """Write the rST, XML and/or JSON Lines report to open files, site by site"""
+        writer = ReportWriter(self.version, txt, xml, compact, jsonl)
+        for site in sorted(self.mol.interaction_sets):
+            writer.add_site(self.mol, site, self.mol.interaction_sets[site])
+        writer.finish(self.mol)
 
 
 class TextOutput():
-    """Gather report data and generate reports for one binding site in different formats"""
+    """Gather report data and generate reports for one binding site in different formats. The data is gathered only
+    once and kept as raw numbers, which are formatted by each of the report generators."""
     def __init__(self, pli_class):
 
         ################
@@ -34,9 +331,11 @@ class TextOutput():
         ################
 
         self.output_path = pli_class.output_path
-        self.name = pli_class.name
+        residue_ids = pli_class.residue_ids  # Original IDs of residues renamed for mmCIF input
+        self.name = original_site(residue_ids, pli_class.name)
         self.pdbid = pli_class.pdbid.upper()
-        self.lig_members = pli_class.lig_members
+        self.lig_members = [(hetid, ) + original_residue(residue_ids, chain, resnr)
+                            for hetid, chain, resnr in pli_class.lig_members]
         mapping = pli_class.idx_to_pdb
         lig_to_pdb = {key: mapping[pli_class.lig_to_pdb[key]] for key in pli_class.lig_to_pdb}  # Atom mapping ligand
         self.header = ['#PREDICTION OF NONCOVALENT INTERACTIONS FOR %s:%s' % (self.pdbid, self.name),
@@ -50,7 +349,7 @@ class TextOutput():
                                      'PROTCOO')
         self.hydrophobic_info = []
         for hydroph in pli_class.hydrophobic_contacts:
-            self.hydrophobic_info.append((hydroph.resnr, hydroph.restype, hydroph.reschain, '%.2f' % hydroph.distance,
+            self.hydrophobic_info.append((hydroph.resnr, hydroph.restype, hydroph.reschain, hydroph.distance,
                                           lig_to_pdb[hydroph.ligatom.idx], mapping[hydroph.bsatom.idx]
                                           , hydroph.ligatom.coords, hydroph.bsatom.coords))
 
@@ -65,13 +364,13 @@ class TextOutput():
             if hbond.protisdon:
                 donidx, accidx = mapping[hbond.d.idx], lig_to_pdb[hbond.a.idx]
                 self.hbond_info.append((hbond.resnr, hbond.restype, hbond.reschain, hbond.sidechain,
-                                        '%.2f' % hbond.distance_ah, '%.2f' % hbond.distance_ad, '%.2f' % hbond.angle,
+                                        hbond.distance_ah, hbond.distance_ad, hbond.angle,
                                         hbond.protisdon, donidx, hbond.dtype, accidx, hbond.atype, hbond.a.coords,
                                         hbond.d.coords))
             else:
                 donidx, accidx = lig_to_pdb[hbond.d.idx], mapping[hbond.a.idx]
                 self.hbond_info.append((hbond.resnr, hbond.restype, hbond.reschain, hbond.sidechain,
-                                        '%.2f' % hbond.distance_ah, '%.2f' % hbond.distance_ad, '%.2f' % hbond.angle,
+                                        hbond.distance_ah, hbond.distance_ad, hbond.angle,
                                         hbond.protisdon, donidx, hbond.dtype, accidx, hbond.atype, hbond.d.coords,
                                         hbond.a.coords))
 
@@ -88,8 +387,8 @@ class TextOutput():
             else:
                 donidx, accidx = lig_to_pdb[wbridge.d.idx], mapping[wbridge.a.idx]
             self.waterbridge_info.append((wbridge.resnr, wbridge.restype, wbridge.reschain,
-                                          '%.2f' % wbridge.distance_aw, '%.2f' % wbridge.distance_dw,
-                                          '%.2f' % wbridge.d_angle, '%.2f' % wbridge.w_angle, wbridge.protisdon,
+                                          wbridge.distance_aw, wbridge.distance_dw,
+                                          wbridge.d_angle, wbridge.w_angle, wbridge.protisdon,
                                           donidx, wbridge.dtype, accidx, wbridge.atype, mapping[wbridge.water.idx]))
 
         ################
@@ -102,12 +401,12 @@ class TextOutput():
         for sb in pli_class.saltbridge_lneg+pli_class.saltbridge_pneg:
             if sb.protispos:
                 group, ids = sb.negative.fgroup, [str(lig_to_pdb[x.idx]) for x in sb.negative.atoms]
-                self.saltbridge_info.append((sb.resnr, sb.restype, sb.reschain, '%.2f' % sb.distance, sb.protispos,
+                self.saltbridge_info.append((sb.resnr, sb.restype, sb.reschain, sb.distance, sb.protispos,
                                              group.capitalize(), ",".join(ids),
                                              tuple(sb.negative.center), tuple(sb.positive.center)))
             else:
                 group, ids = sb.positive.fgroup, [str(lig_to_pdb[x.idx]) for x in sb.positive.atoms]
-                self.saltbridge_info.append((sb.resnr, sb.restype, sb.reschain, '%.2f' % sb.distance, sb.protispos,
+                self.saltbridge_info.append((sb.resnr, sb.restype, sb.reschain, sb.distance, sb.protispos,
                                              group.capitalize(), ",".join(ids),
                                              tuple(sb.positive.center), tuple(sb.negative.center)))
 
@@ -120,8 +419,8 @@ class TextOutput():
         self.pistacking_info = []
         for stack in pli_class.pistacking:
             ids = [str(lig_to_pdb[x.idx]) for x in stack.ligandring.atoms]
-            self.pistacking_info.append((stack.resnr, stack.restype, stack.reschain, '%.2f' % stack.distance,
-                                         '%.2f' % stack.angle, '%.2f' % stack.offset, stack.type, ",".join(ids)
+            self.pistacking_info.append((stack.resnr, stack.restype, stack.reschain, stack.distance,
+                                         stack.angle, stack.offset, stack.type, ",".join(ids)
                                          , tuple(stack.ligandring.center), tuple(stack.proteinring.center)))
 
         ##########################
@@ -135,14 +434,14 @@ class TextOutput():
             if picat.protcharged:
                 ids = [str(lig_to_pdb[x.idx]) for x in picat.ring.atoms]
                 group = 'Aromatic'
-                self.pication_info.append((picat.resnr, picat.restype, picat.reschain, '%.2f' % picat.distance,
-                                           '%.2f' % picat.offset, picat.protcharged, group, ",".join(ids),
+                self.pication_info.append((picat.resnr, picat.restype, picat.reschain, picat.distance,
+                                           picat.offset, picat.protcharged, group, ",".join(ids),
                                            tuple(picat.ring.center), tuple(picat.charge.center)))
             else:
                 ids = [str(lig_to_pdb[x.idx]) for x in picat.charge.atoms]
                 group = picat.charge.fgroup
-                self.pication_info.append((picat.resnr, picat.restype, picat.reschain, '%.2f' % picat.distance,
-                                           '%.2f' % picat.offset, picat.protcharged, group, ",".join(ids),
+                self.pication_info.append((picat.resnr, picat.restype, picat.reschain, picat.distance,
+                                           picat.offset, picat.protcharged, group, ",".join(ids),
                                            tuple(picat.charge.center), tuple(picat.ring.center)))
 
         #################
@@ -153,60 +452,39 @@ class TextOutput():
                                  'DONORTYPE', 'ACC_IDX', 'ACCEPTORTYPE', 'LIGCOO', 'PROTCOO')
         self.halogen_info = []
         for halogen in pli_class.halogen_bonds:
-            self.halogen_info.append((halogen.resnr, halogen.restype, halogen.reschain, '%.2f' % halogen.distance,
-                                      '%.2f' % halogen.don_angle, '%.2f' % halogen.acc_angle,
+            self.halogen_info.append((halogen.resnr, halogen.restype, halogen.reschain, halogen.distance,
+                                      halogen.don_angle, halogen.acc_angle,
                                       lig_to_pdb[halogen.don.x.idx], halogen.donortype,
                                       mapping[halogen.acc.o.idx], halogen.acctype,
                                       halogen.acc.o.coords, halogen.don.x.coords))
 
+        # Sort results first by res number, then by chain and finally ligand coordinates to get a unique order
+        self.sections = []
+        for title, name, prefix in SECTIONS:
+            info = [original_contact(residue_ids, contact) for contact in getattr(self, '%s_info' % prefix)]
+            info = sorted(info, key=itemgetter(0, 2, -2))
+            setattr(self, '%s_info' % prefix, info)
+            self.sections.append((title, name, getattr(self, '%s_features' % prefix), info))
+
     def write_section(self, name, features, info, f):
         """Provides formatting for one section (e.g. hydrogen bonds)"""
         if not len(info) == 0:
             f.write('\n\n### %s ###\n' % name)
             f.write('%s\n' % '\t'.join(features))
             for line in info:
-                f.write('%s\n' % '\t'.join(map(str, line)))
+                f.write('%s\n' % '\t'.join(map(formatted, line)))
 
     def rst_table(self, array):
         """Given an array, the function formats and returns and table in rST format."""
         # Determine cell width for each column
-        cell_dict = {}
+        widths = [max(len(row[j]) for row in array) + 1 for j in range(len(array[0]))]
+        separators = {sign: '+%s+\n' % '+'.join((width + 1) * sign for width in widths) for sign in '-='}
+        lines = [separators['-']]
         for i, row in enumerate(array):
-            for j, val in enumerate(row):
-                if j not in cell_dict:
-                    cell_dict[j] = []
-                cell_dict[j].append(val)
-        for item in cell_dict:
-            cell_dict[item] = max([len(x) for x in cell_dict[item]])+1  # Contains adapted width for each column
-
-        # Format top line
-        num_cols = len(array[0])
-        form = '+'
-        for col in range(num_cols):
-            form += (cell_dict[col]+1)*'-'
-            form += '+'
-        form += '\n'
-
-        # Format values
-        for i, row in enumerate(array):
-            form += '| '
-            for j, val in enumerate(row):
-                cell_width = cell_dict[j]
-                form += str(val) + (cell_width - len(val)) * ' ' + '| '
-            form.rstrip()
-            form += '\n'
-
-            # Seperation lines
-            form += '+'
-            if i == 0:
-                sign = '='
-            else:
-                sign = '-'
-            for col in range(num_cols):
-                form += (cell_dict[col]+1)*sign
-                form += '+'
-            form += '\n'
-        return form
+            cells = ['%s%s| ' % (val, (width - len(val)) * ' ') for val, width in zip(row, widths)]
+            lines.append('| %s\n' % ''.join(cells))
+            lines.append(separators['=' if i == 0 else '-'])  # Header is separated by a double line
+        return ''.join(lines)
 
     def generate_rst(self):
         """Generates an flat text report for a single binding site"""
@@ -215,16 +493,7 @@ class TextOutput():
         for i, member in enumerate(sorted(self.lig_members)[1:]):
             txt.append('  + %s' % "-".join(str(element) for element in member))
         txt.append("-"*len(self.name))
-        for section in [['Hydrophobic Interactions', self.hydrophobic_features, self.hydrophobic_info],
-                        ['Hydrogen Bonds', self.hbond_features, self.hbond_info],
-                        ['Water Bridges', self.waterbridge_features, self.waterbridge_info],
-                        ['Salt Bridges', self.saltbridge_features, self.saltbridge_info],
-                        ['pi-Stacking', self.pistacking_features, self.pistacking_info],
-                        ['pi-Cation Interactions', self.pication_features, self.pication_info],
-                        ['Halogen Bonds', self.halogen_features, self.halogen_info]]:
-            iname, features, interaction_information = section
-            # Sort results first by res number, then by distance and finally ligand coordinates to get a unique order
-            interaction_information = sorted(interaction_information, key=itemgetter(0, 2, -2))
+        for iname, _, features, interaction_information in self.sections:
             if not len(interaction_information) == 0:
 
                 txt.append('\n**%s**' % iname)
@@ -232,20 +501,33 @@ class TextOutput():
                 for single_contact in interaction_information:
                     values = []
                     for x in single_contact:
-                        if type(x) == str:
-                            values.append(x)
-                        elif type(x) == tuple and len(x) == 3:  # Coordinates
+                        if type(x) == tuple and len(x) == 3:  # Coordinates
                             values.append("%.3f, %.3f, %.3f" % x)
                         else:
-                            values.append(str(x))
+                            values.append(formatted(x))
                     table.append(values)
                 txt.append(self.rst_table(table))
         txt.append('\n')
 
         return txt
 
-    def generate_xml(self):
-        """Generates an XML-formatted report for a single binding site"""
+    def generate_record(self):
+        """Generates a dictionary with all information on a single binding site with numbers instead of formatted
+        values, e.g. for the JSON Lines report"""
+        hetid, chain, position = self.name.split('-')
+        record = {'bsid': self.name, 'hetid': hetid, 'chain': chain, 'position': int(position),
+                  'composite': len(self.lig_members) > 1,
+                  'members': ["-".join(str(element) for element in member) for member in sorted(self.lig_members)],
+                  'interactions': {}}
+        for _, name, features, info in self.sections:
+            record['interactions'][name] = [{feature.lower(): raw(feature, value)
+                                             for feature, value in zip(features, contact)} for contact in info]
+        return record
+
+    def generate_xml(self, compact=False):
+        """Generates an XML-formatted report for a single binding site. In compact mode, coordinates are given as
+        attributes instead of subelements."""
+        import lxml.etree as et
         report = et.Element('bindingsite')
         identifiers = et.SubElement(report, 'identifiers')
         hetid = et.SubElement(identifiers, 'hetid')
@@ -264,8 +546,6 @@ class TextOutput():
         def format_interactions(element_name, features, interaction_information):
             """Returns a formatted element with interaction information."""
             interaction = et.Element(element_name)
-            # Sort results first by res number, then by distance and finally ligand coordinates to get a unique order
-            interaction_information = sorted(interaction_information, key=itemgetter(0, 2, -2))
             for j, single_contact in enumerate(interaction_information):
                 new_contact = et.SubElement(interaction, element_name[:-1], id=str(j+1))
                 for i, feature in enumerate(single_contact):
@@ -275,6 +555,9 @@ class TextOutput():
                         for k, atm_idx in enumerate(feature.split(',')):
                             idx = et.SubElement(feat, 'idx', id=str(k+1))
                             idx.text = str(atm_idx)
+                    elif features[i] in ['LIGCOO', 'PROTCOO'] and compact:
+                        et.SubElement(new_contact, features[i].lower(), x='%.3f' % feature[0], y='%.3f' % feature[1],
+                                      z='%.3f' % feature[2])
                     elif features[i] in ['LIGCOO', 'PROTCOO']:
                         feat = et.SubElement(new_contact, features[i].lower())
                         xc, yc, zc = feature
@@ -286,15 +569,9 @@ class TextOutput():
                         zcoo.text = '%.3f' % zc
                     else:
                         feat = et.SubElement(new_contact, features[i].lower())
-                        feat.text = str(feature)
+                        feat.text = formatted(feature)
             return interaction
 
-        interactions.append(format_interactions('hydrophobic_interactions', self.hydrophobic_features,
-                                                self.hydrophobic_info))
-        interactions.append(format_interactions('hydrogen_bonds', self.hbond_features, self.hbond_info))
-        interactions.append(format_interactions('water_bridges', self.waterbridge_features, self.waterbridge_info))
-        interactions.append(format_interactions('salt_bridges', self.saltbridge_features, self.saltbridge_info))
-        interactions.append(format_interactions('pi_stacks', self.pistacking_features, self.pistacking_info))
-        interactions.append(format_interactions('pi_cation_interactions', self.pication_features, self.pication_info))
-        interactions.append(format_interactions('halogen_bonds', self.halogen_features, self.halogen_info))
+        for _, name, features, info in self.sections:
+            interactions.append(format_interactions(name, features, info))
         return report
\ No newline at end of file
@@ -0,0 +1,309 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+serialization.py - Convert PLIP results into plain Python objects without OpenBabel references.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import json
+import time
+import zlib
+import struct
+from types import InstanceType
+from collections import namedtuple
+
+# Own modules
+from supplemental import whichrestype, whichresnumber, whichchain, open_structure
+
+# External libraries
+import numpy as np
+from pybel import Atom
+
+
+# Lightweight replacement for Pybel atoms, keeps everything needed for reports and visualization
+AtomRecord = namedtuple('AtomRecord', 'idx coords type atomicnum restype resnr reschain')
+# Replacement for the ligand object of a binding site
+LigandRecord = namedtuple('LigandRecord', 'name members pymol_data centroid water')
+# Transport format for the namedtuples created dynamically in detection.py and preparation.py
+DetachedTuple = namedtuple('DetachedTuple', 'typename fields values')
+
+# Attributes of PLInteraction objects holding lists of interactions
+INTERACTION_LISTS = ['saltbridge_lneg', 'saltbridge_pneg', 'all_hbonds_ldon', 'all_hbonds_pdon', 'hbonds_ldon',
+                     'hbonds_pdon', 'pistacking', 'all_pi_cation_laro', 'pication_paro', 'pication_laro',
+                     'all_hydrophobic_contacts', 'hydrophobic_contacts', 'halogen_bonds', 'water_bridges']
+
+_tuple_types = {}  # Cache for namedtuple classes rebuilt by attach()
+
+# Files with interaction sets start with the magic string, the format version and the length of a JSON header. The
+# header is followed by a compressed stream with the interaction sets as JSON and the arrays listed in the header
+# (atom table and atom mapping). The file holds data only, no code is run when reading it. Increase the version for
+# any change of the format.
+SETS_MAGIC = 'PLIPSETS'
+SETS_VERSION = 3
+SETS_HEADER = struct.Struct('<8sHI')
+SETS_FILE = 'interactions.plipsets'
+
+
+def atom_record(atom):
+    """Returns an AtomRecord for a Pybel atom."""
+    return AtomRecord(idx=atom.idx, coords=tuple(atom.coords), type=atom.type, atomicnum=atom.atomicnum,
+                      restype=whichrestype(atom), resnr=whichresnumber(atom), reschain=whichchain(atom))
+
+
+def detach(obj):
+    """Recursively converts PLIP result data into picklable objects. Pybel atoms are replaced by AtomRecords,
+    namedtuples by DetachedTuples and all other OpenBabel objects (e.g. rings) by None."""
+    if obj is None or isinstance(obj, (bool, int, long, float, str, unicode, np.ndarray, np.generic)):
+        return obj
+    if isinstance(obj, Atom):
+        return atom_record(obj)
+    if isinstance(obj, DetachedTuple):
+        return obj
+    if isinstance(obj, (AtomRecord, LigandRecord)):
+        return type(obj)(*[detach(value) for value in obj])
+    if isinstance(obj, tuple) and hasattr(obj, '_fields'):
+        return DetachedTuple(typename=type(obj).__name__, fields=tuple(obj._fields),
+                             values=tuple(detach(value) for value in obj))
+    if isinstance(obj, tuple):
+        return tuple(detach(value) for value in obj)
+    if isinstance(obj, list):
+        return [detach(value) for value in obj]
+    if isinstance(obj, dict):
+        return {key: detach(value) for key, value in obj.items()}
+    return None  # SWIG proxies can't be transferred
+
+
+def attach(obj):
+    """Reverses detach(), rebuilding the original namedtuple types. Atoms stay AtomRecords."""
+    if isinstance(obj, DetachedTuple):
+        key = (obj.typename, obj.fields)
+        if key not in _tuple_types:
+            _tuple_types[key] = namedtuple(obj.typename, obj.fields)
+        return _tuple_types[key](*[attach(value) for value in obj.values])
+    if isinstance(obj, (AtomRecord, LigandRecord)):
+        return type(obj)(*[attach(value) for value in obj])
+    if isinstance(obj, tuple):
+        return tuple(attach(value) for value in obj)
+    if isinstance(obj, list):
+        return [attach(value) for value in obj]
+    if isinstance(obj, dict):
+        return {key: attach(value) for key, value in obj.items()}
+    return obj
+
+
+class DetachedInteraction():
+    """Stand-in for a PLInteraction object which holds no OpenBabel objects. Provides the same attributes used
+    for report generation and visualization."""
+
+    def __init__(self, pli):
+        self.name = pli.name
+        self.lig_members = pli.lig_members
+        self.pdbid = pli.pdbid
+        self.idx_to_pdb = pli.idx_to_pdb
+        self.lig_to_pdb = pli.lig_to_pdb
+        self.output_path = pli.output_path
+        self.altconf = pli.altconf
+        self.residue_ids = pli.residue_ids
+        self.no_interactions = pli.no_interactions
+        self.bindingsite = None
+        ligand = pli.ligand
+        self.ligand = LigandRecord(name=ligand.name, members=ligand.members, pymol_data=ligand.pymol_data,
+                                   centroid=list(ligand.centroid), water=[atom_record(w) for w in ligand.water])
+        self.ligand = attach(detach(self.ligand))
+        for attr in INTERACTION_LISTS:
+            setattr(self, attr, attach(detach(getattr(pli, attr))))
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for attr in INTERACTION_LISTS + ['ligand']:
+            state[attr] = detach(state[attr])
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for attr in INTERACTION_LISTS + ['ligand']:
+            setattr(self, attr, attach(getattr(self, attr)))
+
+
+class DetachedComplex():
+    """Stand-in for a PDBComplex object with detached interaction sets. Can be pickled and used for report
+    generation and visualization without OpenBabel."""
+
+    def __init__(self, mol):
+        self.pymol_name = mol.pymol_name
+        self.idx_to_pdb_mapping = mol.idx_to_pdb_mapping
+        self.altconf = mol.altconf
+        self.residue_ids = mol.residue_ids
+        self.sourcefiles = dict(mol.sourcefiles)
+        self.input_format = mol.input_format
+        self.output_path = mol.output_path
+        self.interaction_sets = {}
+        for site, pli in mol.interaction_sets.items():
+            self.interaction_sets[site] = pli if isinstance(pli, DetachedInteraction) else DetachedInteraction(pli)
+
+
+def embedded(mol):
+    """Returns a DetachedComplex of the complex holding the content of the structure file instead of its path, so it
+    can be visualized without the input file."""
+    detached = DetachedComplex(mol)
+    if detached.sourcefiles.get('pdbcomplex') is not None:
+        with open_structure(detached.sourcefiles['pdbcomplex']) as f:
+            detached.sourcefiles['pdbstring'] = f.read()
+        detached.sourcefiles['pdbcomplex'] = None
+    return detached
+
+
+def encode(obj, atoms, tuples):
+    """Converts detached data (see detach()) into JSON values. Containers other than lists are tagged, AtomRecords
+    refer to their position in the atom table and namedtuples to their type in the type table."""
+    if obj is None or isinstance(obj, (bool, int, long, float, str, unicode)):
+        return obj
+    if isinstance(obj, AtomRecord):
+        if obj not in atoms:
+            atoms[obj] = len(atoms)
+        return {'a': atoms[obj]}
+    if isinstance(obj, LigandRecord):
+        return {'l': [encode(value, atoms, tuples) for value in obj]}
+    if isinstance(obj, DetachedTuple):
+        key = (obj.typename, obj.fields)
+        if key not in tuples:
+            tuples[key] = len(tuples)
+        return {'n': [tuples[key], [encode(value, atoms, tuples) for value in obj.values]]}
+    if isinstance(obj, tuple):
+        return {'t': [encode(value, atoms, tuples) for value in obj]}
+    if isinstance(obj, list):
+        return [encode(value, atoms, tuples) for value in obj]
+    if isinstance(obj, dict):
+        return {'d': [[encode(key, atoms, tuples), encode(value, atoms, tuples)] for key, value in obj.items()]}
+    if isinstance(obj, np.ndarray) and obj.dtype.kind in 'biuf':
+        return {'x': [obj.dtype.str, list(obj.shape), obj.ravel().tolist()]}
+    if isinstance(obj, np.generic) and obj.dtype.kind in 'biuf':
+        return {'g': [obj.dtype.str, obj.item()]}
+    raise TypeError('Objects of type %s can\'t be saved.' % type(obj).__name__)
+
+
+def decode(value, atoms, tuples):
+    """Reverses encode(), given the atom table and the namedtuple types."""
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, list):
+        return [decode(item, atoms, tuples) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) != 1:
+        raise ValueError('Unknown value %r' % value)
+    tag, content = value.items()[0]
+    if tag == 'a':
+        return atoms[content]
+    if tag == 'l':
+        return LigandRecord(*decode(content, atoms, tuples))
+    if tag == 'n':
+        return tuples[content[0]](*decode(content[1], atoms, tuples))
+    if tag == 't':
+        return tuple(decode(content, atoms, tuples))
+    if tag == 'd':
+        return {decode(key, atoms, tuples): decode(item, atoms, tuples) for key, item in content}
+    if tag == 'x':
+        return np.array(content[2], dtype=np.dtype(str(content[0]))).reshape(content[1])
+    if tag == 'g':
+        return np.dtype(str(content[0])).type(content[1])
+    raise ValueError('Unknown value %r' % value)
+
+
+def text(value):
+    return value.encode('utf-8') if isinstance(value, unicode) else value
+
+
+def site_state(pli):
+    """Returns the attributes of a binding site without those shared with the complex (atom mapping, alternate
+    conformations and renamed residues), which are written only once and restored by load_sets()."""
+    state = dict(pli.__dict__)
+    for name in ['idx_to_pdb', 'altconf', 'residue_ids']:
+        state.pop(name, None)
+    return state
+
+
+def dump_sets(mol, f, version=None, embed=True):
+    """Writes the interaction sets of a complex to a binary file object, see load_sets(). With embed=True, the
+    structure itself is included, so the file can be visualized without the input file."""
+    detached = embedded(mol) if embed else DetachedComplex(mol)
+    atoms, tuples = {}, {}
+    state = dict(detached.__dict__)
+    mapping, sites = state.pop('idx_to_pdb_mapping'), state.pop('interaction_sets')
+    body = {'complex': encode(state, atoms, tuples),
+            'sites': [[site, encode(detach(site_state(sites[site])), atoms, tuples)] for site in sorted(sites)]}
+    body['types'] = [[typename, list(fields)] for typename, fields in sorted(tuples, key=tuples.get)]
+    records = sorted(atoms, key=atoms.get)
+    body['atoms'] = {'type': [atom.type for atom in records], 'restype': [atom.restype for atom in records],
+                     'reschain': [atom.reschain for atom in records]}
+    arrays = [('atom_idx', np.array([atom.idx for atom in records], dtype='<i8')),
+              ('atom_coords', np.array([atom.coords for atom in records], dtype='<f8').reshape(-1, 3)),
+              ('atom_atomicnum', np.array([atom.atomicnum for atom in records], dtype='<i8')),
+              ('atom_resnr', np.array([atom.resnr for atom in records], dtype='<i8')),
+              ('mapping', np.array(sorted(mapping.items()), dtype='<i8').reshape(-1, 2))]
+    data = json.dumps(body, separators=(',', ':'))
+    header = json.dumps({'plipversion': version, 'pdbid': detached.pymol_name.upper(), 'sites': sorted(sites),
+                         'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'body': len(data),
+                         'arrays': [[name, array.dtype.str, list(array.shape)] for name, array in arrays]})
+    f.write(SETS_HEADER.pack(SETS_MAGIC, SETS_VERSION, len(header)))
+    f.write(header)
+    compressor = zlib.compressobj(6)
+    f.write(compressor.compress(data))
+    for _, array in arrays:
+        f.write(compressor.compress(array.tobytes()))
+    f.write(compressor.flush())
+
+
+def load_sets(f):
+    """Reads interaction sets written with dump_sets() from a binary file object. Returns the header (PLIP version,
+    PDB ID, binding sites) and the DetachedComplex, which can be used for reports and visualization. Raises
+    ValueError for other files, other format versions and damaged files."""
+    start = f.read(SETS_HEADER.size)
+    if len(start) < SETS_HEADER.size or not start.startswith(SETS_MAGIC):
+        raise ValueError('Not a file with interaction sets.')
+    _, version, length = SETS_HEADER.unpack(start)
+    if version != SETS_VERSION:
+        raise ValueError('Interaction sets have format version %i, this version of PLIP reads version %i.'
+                         % (version, SETS_VERSION))
+    try:
+        header = json.loads(f.read(length))
+        data = zlib.decompress(f.read())
+        body, offset, arrays = json.loads(data[:header['body']]), header['body'], {}
+        for name, dtype, shape in header['arrays']:
+            if dtype not in ('<i8', '<f8'):
+                raise ValueError('Unknown type %s' % dtype)
+            size = 8 * int(np.prod(shape))
+            arrays[name] = np.frombuffer(data[offset:offset + size], dtype=str(dtype)).reshape(shape)
+            offset += size
+        tuples = []
+        for typename, fields in body['types']:
+            key = (str(typename), tuple(str(field) for field in fields))
+            if key not in _tuple_types:
+                _tuple_types[key] = namedtuple(*key)  # Checks that the names are valid identifiers
+            tuples.append(_tuple_types[key])
+        columns = [arrays['atom_idx'].tolist(), [tuple(coords) for coords in arrays['atom_coords'].tolist()],
+                   [text(atomtype) for atomtype in body['atoms']['type']], arrays['atom_atomicnum'].tolist(),
+                   [text(restype) for restype in body['atoms']['restype']], arrays['atom_resnr'].tolist(),
+                   [text(reschain) for reschain in body['atoms']['reschain']]]
+        atoms = [AtomRecord(*values) for values in zip(*columns)]
+        mol = InstanceType(DetachedComplex, decode(body['complex'], atoms, tuples))
+        mol.idx_to_pdb_mapping = dict(arrays['mapping'].tolist())
+        mol.interaction_sets = {text(site): InstanceType(DetachedInteraction, decode(state, atoms, tuples))
+                                for site, state in body['sites']}
+        for pli in mol.interaction_sets.values():  # Shared with the complex as in characterize_site_detached()
+            pli.idx_to_pdb, pli.altconf, pli.residue_ids = mol.idx_to_pdb_mapping, mol.altconf, mol.residue_ids
+    except (zlib.error, KeyError, IndexError, TypeError, ValueError) as e:
+        raise ValueError('Damaged file with interaction sets (%s).' % e)
+    return header, mol
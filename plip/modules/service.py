@@ -0,0 +1,245 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+service.py - Long-running PLIP service answering analysis requests over HTTP.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import os
+import json
+import signal
+import itertools
+import threading
+import multiprocessing
+import BaseHTTPServer
+import SocketServer
+from urlparse import urlparse, parse_qs
+
+# Own modules
+from preparation import *
+from report import StructureReport
+
+# External libraries
+import lxml.etree as et
+
+
+def warm_up():
+    """Loads the OpenBabel format plugins once, so forked workers don't have to do it for every job."""
+    pybel.ob.obErrorLog.StopLogging()  # Suppress all OpenBabel warnings
+    obc = pybel.ob.OBConversion()
+    obc.SetInFormat('pdb')
+    obc.ReadString(pybel.ob.OBMol(), 'ATOM      1  CA  GLY A   1       0.000   0.000   0.000  1.00  0.00           C\n')
+
+
+_started = None  # Queue for reporting the start of jobs, inherited by the workers, see PLIPService
+
+
+def init_worker(started):
+    global _started
+    _started = started
+
+
+def analyze_structure(pdbstring, name, version, output_format, settings=None):
+    """Job function for the worker processes. Analyzes a structure given as a string in PDB format and returns the
+    report in XML or JSON format. The structure is analyzed in memory, the name is used as PDB ID if there is no
+    HEADER."""
+    mol = PDBComplex(settings)
+    try:
+        mol.load_pdb(pdbstring, as_string=True, name='%s.pdb' % name)
+    except SystemExit:  # Unreadable input must not end the worker process
+        raise ValueError('Input could not be read by OpenBabel.')
+    report = StructureReport(mol, version)
+    if output_format == 'json':
+        return json.dumps(report.generate_json())
+    return et.tostring(report.construct_xml_tree(), pretty_print=True, xml_declaration=True)
+
+
+def run_analysis(job, *args):
+    """Job function of the workers, reports the worker process of the job before analyzing the structure."""
+    _started.put((job, os.getpid()))
+    return analyze_structure(*args)
+
+
+class PLIPService():
+    """Runs analysis jobs in a fixed pool of worker processes, which are forked when the service is created. At that
+    time, all modules are imported and OpenBabel is loaded, and the HTTP server has not started its request threads
+    yet, so the workers don't inherit locks held by other threads. Up to the given number of jobs run at once,
+    further jobs wait. A job exceeding the time limit is stopped by killing its worker, which is replaced by the pool.
+    Replacements are forked while requests are served, but from the pool's own thread, and they only run analysis
+    jobs, which use none of the locks of the request threads."""
+
+    def __init__(self, version, workers=None, timeout=None, settings=None):
+        self.version = version
+        self.settings = settings  # Thresholds for all jobs, defaults from the config module if None
+        self.workers = multiprocessing.cpu_count() if workers is None else workers
+        self.timeout = timeout  # Maximum time (in seconds) for a single analysis
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.workers)
+        self.pending, self.completed, self.failed = 0, 0, 0
+        self.jobs = itertools.count()  # Numbers of the jobs
+        self.running = {}  # Worker process of each running job
+        self.stopped = set()  # Jobs which exceeded the time limit before their start was reported
+        self.finished = set()  # Jobs which finished before their start was reported
+        warm_up()
+        self.started = multiprocessing.Queue()
+        self.pool = multiprocessing.Pool(self.workers, init_worker, (self.started, ))
+        self.tracker = threading.Thread(target=self.track_jobs)
+        self.tracker.daemon = True
+        self.tracker.start()
+
+    def analyze(self, pdbstring, name='structure', output_format='xml'):
+        """Runs a job in one of the workers and blocks until the report is available. At most one job per worker is
+        submitted, so the time limit applies from the start of the job. The worker is stopped if it is exceeded."""
+        with self.lock:
+            self.pending += 1
+        try:
+            with self.slots:
+                report = self.run_job(pdbstring, name, output_format)
+        except:
+            with self.lock:
+                self.failed += 1
+            raise
+        else:
+            with self.lock:
+                self.completed += 1
+        finally:
+            with self.lock:
+                self.pending -= 1
+        return report
+
+    def run_job(self, pdbstring, name, output_format):
+        with self.lock:
+            job = next(self.jobs)
+        result = self.pool.apply_async(run_analysis, (job, pdbstring, name, self.version, output_format,
+                                                      self.settings))
+        try:
+            report = result.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            self.stop_job(job)  # Otherwise the worker would go on with a job exceeding the time limit
+            raise
+        except:  # Errors of the analysis are raised in the request thread
+            self.end_job(job)
+            raise
+        self.end_job(job)
+        return report
+
+    def end_job(self, job):
+        """Forgets the worker of a finished job."""
+        with self.lock:
+            if self.running.pop(job, None) is None:  # Start not reported yet
+                self.finished.add(job)
+
+    def track_jobs(self):
+        """Records the worker process of each started job, until the service is shut down."""
+        while True:
+            job, pid = self.started.get()
+            if job is None:
+                return
+            with self.lock:
+                if job in self.finished:
+                    self.finished.discard(job)
+                    continue
+                if job not in self.stopped:
+                    self.running[job] = pid
+                    continue
+                self.stopped.discard(job)
+            os.kill(pid, signal.SIGTERM)
+
+    def stop_job(self, job):
+        """Kills the worker of a job, or marks the job to be killed as soon as its start is reported."""
+        with self.lock:
+            pid = self.running.pop(job, None)
+            if pid is None:
+                self.stopped.add(job)
+                return
+        os.kill(pid, signal.SIGTERM)
+
+    def status(self):
+        """Returns the queue depth and job counters."""
+        with self.lock:
+            return {'workers': self.workers, 'pending': self.pending, 'running': min(self.pending, self.workers),
+                    'queued': max(0, self.pending - self.workers), 'completed': self.completed,
+                    'failed': self.failed, 'plipversion': self.version}
+
+    def shutdown(self):
+        self.pool.terminate()
+        self.started.put((None, None))
+        self.pool.join()
+
+
+class ServiceRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers GET /status and POST /analyze?format=xml|json&name=<pdbid> with the structure as request body."""
+
+    def send_result(self, code, body, content_type):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/status':
+            self.send_result(200, json.dumps(self.server.service.status()), 'application/json')
+        else:
+            self.send_result(404, 'Unknown resource\n', 'text/plain')
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/analyze':
+            self.send_result(404, 'Unknown resource\n', 'text/plain')
+            return
+        query = parse_qs(url.query)
+        output_format = query.get('format', ['xml'])[0]
+        name = extract_pdbid(query.get('name', ['structure'])[0])
+        if output_format not in ('xml', 'json'):
+            self.send_result(400, 'Output format has to be xml or json\n', 'text/plain')
+            return
+        pdbstring = self.rfile.read(int(self.headers.getheader('Content-Length', 0)))
+        if len(pdbstring) == 0:
+            self.send_result(400, 'Empty PDB file\n', 'text/plain')
+            return
+        try:
+            report = self.server.service.analyze(pdbstring, name, output_format)
+        except ValueError as e:
+            self.send_result(400, '%s\n' % e, 'text/plain')
+        except multiprocessing.TimeoutError:
+            self.send_result(504, 'Analysis exceeded the time limit\n', 'text/plain')
+        except Exception as e:
+            self.send_result(500, 'Analysis failed: %s\n' % e, 'text/plain')
+        else:
+            self.send_result(200, report, 'application/json' if output_format == 'json' else 'application/xml')
+
+    def log_message(self, form, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, form, *args)
+
+
+class ServiceHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """HTTP server handling each request in its own thread, so that several jobs can wait for workers at once."""
+    daemon_threads = True
+
+
+def serve(service, host='127.0.0.1', port=8080, verbose=False):
+    """Runs the HTTP interface of the service until interrupted."""
+    server = ServiceHTTPServer((host, port), ServiceRequestHandler)
+    server.service = service
+    server.verbose = verbose
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
@@ -21,7 +21,12 @@ from __future__ import print_function
 
 # Python standard library
 import re
+import gzip
+import bz2
+import zlib
+import tempfile
 from collections import namedtuple
+from contextlib import contextmanager
 import os
 from multiprocessing import Process
 if os.name != 'nt':  # Resource module not available for Windows
@@ -34,8 +39,6 @@ import pybel
 from pybel import *
 from openbabel import *
 import numpy as np
-from pymol import cmd
-from pymol import finish_launching
 
 
 def is_biolip_artifact(hetid):
@@ -368,6 +371,56 @@ def tilde_expansion(folder_path):
     return os.path.expanduser(folder_path) if '~' in folder_path else folder_path
 
 
+def compression(path):
+    """Returns 'gzip' or 'bzip2' for compressed files and None for plain files, judging from the file content."""
+    with open(tilde_expansion(path), 'rb') as f:
+        magic = f.read(3)
+    if magic.startswith('\x1f\x8b'):
+        return 'gzip'
+    if magic == 'BZh':
+        return 'bzip2'
+    return None
+
+
+def open_structure(path):
+    """Opens a structure file for reading. Compressed files (.gz, .bz2) are decompressed on the fly while reading."""
+    path = tilde_expansion(path)
+    method = compression(path)
+    if method == 'gzip':
+        return gzip.open(path, 'rb')
+    if method == 'bzip2':
+        return bz2.BZ2File(path, 'rb')
+    return open(path)
+
+
+def decompress(content):
+    """Decompresses a structure given as gzip or bzip2 compressed string. Plain strings are returned unchanged."""
+    if content.startswith('\x1f\x8b'):
+        return zlib.decompress(content, 16 + zlib.MAX_WBITS)
+    if content.startswith('BZh'):
+        return bz2.decompress(content)
+    return content
+
+
+@contextmanager
+def atomic_write(path, mode='w'):
+    """Opens a temporary file in the folder of the given path for writing. The file replaces the target only after
+    writing was completed successfully, so readers and interrupted runs never see partially written files."""
+    path = tilde_expansion(path)
+    folder, filename = os.path.split(path)
+    handle, tmppath = tempfile.mkstemp(dir=folder or '.', prefix='.%s.' % filename)
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(tmppath, 0o666 & ~umask)  # Same permissions as for files created with open()
+    try:
+        with os.fdopen(handle, mode) as f:
+            yield f
+        os.rename(tmppath, path)
+    except:
+        os.remove(tmppath)
+        raise
+
+
 def folder_exists(folder_path):
     """Checks if a folder exists"""
     return os.path.exists(folder_path)
@@ -389,14 +442,18 @@ def cmd_exists(c):
 # PyMOL-specific
 ################
 
+# PyMOL is imported in the functions only, so that runs without visualization don't pay for its startup
+
 
 def object_exists(object_name):
     """Checks if an object exists in the open PyMOL session."""
+    from pymol import cmd
     return object_name in cmd.get_names("objects")
 
 
 def initialize_pymol(options):
     """Initializes PyMOL"""
+    from pymol import cmd, finish_launching
     # Pass standard arguments of function to prevent PyMOL from printing out PDB headers (workaround)
     finish_launching(args=['pymol', options, '-K'])
     cmd.reinitialize()
@@ -406,6 +463,7 @@ def start_pymol(quiet=False, options='-p', run=False):
     """Starts up PyMOL and sets general options. Quiet mode suppresses all PyMOL output.
     Command line options can be passed as the second argument."""
     import pymol
+    from pymol import cmd
     pymol.pymol_argv = ['pymol', '%s' % options] + sys.argv[1:]
     if run:
         initialize_pymol(options)
@@ -416,6 +474,7 @@ def start_pymol(quiet=False, options='-p', run=False):
 def get_bs_coordinates(fil, dist, lig):
     """Load a structure file and get all coordinates from the binding site atoms within
     a defined distance around a specific ligand."""
+    from pymol import cmd
     dist = int(dist)
     cmd.load(fil)
     cmd.select("tmp", "(all within %i of resn %s) and not resn %s" % (dist, lig, lig))
@@ -426,6 +485,7 @@ def get_bs_coordinates(fil, dist, lig):
 
 def standard_settings():
     """Sets up standard settings for a nice visualization."""
+    from pymol import cmd
     cmd.set('bg_rgb', [1.0, 1.0, 1.0])  # White background
     cmd.set('depth_cue', 0)  # Turn off depth cueing (no fog)
     cmd.set('cartoon_side_chain_helper', 1)  # Improve combined visualization of sticks and cartoon
@@ -437,6 +497,7 @@ def standard_settings():
 
 def set_custom_colorset():
     """Defines a colorset with matching colors. Provided by Joachim."""
+    from pymol import cmd
     cmd.set_color('myorange', '[253, 174, 97]')
     cmd.set_color('mygreen', '[171, 221, 164]')
     cmd.set_color('myred', '[215, 25, 28]')
@@ -557,10 +618,11 @@ def getligs(mol, altconf, idx_to_pdb, modres, covalent):
     return ligands
 
 
-def read_pdb(pdbfname, safe=False):
+def read_pdb(pdbfname, safe=False, pdbstring=None):
     """Reads a given PDB file and returns a Pybel Molecule. If requested, do it
     safely to except Open Babel crashes. All bonds are read in as single bonds
-    if requested, saving a lot of time at OpenBabel import."""
+    if requested, saving a lot of time at OpenBabel import.
+    If the content of the file is already available as pdbstring, the file is not read again."""
     global exitcode
     pybel.ob.obErrorLog.StopLogging()  # Suppress all OpenBabel warnings
     if os.name != 'nt':  # Resource module not available for Windows
@@ -582,7 +644,7 @@ def read_pdb(pdbfname, safe=False):
             success = False
             exitcode = 1
     if success:
-        mol = readmol('pdb', pdbfname)  # only read the file iff it was successful before
+        mol = readmol('pdb', pdbfname, string=pdbstring)  # only read the file iff it was successful before
     elif exitcode == 4:
         sys.stderr.write('Error: Input file could not be read by OpenBabel.')
         sys.exit(4)
@@ -592,14 +654,17 @@ def read_pdb(pdbfname, safe=False):
     return mol
 
 
-def readmol(fformat='mol', path=None):
+def readmol(fformat='mol', path=None, string=None):
     """Reads the given molecule file and returns the corresponding Pybel molecule.
-    In contrast to the standard Pybel implementation, the file is closed properly."""
+    In contrast to the standard Pybel implementation, the file is closed properly.
+    Compressed files are decompressed in memory. Alternatively, the content of the file can be given as string."""
     obc = pybel.ob.OBConversion()
     obc.SetInFormat(fformat)
     mol = pybel.ob.OBMol()
-    with open(path) as f:
-        obc.ReadString(mol, str(f.read()))
-        if mol.Empty():
-            sys.exit(4)
+    if string is None:
+        with open_structure(path) as f:
+            string = f.read()
+    obc.ReadString(mol, str(string))
+    if mol.Empty():
+        sys.exit(4)
     return pybel.Molecule(mol)
\ No newline at end of file
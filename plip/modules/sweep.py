@@ -0,0 +1,125 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+sweep.py - Analyze one structure with many threshold settings, detecting interactions only once.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import copy
+import json
+import itertools
+
+# Own modules
+from detection import pication
+import config
+
+# Thresholds which change the binding sites or the detection of rings and charged groups, the same for all settings
+FIXED = ['AROMATIC_PLANARITY', 'BS_DIST']
+# Thresholds for which the largest or smallest value of all settings gives the most candidates
+LOOSEST_MAX = ['HYDROPH_DIST_MAX', 'HBOND_DIST_MAX', 'PISTACK_DIST_MAX', 'PISTACK_ANG_DEV',
+               'PISTACK_OFFSET_MAX', 'PICATION_DIST_MAX', 'SALTBRIDGE_DIST_MAX', 'HALOGEN_DIST_MAX',
+               'WATER_BRIDGE_MAXDIST', 'WATER_BRIDGE_OMEGA_MAX']
+LOOSEST_MIN = ['HBOND_DON_ANGLE_MIN', 'WATER_BRIDGE_MINDIST', 'WATER_BRIDGE_OMEGA_MIN', 'WATER_BRIDGE_THETA_MIN']
+
+
+def read_grid(path, base=None):
+    """Reads threshold settings from a JSON file. The file contains either a list of objects with thresholds, or an
+    object mapping threshold names to lists of values, for which all combinations are used. Thresholds not given
+    are taken from the base settings."""
+    base = config.Settings() if base is None else base
+    with open(path) as f:
+        grid = json.load(f)
+    if isinstance(grid, dict):
+        names = sorted(grid)
+        points = [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+    else:
+        points = grid
+    return [base.replace(**point) for point in points]
+
+
+def loosest(settings):
+    """Returns settings which detect a superset of the interactions detected with each of the given settings.
+    Ring perception depends on the aromatic planarity and the residues and water molecules of the binding sites on
+    BS_DIST, so these can't be varied."""
+    for name in FIXED:
+        if len(set(getattr(s, name) for s in settings)) > 1:
+            raise ValueError('%s has to be the same for all settings of a sweep.' % name)
+    thresholds = {name: max(getattr(s, name) for s in settings) for name in LOOSEST_MAX}
+    thresholds.update({name: min(getattr(s, name) for s in settings) for name in LOOSEST_MIN})
+    # Halogen bond angles are windows around an optimal angle with a common deviation, use windows covering all
+    acc = [(s.HALOGEN_ACC_ANGLE - s.HALOGEN_ANGLE_DEV, s.HALOGEN_ACC_ANGLE + s.HALOGEN_ANGLE_DEV) for s in settings]
+    don = [(s.HALOGEN_DON_ANGLE - s.HALOGEN_ANGLE_DEV, s.HALOGEN_DON_ANGLE + s.HALOGEN_ANGLE_DEV) for s in settings]
+    acc_min, acc_max = min(w[0] for w in acc), max(w[1] for w in acc)
+    don_min, don_max = min(w[0] for w in don), max(w[1] for w in don)
+    thresholds.update(HALOGEN_ACC_ANGLE=(acc_min + acc_max) / 2.0, HALOGEN_DON_ANGLE=(don_min + don_max) / 2.0,
+                      HALOGEN_ANGLE_DEV=max(acc_max - acc_min, don_max - don_min) / 2.0)
+    return settings[0].replace(**thresholds)
+
+
+def within_windows(angle, center, deviation):
+    return center - deviation < angle < center + deviation
+
+
+def apply_settings(pli, s):
+    """Returns a copy of a PLInteraction object (detected with looser settings) with the interactions for the given
+    settings. Candidates are filtered by their stored geometry and refined again. Pi-cation interactions are detected
+    again, as the detection of tertiary amines depends on the order of the candidates."""
+    new = copy.copy(pli)
+    new.settings = s
+    new.saltbridge_lneg = [sb for sb in pli.saltbridge_lneg if sb.distance < s.SALTBRIDGE_DIST_MAX]
+    new.saltbridge_pneg = [sb for sb in pli.saltbridge_pneg if sb.distance < s.SALTBRIDGE_DIST_MAX]
+    new.all_hbonds_ldon = [hb for hb in pli.all_hbonds_ldon
+                           if hb.distance_ad < s.HBOND_DIST_MAX and hb.angle > s.HBOND_DON_ANGLE_MIN]
+    new.all_hbonds_pdon = [hb for hb in pli.all_hbonds_pdon
+                           if hb.distance_ad < s.HBOND_DIST_MAX and hb.angle > s.HBOND_DON_ANGLE_MIN]
+    new.pistacking = [st for st in pli.pistacking
+                      if st.distance < s.PISTACK_DIST_MAX and st.offset < s.PISTACK_OFFSET_MAX and
+                      (0 < st.angle < s.PISTACK_ANG_DEV if st.type == 'P' else
+                       within_windows(st.angle, 90, s.PISTACK_ANG_DEV))]
+    new.all_pi_cation_laro = pication(pli.ligand.get_rings(), pli.bindingsite.get_pos_charged(), True, s)
+    new.pication_paro = pication(pli.bindingsite.get_rings(), pli.ligand.get_pos_charged(), False, s)
+    new.all_hydrophobic_contacts = [h for h in pli.all_hydrophobic_contacts if h.distance < s.HYDROPH_DIST_MAX]
+    new.halogen_bonds = [hal for hal in pli.halogen_bonds
+                         if hal.distance < s.HALOGEN_DIST_MAX and
+                         within_windows(hal.acc_angle, s.HALOGEN_ACC_ANGLE, s.HALOGEN_ANGLE_DEV) and
+                         within_windows(hal.don_angle, s.HALOGEN_DON_ANGLE, s.HALOGEN_ANGLE_DEV)]
+    new.all_water_bridges = [wb for wb in pli.all_water_bridges
+                             if s.WATER_BRIDGE_MINDIST <= wb.distance_aw <= s.WATER_BRIDGE_MAXDIST and
+                             s.WATER_BRIDGE_MINDIST <= wb.distance_dw <= s.WATER_BRIDGE_MAXDIST and
+                             wb.d_angle > s.WATER_BRIDGE_THETA_MIN and
+                             s.WATER_BRIDGE_OMEGA_MIN < wb.w_angle < s.WATER_BRIDGE_OMEGA_MAX]
+    new.refine()
+    return new
+
+
+def sweep(mol, settings):
+    """Takes a PDBComplex loaded with the loosest of the given settings and returns one copy of it per setting,
+    each with its own interaction sets."""
+    results = []
+    for s in settings:
+        result = copy.copy(mol)
+        result.settings = s
+        result.interaction_sets = {site: apply_settings(pli, s) for site, pli in mol.interaction_sets.items()}
+        results.append(result)
+    return results
+
+
+def interaction_counts(pli):
+    """Number of interactions of each type for one binding site."""
+    return {'hydrophobic_interactions': len(pli.hydrophobic_contacts),
+            'hydrogen_bonds': len(pli.hbonds_ldon + pli.hbonds_pdon), 'water_bridges': len(pli.water_bridges),
+            'salt_bridges': len(pli.saltbridge_lneg + pli.saltbridge_pneg), 'pi_stacks': len(pli.pistacking),
+            'pi_cation_interactions': len(pli.pication_laro + pli.pication_paro),
+            'halogen_bonds': len(pli.halogen_bonds)}
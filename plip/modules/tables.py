@@ -0,0 +1,176 @@
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+tables.py - Write the interactions of many structures as columnar tables, one table per interaction type.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import os
+import glob
+import json
+import uuid
+
+# Own modules
+from supplemental import atomic_write
+
+# External libraries
+import numpy as np
+# pyarrow is optional and only imported for Parquet files
+
+SCHEMA_VERSION = 1  # Increase for any change of tables, columns or types
+SCHEMA_FILE = 'schema.json'
+
+# Features of the report data (see TextOutput) stored in each table. The schema is fixed here, so it doesn't change
+# with the reports. All tables start with the columns pdbid and bsid.
+TABLES = {'hydrophobic_interactions': ['RESNR', 'RESTYPE', 'RESCHAIN', 'DIST', 'LIGCARBONIDX', 'PROTCARBONIDX',
+                                       'LIGCOO', 'PROTCOO'],
+          'hydrogen_bonds': ['RESNR', 'RESTYPE', 'RESCHAIN', 'SIDECHAIN', 'DIST_H-A', 'DIST_D-A', 'DON_ANGLE',
+                             'PROTISDON', 'DONORIDX', 'DONORTYPE', 'ACCEPTORIDX', 'ACCEPTORTYPE', 'LIGCOO', 'PROTCOO'],
+          'water_bridges': ['RESNR', 'RESTYPE', 'RESCHAIN', 'DIST_A-W', 'DIST_D-W', 'DON_ANGLE', 'WATER_ANGLE',
+                            'PROTISDON', 'DONOR_IDX', 'DONORTYPE', 'ACCEPTOR_IDX', 'ACCEPTORTYPE', 'WATER_IDX'],
+          'salt_bridges': ['RESNR', 'RESTYPE', 'RESCHAIN', 'DIST', 'PROTISPOS', 'LIG_GROUP', 'LIG_IDX_LIST', 'LIGCOO',
+                           'PROTCOO'],
+          'pi_stacks': ['RESNR', 'RESTYPE', 'RESCHAIN', 'CENTDIST', 'ANGLE', 'OFFSET', 'TYPE', 'LIG_IDX_LIST',
+                        'LIGCOO', 'PROTCOO'],
+          'pi_cation_interactions': ['RESNR', 'RESTYPE', 'RESCHAIN', 'DIST', 'OFFSET', 'PROTCHARGED', 'LIG_GROUP',
+                                     'LIG_IDX_LIST', 'LIGCOO', 'PROTCOO'],
+          'halogen_bonds': ['RESNR', 'RESTYPE', 'RESCHAIN', 'DIST', 'DON_ANGLE', 'ACC_ANGLE', 'DON_IDX', 'DONORTYPE',
+                            'ACC_IDX', 'ACCEPTORTYPE', 'LIGCOO', 'PROTCOO']}
+
+# NumPy types of the features, strings are stored with the length of their longest value in each shard.
+# Coordinates are split into three columns (e.g. ligcoo_x, ligcoo_y, ligcoo_z).
+FEATURE_TYPES = {'RESNR': 'i8', 'RESTYPE': 'S', 'RESCHAIN': 'S', 'DIST': 'f8', 'CENTDIST': 'f8', 'DIST_H-A': 'f8',
+                 'DIST_D-A': 'f8', 'DIST_A-W': 'f8', 'DIST_D-W': 'f8', 'DON_ANGLE': 'f8', 'ACC_ANGLE': 'f8',
+                 'WATER_ANGLE': 'f8', 'ANGLE': 'f8', 'OFFSET': 'f8', 'SIDECHAIN': '?', 'PROTISDON': '?',
+                 'PROTISPOS': '?', 'PROTCHARGED': '?', 'LIGCARBONIDX': 'i8', 'PROTCARBONIDX': 'i8', 'DONORIDX': 'i8',
+                 'ACCEPTORIDX': 'i8', 'DONOR_IDX': 'i8', 'ACCEPTOR_IDX': 'i8', 'WATER_IDX': 'i8', 'DON_IDX': 'i8',
+                 'ACC_IDX': 'i8', 'DONORTYPE': 'S', 'ACCEPTORTYPE': 'S', 'TYPE': 'S', 'LIG_GROUP': 'S',
+                 'LIG_IDX_LIST': 'S', 'LIGCOO': 'coo', 'PROTCOO': 'coo'}
+
+
+def columns(table):
+    """Names and types of all columns of a table."""
+    cols = [('pdbid', 'S'), ('bsid', 'S')]
+    for feature in TABLES[table]:
+        name = feature.lower().replace('-', '_')
+        if FEATURE_TYPES[feature] == 'coo':
+            cols.extend([('%s_%s' % (name, axis), 'f8') for axis in 'xyz'])
+        else:
+            cols.append((name, FEATURE_TYPES[feature]))
+    return cols
+
+
+def schema():
+    return {'version': SCHEMA_VERSION, 'tables': {table: columns(table) for table in sorted(TABLES)}}
+
+
+def site_rows(pdbid, site, output):
+    """Returns the rows of all tables for one binding site, given its TextOutput."""
+    rows = {}
+    for _, table, features, info in output.sections:
+        rows[table] = []
+        for contact in info:
+            values = dict(zip(features, contact))
+            row = [pdbid, site]
+            for feature in TABLES[table]:
+                if FEATURE_TYPES[feature] == 'coo':
+                    row.extend(float(c) for c in values[feature])
+                else:
+                    row.append(values[feature])
+            rows[table].append(tuple(row))
+    return rows
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        return False
+    return True
+
+
+class TableWriter():
+    """Appends the interactions of binding sites to columnar tables in a folder. Rows are buffered and written in
+    shards of up to chunk_size rows per table, as compressed NumPy files (.npz) or as Parquet files (by default if
+    pyarrow is available). Shards are never changed once written, so several runs and processes can add to the same
+    tables."""
+
+    def __init__(self, folder, chunk_size=100000, fmt=None):
+        self.folder = os.path.expanduser(folder)
+        self.chunk_size = chunk_size
+        self.fmt = fmt if fmt is not None else 'parquet' if parquet_available() else 'npz'
+        self.rows = {table: [] for table in TABLES}
+        if not os.path.exists(self.folder):
+            try:
+                os.makedirs(self.folder)
+            except OSError:  # Created by another process in the meantime
+                pass
+        path = os.path.join(self.folder, SCHEMA_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                version = json.load(f)['version']
+            if version != SCHEMA_VERSION:
+                raise ValueError('Tables in %s have schema version %s, this version of PLIP writes version %s.'
+                                 % (self.folder, version, SCHEMA_VERSION))
+        else:
+            with atomic_write(path) as f:
+                json.dump(schema(), f, indent=2, sort_keys=True)
+
+    def add(self, rows):
+        """Adds the rows of one or several sites (see site_rows()), writing shards of full tables."""
+        for table, new in rows.items():
+            self.rows[table].extend(new)
+            if len(self.rows[table]) >= self.chunk_size:
+                self.flush(table)
+
+    def flush(self, table):
+        rows, self.rows[table] = self.rows[table], []
+        if not rows:
+            return
+        cols = columns(table)
+        arrays = {}
+        for (name, dtype), values in zip(cols, zip(*rows)):
+            arrays[name] = np.array(values, dtype=dtype)
+        path = os.path.join(self.folder, '%s-%s.%s' % (table, uuid.uuid4().hex, self.fmt))
+        with atomic_write(path, 'wb') as f:
+            if self.fmt == 'parquet':
+                import pyarrow
+                import pyarrow.parquet
+                pyarrow.parquet.write_table(pyarrow.Table.from_arrays([arrays[name] for name, _ in cols],
+                                                                      [name for name, _ in cols]), f)
+            else:
+                np.savez_compressed(f, **arrays)
+
+    def close(self):
+        """Writes the remaining rows of all tables."""
+        for table in TABLES:
+            self.flush(table)
+
+
+def read_table(folder, table):
+    """Reads all shards of a table and returns a dictionary with one NumPy array per column."""
+    cols = columns(table)
+    parts = {name: [] for name, _ in cols}
+    for path in sorted(glob.glob(os.path.join(os.path.expanduser(folder), '%s-*.*' % table))):
+        if path.endswith('.npz'):
+            with np.load(path) as shard:
+                for name, _ in cols:
+                    parts[name].append(shard[name])
+        elif path.endswith('.parquet'):
+            import pyarrow.parquet
+            shard = pyarrow.parquet.read_table(path)
+            for name, dtype in cols:
+                parts[name].append(np.array(shard.column(name).to_pylist(), dtype=dtype))
+    return {name: np.concatenate(parts[name]) if parts[name] else np.array([], dtype=dtype) for name, dtype in cols}
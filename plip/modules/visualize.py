@@ -19,8 +19,12 @@ limitations under the License.
 
 # Own modules
 from supplemental import *
+from mmcif import original_residue, original_site
 from time import sleep
 
+# External libraries
+from pymol import cmd
+
 
 def set_fancy_ray():
     """Give the molecule a flat, modern look."""
@@ -83,43 +87,62 @@ def png_workaround(filepath, width=1200, height=800):
         sys.stderr.write('Imagemagick not available. Images will not be resized or cropped.')
 
 
-def visualize_in_pymol(protcomplex_class, pli_site, show=False, pics=False, pse=False, fancy=False):
-    """Visualizes the protein-ligand pliprofiler at one site in PyMOL."""
+def site_filename(pcomp, pli_site):
+    """Name of the image and session files of a binding site (without extension)."""
+    pli = pcomp.interaction_sets[pli_site]
+    site = original_site(pli.residue_ids, '-'.join(pli.ligand.pymol_data.bs_id))
+    return '%s-%s' % (pcomp.pymol_name.upper(), site.upper())
+
+
+def load_complex(pcomp, show=False):
+    """Starts PyMOL and loads the structure of the complex, named after its PDB ID."""
+    pdbid = pcomp.pymol_name
+    opts = '-p' if show else '-pcq'
+    start_pymol(run=True, options=opts, quiet=True)
+    standard_settings()
+    cmd.set('dash_gap', 0)  # Show not dashes, but lines for the pliprofiler
+    cmd.set('ray_shadow', 0)  # Turn on ray shadows for clearer ray-traced images
+    cmd.set('cartoon_color', 'mylightblue')
+    if pcomp.sourcefiles['pdbcomplex'] is None:  # Structure given in memory
+        cmd.load_raw(pcomp.sourcefiles['pdbstring'], pcomp.input_format.replace('mmcif', 'cif'), pdbid)
+    elif compression(pcomp.sourcefiles['pdbcomplex']) is None:
+        cmd.load(pcomp.sourcefiles['pdbcomplex'], format=pcomp.input_format.replace('mmcif', 'cif'))
+    else:  # PyMOL can't read compressed files, pass the decompressed content instead
+        with open_structure(pcomp.sourcefiles['pdbcomplex']) as f:
+            cmd.load_raw(f.read(), pcomp.input_format.replace('mmcif', 'cif'), pdbid)
+    current_name = cmd.get_object_list(selection='(all)')[0]
+    cmd.set_name(current_name, pdbid)
+
+
+def draw_site(pcomp, pli_site):
+    """Shows the interactions of one binding site in the loaded complex, see load_complex()."""
 
     #####################
     # Set everything up #
     #####################
 
-    pcomp = protcomplex_class
     pdbid = pcomp.pymol_name
     pli = pcomp.interaction_sets[pli_site]  # Select the interaction class corresponding to the selection
     ligdata = pli.ligand.pymol_data
     lig_members = sorted(pli.ligand.members)
     mapping = pcomp.idx_to_pdb_mapping  # Mapping internal -> external for protein atoms
     lig_to_pdb = {key: mapping[ligdata.maptopdb[key]] for key in ligdata.maptopdb}  # Atom mapping for ligand
-    save_to = protcomplex_class.output_path
-    chain = ligdata.chain if not ligdata.chain == "0" else ""
+    # PyMOL reads the original structure file, so residues renamed for mmCIF input are selected by their original IDs
+    chain, resid = original_residue(pli.residue_ids, ligdata.chain, ligdata.resid)
+    chain = chain if not chain == "0" else ""
     ligname = ligdata.hetid
 
     ########################
     # Basic visualizations #
     ########################
 
-    opts = '-p' if show else '-pcq'
-    start_pymol(run=True, options=opts, quiet=True)
-    standard_settings()
-    cmd.set('dash_gap', 0)  # Show not dashes, but lines for the pliprofiler
-    cmd.set('ray_shadow', 0)  # Turn on ray shadows for clearer ray-traced images
-    cmd.set('cartoon_color', 'mylightblue')
-    cmd.load(pcomp.sourcefiles['pdbcomplex'])
-    current_name = cmd.get_object_list(selection='(all)')[0]
-    cmd.set_name(current_name, pdbid)
     cmd.hide('everything', 'all')
-    cmd.select(ligname, 'resn %s and chain %s and resi %s' % (ligdata.hetid, chain, ligdata.resid))
+    cmd.select(ligname, 'resn %s and chain %s and resi %s' % (ligdata.hetid, chain, resid))
 
     # Additionally, select all members of composite ligands
     for member in lig_members:
-        resid, chain, resnr = member[0], member[1], str(member[2])
+        chain, resnr = original_residue(pli.residue_ids, member[1], member[2])
+        resid, resnr = member[0], str(resnr)
         cmd.select(ligname, '%s or (resn %s and chain %s and resi %s)' % (ligname, resid, chain, resnr))
     cmd.show('sticks', ligname)
     cmd.color('myblue')
@@ -389,15 +412,26 @@ def visualize_in_pymol(protcomplex_class, pli_site, show=False, pics=False, pse=
 
     cmd.remove('not alt ""+A')
 
-    ########################################
-    # Clean up and save PyMOL session file #
-    ########################################
+    ############
+    # Clean up #
+    ############
 
     cmd.hide('labels', 'Interactions')
     cmd.disable('%sCartoon' % pdbid)
     cmd.hide('everything', 'hydrogens')
 
-    filename = '%s-%s' % (pdbid.upper(), "-".join(ligdata.bs_id).upper())
+
+def visualize_in_pymol(protcomplex_class, pli_site, show=False, pics=False, pse=False, fancy=False):
+    """Visualizes the protein-ligand pliprofiler at one site in PyMOL."""
+    load_complex(protcomplex_class, show)
+    draw_site(protcomplex_class, pli_site)
+
+    #############################################
+    # Save PyMOL session file and create images #
+    #############################################
+
+    save_to = protcomplex_class.output_path
+    filename = site_filename(protcomplex_class, pli_site)
     if pse:
         cmd.save("".join([save_to, "%s.pse" % filename]))
 
@@ -405,3 +439,65 @@ def visualize_in_pymol(protcomplex_class, pli_site, show=False, pics=False, pse=
     set_fancy_ray()
     if pics:
         png_workaround("".join([save_to, filename]))
+
+
+def visualize_site(shared, site):
+    """Job function for visualization with a JobScheduler. The shared data contains the complex and output options."""
+    protcomplex, pics, pse = shared
+    visualize_in_pymol(protcomplex, site, False, pics, pse)
+
+
+def public_names():
+    """Names of all objects (including groups) and named selections, without PyMOL internals."""
+    return cmd.get_names('public_objects') + cmd.get_names('public_selections')
+
+
+def visualize_structure(pcomp, sites, pics=False, pse=False):
+    """Visualizes several binding sites in one PyMOL session, loading the complex only once. The objects and
+    selections of each site are renamed with the site as prefix and put into a group named like its files, e.g.
+    1VSN-NFT-A-283. Each site is stored as scene, images are created by recalling the scenes. The session file of the
+    structure (e.g. 1VSN.pse) contains all groups and scenes."""
+    load_complex(pcomp)
+    pdbid = pcomp.pymol_name
+    shared = [pdbid, '%sCartoon' % pdbid]  # The complex and its cartoon copy are used by all sites
+    groups = []
+    for site in sites:
+        cmd.delete('%sCartoon' % pdbid)  # Copied again for each site
+        before = set(public_names())
+        draw_site(pcomp, site)
+        group = site_filename(pcomp, site)
+        cmd.ungroup(' '.join(shared))
+        auto_mode = cmd.get('group_auto_mode')
+        cmd.set('group_auto_mode', 0)  # Nested groups (e.g. Atoms.Protein) keep their parents while renaming
+        for name in sorted(set(public_names()) - before - set(shared), key=lambda name: name.count('.')):
+            cmd.set_name(name, '%s_%s' % (group, name))
+        cmd.set('group_auto_mode', auto_mode)
+        cmd.group(group, ' '.join('%s_%s' % (group, name) for name in ['Structures', 'Interactions', 'Atoms']))
+        # Pseudoatoms of the site (e.g. centroids) must not be selected by the atom IDs of the following sites
+        cmd.alter('%s and not %s' % (group, pdbid), 'ID=-1')
+        if groups:
+            cmd.disable(' '.join(groups))
+        cmd.scene(group, 'store')
+        groups.append(group)
+
+    #############################################
+    # Save PyMOL session file and create images #
+    #############################################
+
+    save_to = pcomp.output_path
+    if pse and groups:
+        cmd.scene(groups[0], 'recall')
+        cmd.save("".join([save_to, "%s.pse" % pdbid.upper()]))
+    set_fancy_ray()
+    if pics:
+        for group in groups:
+            cmd.disable(' '.join(groups))
+            cmd.enable(group)
+            cmd.scene(group, 'recall')
+            png_workaround("".join([save_to, group]))
+
+
+def visualize_sites(shared, sites):
+    """Job function visualizing all given sites in one session, see visualize_structure()."""
+    protcomplex, pics, pse = shared
+    visualize_structure(protcomplex, sites, pics, pse)
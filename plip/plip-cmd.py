@@ -20,22 +20,21 @@ limitations under the License.
 from __future__ import print_function
 
 # Own modules
+# Modules depending on PyMOL or lxml are imported only when they are needed, see process_pdb() and main
 from modules.preparation import *
-from modules.visualize import visualize_in_pymol
-from modules.report import TextOutput
-from modules import config
+from modules.report import StructureReport, ReportWriter, REPORT_FILES, report_files, append_report
+from modules.parallel import JobScheduler
+from modules.fetch import StructureFetcher, FetchError, file_extension, fetchresult, DEFAULT_URL, STATUS_BATCH_SIZE
+from modules.mmcif import UnsupportedStructure, original_site
+from modules import config, profiling
 
 # Python standard library
 import sys
 import argparse
 from argparse import ArgumentParser
-import urllib2
 import time
 import multiprocessing
 
-# External libraries
-import lxml.etree as et
-
 __version__ = '1.0.2'
 descript = "Protein-Ligand Interaction Profiler (PLIP) v%s " \
            "is a command-line based tool to analyze interactions in a protein-ligand complex." % __version__
@@ -54,144 +53,296 @@ def sysexit(code, msg):
     sys.exit(code)
 
 
-def check_pdb_status(pdbid):
-    """Returns the status and up-to-date entry in the PDB for a given PDB ID"""
-    url = 'http://www.rcsb.org/pdb/rest/idStatus?structureId=%s' % pdbid
-    xmlf = urllib2.urlopen(url)
-    xml = et.parse(xmlf)
-    xmlf.close()
-    status = None
-    current_pdbid = pdbid
-    for df in xml.xpath('//record'):
-        status = df.attrib['status']  # Status of an entry can be either 'UNKWOWN', 'OBSOLETE', or 'CURRENT'
-        if status == 'OBSOLETE':
-            current_pdbid = df.attrib['replacedBy']  # Contains the up-to-date PDB ID for obsolete entries
-    return [status, current_pdbid.lower()]
-
-
-def fetch_pdb(pdbid, verbose_mode):
-    """Get the newest entry from the RCSB server for the given PDB ID. Exits with '1' if PDB ID is invalid."""
-    pdbid = pdbid.lower()
-    if verbose_mode:
-        sys.stdout.write('Checking status of PDB ID %s ... ' % pdbid)
-    state, current_entry = check_pdb_status(pdbid)  # Get state and current PDB ID
-
-    if verbose_mode:
-        if state == 'OBSOLETE':
-            sys.stdout.write('entry is obsolete, getting %s instead.\n' % current_entry)
-        elif state == 'CURRENT':
-            sys.stdout.write('entry is up to date.\n')
-    if state == 'UNKNOWN':
-        sysexit(3, 'Invalid PDB ID')
-    if verbose_mode:
-        sys.stdout.write('Downloading file from PDB ... ')
-    pdburl = 'http://www.rcsb.org/pdb/files/%s.pdb' % current_entry  # Get URL for current entry
-    pdbfile = None
-    try:
-        pdbfile = urllib2.urlopen(pdburl).read()
-    except urllib2.HTTPError:
-        sysexit(5, "Error: No file in PDB format available from wwPDB for the given PDB ID.")
-    return [pdbfile, current_entry]
-
-
-def process_pdb(pdbfile, outpath, xml=False, verbose_mode=False, pics=False, pymol=False, maxthreads=None):
-    """Analysis of a single PDB file. Can generate textual reports XML, PyMOL session files and images as output."""
-    mol = PDBComplex()
+def fetch_pdb(pdbids, verbose_mode, fetcher):
+    """Get the newest entries for the given PDB IDs from the local mirror, the download cache or the RCSB server.
+    The entries are fetched in chunks while they are processed, yields the PDB ID and a fetchresult for each of them.
+    If the server fails for a chunk, its entries get the status 'FAILED' instead of ending the run."""
+    for start in range(0, len(pdbids), STATUS_BATCH_SIZE):
+        chunk = pdbids[start:start + STATUS_BATCH_SIZE]
+        if verbose_mode:
+            sys.stdout.write('Fetching %i PDB %s ... ' % (len(chunk), 'entry' if len(chunk) == 1 else 'entries'))
+        try:
+            results = fetcher.fetch(chunk)
+        except FetchError as e:
+            results = {pdbid.lower(): fetchresult(pdbid=pdbid.lower(), current=pdbid.lower(), status='FAILED',
+                                                  content=None, path=None, error=str(e)) for pdbid in chunk}
+        if verbose_mode:
+            sys.stdout.write('done.\n')
+            for result in [results[pdbid.lower()] for pdbid in chunk]:
+                if result.status == 'OBSOLETE':
+                    sys.stdout.write('  %s is obsolete, getting %s instead.\n' % (result.pdbid, result.current))
+        for pdbid in chunk:
+            yield pdbid, results[pdbid.lower()]
+
+
+def process_pdb(pdbfile, outpath, xml=False, verbose_mode=False, pics=False, pymol=False, maxthreads=None,
+                timeout=None, cache=None, settings=None, sweep=None, as_string=False, stdout=False, profile=False,
+                memory=False, compact=False, jsonl=False, tables=None, store=None, fingerprints=None, sets=False,
+                detached=None, single_session=False, swig=False):
+    """Analysis of a single PDB file. Can generate textual reports XML, PyMOL session files and images as output.
+    If a ResultCache is given, results of earlier runs with the same input and settings are reused.
+    With a list of settings for sweep, only reports are generated, see process_sweep().
+    With as_string=True, pdbfile is the content of the file instead of its path. With stdout=True, the XML report
+    (if xml is set) or the rST report is written to stdout instead of the output folder.
+    With profile=True, timings of all stages and counters are written to profile.json (or stderr with stdout=True),
+    memory=True adds the memory usage of all stages and binding sites, swig=True the number of calls of OpenBabel
+    methods (which slows down the analysis).
+    Reports are written site by site while the structure is analyzed, with compact=True coordinates are written as
+    attributes in the XML report. With jsonl=True, the JSON Lines report with one line per binding site is written
+    (compressed in the output folder, uncompressed to stdout). The interactions are also added to the columnar
+    tables of a TableWriter and to a ResultStore database if given, their fingerprints to a FingerprintStore.
+    With sets=True, the interaction sets are saved in interactions.plipsets. With a DetachedComplex given as detached
+    (e.g. read from such a file), reports and visualizations are rendered from its interaction sets without analyzing
+    a structure. With single_session=True, all binding sites are visualized in one PyMOL session."""
+    if profile or memory or swig:
+        profiler = profiling.enable(profiling.Profiler(swig=swig, memory=memory))
+        try:
+            with profiler.stage('total'):
+                process_pdb(pdbfile, outpath, xml, verbose_mode, pics, pymol, maxthreads, timeout, cache, settings,
+                            sweep, as_string, stdout, compact=compact, jsonl=jsonl, tables=tables, store=store,
+                            fingerprints=fingerprints, sets=sets, detached=detached, single_session=single_session)
+        finally:
+            profiling.disable()
+        if stdout:
+            profiler.write(sys.stderr)
+        else:
+            with atomic_write(os.path.join(tilde_expansion(outpath), 'profile.json')) as f:
+                profiler.write(f)
+        return
+    if sweep is not None:
+        return process_sweep(pdbfile, outpath, sweep, xml=xml, verbose_mode=verbose_mode, as_string=as_string,
+                             compact=compact, jsonl=jsonl)
+    mol, cachekey = detached, None
+    if cache is not None and detached is None:
+        cachekey = cache.key(pdbfile, __version__, settings=settings, as_string=as_string,
+                             options={'compact': compact})
+        mol = cache.load(cachekey)
+    from_cache = mol is not None and detached is None
+    analyze = mol is None
+    outpath = tilde_expansion(outpath)
+    if stdout:  # Nothing is written to the output folder, e.g. for use in pipelines
+        reports = ['jsonl' if jsonl else 'xml' if xml else 'txt']
+    else:
+        create_folder_if_not_exists(outpath)
+        reports = (['xml'] if xml else []) + ['txt'] + (['jsonl'] if jsonl else [])
+        if from_cache:  # Reports restored from the cache are not generated again
+            reports = [r for r in reports if not cache.restore(cachekey, REPORT_FILES[r], outpath)]
+    # Without visualization and cache, the interaction sets are dropped as soon as their reports are written
+    keep_sites = pymol or pics or cache is not None or sets
+    if analyze:
+        mol = PDBComplex(settings)
     mol.output_path = outpath
-    mol.load_pdb(pdbfile)
 
-    # Begin constructing the XML tree
-    report = et.Element('report')
-    plipversion = et.SubElement(report, 'plipversion')
-    plipversion.text = __version__
-    pdbid = et.SubElement(report, 'pdbid')
-    pdbid.text = mol.pymol_name.upper()
+    #############################################################
+    # Set up worker processes for PyMOL visualization if needed #
+    #############################################################
 
-    # Write header of rST file
-    textlines = ['Prediction of noncovalent interactions for PDB structure %s' % mol.pymol_name.upper(), ]
-    textlines.append("="*len(textlines[0]))
-    textlines.append('Created on %s using PLIP v%s\n' % (time.strftime("%Y/%m/%d"), __version__))
+    if maxthreads == 0 or os.name == 'nt':  # No multiprocessing, visualize sites directly
+        processes = 0
+    elif maxthreads is None:  # Use as many threads as there are processor cores (should be a safe value)
+        processes = multiprocessing.cpu_count() - 1
+    else:
+        processes = max(2, maxthreads) - 1  # One is used for the main process
+    if (pymol or pics) and single_session:
+        from modules.visualize import visualize_sites
+        # The complex is loaded once in a single worker process, which visualizes all sites
+        scheduler = JobScheduler(visualize_sites, (mol, pics, pymol), min(processes, 1), timeout=timeout,
+                                 fresh_workers=True)
+    elif pymol or pics:
+        from modules.visualize import visualize_site
+        # PyMOL can only be launched once per process, so each site gets a fresh worker process
+        scheduler = JobScheduler(visualize_site, (mol, pics, pymol), processes, timeout=timeout, fresh_workers=True)
+
+    ####################################################################################################
+    # Analyze the structure, writing the reports and scheduling the visualization of each binding site #
+    ####################################################################################################
+
+    with report_files(outpath, [] if stdout else reports) as files:
+        if stdout:
+            files = {reports[0]: sys.stdout}
+        writer = ReportWriter(__version__, files.get('txt'), files.get('xml'), compact, files.get('jsonl'), tables,
+                              store, fingerprints)
+
+        def write_site(site, pli):
+            writer.add_site(mol, site, pli)
+            if (pymol or pics) and not single_session and not pli.no_interactions:
+                # Rendering runs while the following sites are analyzed and written
+                with profiling.stage('visualization'):  # Only the time until submission if run by workers
+                    scheduler.submit(site)
+                sys.stdout = sys.__stdout__  # Change back to original stdout, gets changed when PyMOL has been used
+            if not keep_sites:
+                del mol.interaction_sets[site]
+
+        if analyze:
+            # Binding sites are analyzed in parallel with the same number of processes as used for visualization
+            mol.load_pdb(pdbfile, maxthreads=multiprocessing.cpu_count() if maxthreads is None else maxthreads,
+                         as_string=as_string, callback=write_site)
+        else:  # The detached interaction sets can be used for reports and visualization
+            # Cached sets refer to the input file, saved sets contain the structure itself
+            if from_cache and as_string:
+                mol.sourcefiles['pdbcomplex'], mol.sourcefiles['pdbstring'] = None, decompress(pdbfile)
+            elif from_cache:
+                mol.sourcefiles['pdbcomplex'] = pdbfile
+            if verbose_mode:
+                sys.stdout.write("Using %s results for %s.\n" % ('cached' if from_cache else 'saved', mol.pymol_name))
+            for site in sorted(mol.interaction_sets):
+                write_site(site, mol.interaction_sets[site])
+        writer.finish(mol)
+    active_sites = [site for site, has_interactions in writer.sites if has_interactions]
+    if cache is not None and not from_cache and detached is None:
+        cache.store(cachekey, mol, outpath, [] if stdout else [REPORT_FILES[r] for r in reports])
+    if sets and not stdout:
+        from modules.serialization import dump_sets, SETS_FILE
+        with atomic_write(os.path.join(outpath, SETS_FILE), 'wb') as f:
+            dump_sets(mol, f, __version__)
 
     if verbose_mode:
-        num_ligs = len([site for site in mol.interaction_sets if not mol.interaction_sets[site].no_interactions])
-        if num_ligs == 1:
+        if len(active_sites) == 1:
             sys.stdout.write("Analyzing %s with one ligand.\n" % mol.pymol_name)
-        elif num_ligs > 1:
-            sys.stdout.write("Analyzing %s with %i ligands.\n" % (mol.pymol_name, num_ligs))
+        elif len(active_sites) > 1:
+            sys.stdout.write("Analyzing %s with %i ligands.\n" % (mol.pymol_name, len(active_sites)))
         else:
             sys.stdout.write("%s contains no ligands.\n" % mol.pymol_name)
-
-    ######################################################################################################
-    # Generate XML- and rST-formatted reports for each binding site and initialize visualization threads #
-    ######################################################################################################
-
-    threads = []
-    running_threads = []
-
-    for i, site in enumerate(sorted(mol.interaction_sets)):
-        s = mol.interaction_sets[site]
-        bindingsite = TextOutput(s).generate_xml()
-        bindingsite.set('id', str(i+1))
-        bindingsite.set('has_interactions', 'False')
-        report.insert(i+1, bindingsite)
-        for itype in TextOutput(s).generate_rst():
-            textlines.append(itype)
-        if not s.no_interactions:
-            bindingsite.set('has_interactions', 'True')
-            if verbose_mode:
-                sys.stdout.write("  @ %s\n" % site)
-
-            if pymol or pics:
-                if os.name != 'nt':
-                    if maxthreads != 0:
-                        # Initialize thread for PyMOL visualization and add to list of threads to be processed
-                        p = multiprocessing.Process(target=visualize_in_pymol, args=(mol, site, False, pics, pymol))
-                        threads.append(p)
-                    else:
-                        visualize_in_pymol(mol, site, False, pics, pymol)
-                else:
-                    visualize_in_pymol(mol, site, False, pics, pymol)
-        else:
-            textlines.append('No interactions detected.')
-        sys.stdout = sys.__stdout__  # Change back to original stdout, gets changed when PyMOL has been used before
-
-    ##############################################
-    # Use multithreading for PyMOL visualization #
-    ##############################################
-
-    if maxthreads is None:  # Use as many threads as there are processor cores (should be a safe value)
-        maxthreads = multiprocessing.cpu_count()
-    else:
-        maxthreads = max(2, maxthreads)
-    while len(threads) != 0:
-        # Add threads as long as there are free threads available
-        for i, tr in enumerate(threads):
-            if len(running_threads) <= maxthreads-2:  # One can be still added, one used for the main process
-                tr.start()
-                running_threads.append(tr)
-                threads.pop(i)
-        # Check if running threads have finished and delete them
-        for j, tr in enumerate(running_threads):
-            if not tr.is_alive():
-                running_threads.pop(j)
-
-    ###########################################
-    # Write final rST and XML to output files #
-    ###########################################
-
-    tree = et.ElementTree(report)
-    create_folder_if_not_exists(tilde_expansion(outpath))
-    if xml:
-        tree.write('%s/report.xml' % tilde_expansion(outpath), pretty_print=True, xml_declaration=True)
-
-    with open('%s/report.rst.txt' % tilde_expansion(outpath), 'w') as f:
-        [f.write(textline+'\n') for textline in textlines]
-
-
-def main(args):
+        for site in active_sites:
+            sys.stdout.write("  @ %s\n" % site)
+
+    if (pymol or pics) and single_session and active_sites:
+        with profiling.stage('visualization'):
+            scheduler.submit(active_sites)
+        sys.stdout = sys.__stdout__
+    if pymol or pics:
+        try:
+            with profiling.stage('visualization'):
+                scheduler.join()  # Blocks until all visualization jobs are finished, raises errors of the workers
+        except multiprocessing.TimeoutError:
+            sysexit(1, 'Error: Visualization of %s exceeded the time limit of %s seconds.'
+                    % ('the binding sites' if single_session else 'a binding site', timeout))
+
+
+def process_sweep(pdbfile, outpath, settings, xml=False, verbose_mode=False, as_string=False, compact=False,
+                  jsonl=False):
+    """Analysis of a single PDB file with several threshold settings. Interactions are detected once with the
+    loosest settings and filtered for each setting. Reports are written to one subfolder per setting, the number of
+    interactions for all settings and binding sites to sweep.json."""
+    import json
+    from modules.sweep import loosest, sweep, interaction_counts
+    mol = PDBComplex(loosest(settings))
+    mol.output_path = outpath
+    mol.load_pdb(pdbfile, as_string=as_string)  # Sequential, the filters need the OpenBabel objects of the interactions
+    if verbose_mode:
+        sys.stdout.write("Analyzing %s with %i threshold settings.\n" % (mol.pymol_name, len(settings)))
+    summary = []
+    for number, result in enumerate(sweep(mol, settings)):
+        folder = os.path.join(tilde_expansion(outpath), 'sweep-%03i' % (number + 1))
+        create_folder_if_not_exists(folder)
+        report = StructureReport(result, __version__)
+        if xml:
+            report.write_xml(folder, compact)
+        if jsonl:
+            with report_files(folder, ['jsonl']) as files:
+                report.stream_jsonl(files['jsonl'])
+        report.write_txt(folder)
+        summary.append({'folder': os.path.basename(folder),
+                        'thresholds': {name.lower(): value for name, value in result.settings.as_dict().items()},
+                        'sites': {original_site(pli.residue_ids, site): interaction_counts(pli)
+                                  for site, pli in result.interaction_sets.items()}})
+    with atomic_write(os.path.join(tilde_expansion(outpath), 'sweep.json')) as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+
+
+def process_entry(entry, pdbpath, outpath, journal, options, collected=None):
+    """Processes one structure of a batch run. Errors are recorded in the journal and don't stop the batch.
+    The JSON Lines report of the structure is appended to the collected reports of the batch if given.
+    Returns True if the structure was processed successfully."""
+    journal.start(entry)
+    try:
+        process_pdb(pdbpath, outpath, **options)
+        if collected is not None:
+            append_report(os.path.join(tilde_expansion(outpath), REPORT_FILES['jsonl']), collected)
+    except (Exception, SystemExit) as e:
+        error = 'exit code %s' % e.code if isinstance(e, SystemExit) else str(e) or type(e).__name__
+        journal.fail(entry, error)
+        sys.stderr.write('Error: Processing of %s failed (%s)\n' % (entry, error))
+        return False
+    journal.done(entry)
+    return True
+
+
+def write_memory_summary(outpath, verbose_mode=False):
+    """Summarizes the peak memory of all structures of a batch run (from profile.json in their subfolders) in
+    memory-summary.json, with the number of parallel workers fitting into the memory of this machine."""
+    import json
+    import glob
+    peaks = {}
+    for path in glob.glob(os.path.join(tilde_expansion(outpath), '*', 'profile.json')):
+        with open(path) as f:
+            peaks[os.path.basename(os.path.dirname(path))] = json.load(f).get('peak_rss_kb')
+    summary = profiling.memory_summary(peaks)
+    with atomic_write(os.path.join(tilde_expansion(outpath), 'memory-summary.json')) as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+    if verbose_mode and summary['suggested_workers'] is not None:
+        sys.stdout.write('Peak memory of %i structures up to %i MB, %i workers fit into this machine.\n'
+                         % (len(summary['structures']), summary['max_peak_rss_kb'] // 1024,
+                            summary['suggested_workers']))
+
+
+def main(args, settings=None, sweep=None):
     """Main function. Calls functions for processing, report generation and visualization."""
     pdbid, outp = None, None
     outp = "".join([args.outpath, '/']) if not args.outpath.endswith('/') else args.outpath
+    cache = None
+    if args.cache is not None:
+        from modules.cache import ResultCache
+        cache = ResultCache(args.cache, max_size=int(args.cache_size*1024**2))
+    # Options for processing each structure
+    options = dict(xml=args.xml, verbose_mode=args.verbose, pics=args.pics, pymol=args.pymol,
+                   maxthreads=int(args.maxthreads), timeout=args.timeout, cache=cache, settings=settings, sweep=sweep,
+                   stdout=args.stdout, profile=args.profile, memory=args.memory, compact=args.compact,
+                   jsonl=args.jsonl, tables=None, store=None, fingerprints=None, sets=args.sets,
+                   single_session=args.single_session, swig=args.swig)
+    if args.tables is not None:
+        import atexit
+        from modules.tables import TableWriter
+        options['tables'] = TableWriter(args.tables)
+        atexit.register(options['tables'].close)  # Remaining rows are written also if the run ends with an error
+    if args.database is not None:
+        from modules.database import ResultStore
+        options['store'] = ResultStore(args.database)
+    if args.fingerprints is not None:
+        import atexit
+        from modules.fingerprints import FingerprintStore, FingerprintIndex
+        options['fingerprints'] = FingerprintStore(args.fingerprints)
+        # New fingerprints are added to the similarity index at the end of the run
+        atexit.register(FingerprintIndex(options['fingerprints']).update)
+    if args.render is not None:  # Reports and visualizations from saved interaction sets, no analysis
+        from modules.serialization import load_sets
+        try:
+            with open(tilde_expansion(args.render), 'rb') as f:
+                header, mol = load_sets(f)
+        except (IOError, ValueError) as e:
+            sysexit(2, 'Error: Can\'t read interaction sets from %s (%s)' % (args.render, e))
+        if args.verbose:
+            sys.stdout.write('Interaction sets of %s saved by PLIP v%s.\n' % (header['pdbid'], header['plipversion']))
+        process_pdb(None, outp, detached=mol, **options)
+        return
+    entries = args.input if args.input is not None else [pdbid.lower() for pdbid in args.pdbid]
+    # Several structures are processed in batch mode, where each structure gets its own subfolder and errors
+    # are recorded in the journal instead of ending the run
+    batch = len(entries) > 1 or args.journal is not None or args.resume
+    journal, failed, collected = None, [], None
+    if batch:
+        from modules.journal import Journal
+        create_folder_if_not_exists(outp)
+        journal = Journal(args.journal or '%splip-journal.jsonl' % outp, resume=args.resume)
+        if args.jsonl and args.sweep is None:  # JSON Lines reports of all structures are collected in a single file
+            collected = tilde_expansion('%splip-report.jsonl.gz' % outp)
+            if not args.resume and os.path.exists(collected):
+                os.remove(collected)
+        todo = [entry for entry in entries if not journal.skip(entry, args.max_retries)]
+        if args.verbose and len(todo) < len(entries):
+            skipped = len(entries) - len(todo)
+            sys.stdout.write('Resuming batch run, skipping %i of %i entries.\n' % (skipped, len(entries)))
+        entries = todo
 
     if args.verbose:
         # Print title and version
@@ -200,26 +351,66 @@ def main(args):
         sys.stdout.write(title)
         sys.stdout.write('\n'+'*'*len(title)+'\n\n')
 
-    if args.input is not None:  # Process PDB file
-        if os.path.getsize(args.input) == 0:
-            sysexit(2, 'Error: Empty PDB file')  # Exit if input file is empty
-        process_pdb(args.input, outp, xml=args.xml, verbose_mode=args.verbose, pics=args.pics, pymol=args.pymol,
-                    maxthreads=int(args.maxthreads))
-    else:  # Try to fetch the current PDB structure directly from the RCBS server
-        try:
-            pdbfile, pdbid = fetch_pdb(args.pdbid.lower(), verbose_mode=args.verbose)
-            pdbpath = '%s/%s.pdb' % (args.outpath.rstrip('/'), pdbid)
-            create_folder_if_not_exists(args.outpath)
-
-            if args.verbose:
-                sys.stdout.write('file downloaded as %s\n\n' % pdbpath)
-
-            with open(tilde_expansion(pdbpath), 'w') as g:
-                g.write(pdbfile)
-            process_pdb(tilde_expansion(pdbpath), tilde_expansion(outp), xml=args.xml, verbose_mode=args.verbose,
-                        pics=args.pics, pymol=args.pymol, maxthreads=int(args.maxthreads))
-        except ValueError:  # Invalid PDB ID, cannot fetch from RCBS server
-            sysexit(3, 'Error: Invalid PDB ID')
+    if args.input == ['-']:  # Structure from stdin, analyzed in memory
+        content = sys.stdin.read()
+        if not content:
+            sysexit(2, 'Error: Empty PDB file')
+        process_pdb(content, outp, as_string=True, **options)
+    elif args.input is not None:  # Process PDB files
+        for pdbpath in entries:
+            if os.path.getsize(pdbpath) == 0:
+                if not batch:
+                    sysexit(2, 'Error: Empty PDB file')  # Exit if input file is empty
+                journal.start(pdbpath)
+                journal.fail(pdbpath, 'Empty PDB file')
+                failed.append(pdbpath)
+                continue
+            if not batch:
+                process_pdb(pdbpath, outp, **options)
+            elif not process_entry(pdbpath, pdbpath, '%s%s/' % (outp, os.path.basename(pdbpath).split('.')[0]),
+                                   journal, options, collected):
+                failed.append(pdbpath)
+    elif entries:  # Try to fetch the current PDB structures from a local mirror, the download cache or the RCBS server
+        fetcher = StructureFetcher(mirror=args.mirror, cache=args.pdbcache, base_url=args.pdburl,
+                                   connections=args.connections)
+        for query, result in fetch_pdb(entries, verbose_mode=args.verbose, fetcher=fetcher):
+            if result.status in ['UNKNOWN', 'UNAVAILABLE', 'FAILED']:
+                # Failed entries are not necessarily invalid, they are retried with --resume
+                code, msg = {'UNKNOWN': (3, 'Error: Invalid PDB ID'),
+                             'UNAVAILABLE': (5, 'Error: No file in PDB or mmCIF format available from wwPDB for the '
+                                                'given PDB ID.'),
+                             'FAILED': (7, 'Error: %s' % result.error)}[result.status]
+                if not batch:
+                    sysexit(code, msg)
+                sys.stderr.write('%s (%s)\n' % (msg, query))
+                journal.start(query)
+                journal.fail(query, msg)
+                failed.append(query)
+                continue
+            pdbid = result.current
+            if args.stdout and result.path is None:  # Analyzed in memory, nothing is written to disk
+                process_pdb(result.content, outp, as_string=True, **options)
+                continue
+            structure_outp = '%s%s/' % (outp, pdbid) if batch else outp
+            create_folder_if_not_exists(structure_outp)
+            pdbpath = result.path
+            if pdbpath is None:  # Not available as a local file, write it to the output folder
+                pdbpath = tilde_expansion('%s%s.%s' % (structure_outp, pdbid, file_extension(result.content)))
+                with atomic_write(pdbpath) as g:
+                    g.write(result.content)
+                if args.verbose:
+                    sys.stdout.write('file downloaded as %s\n\n' % pdbpath)
+            if not batch:
+                process_pdb(pdbpath, tilde_expansion(structure_outp), **options)
+            elif not process_entry(query, pdbpath, tilde_expansion(structure_outp), journal, options, collected):
+                failed.append(query)
+    if journal is not None:
+        journal.close()
+        if args.memory:
+            write_memory_summary(outp, args.verbose)
+        if failed:
+            sysexit(1, 'Error: %i of %i structures could not be processed, see %s\n'
+                    % (len(failed), len(entries), journal.path))
     if pdbid is not None and outp is not None:
         if outp in ['.', './']:
             outp = 'the working directory.'
@@ -234,18 +425,79 @@ if __name__ == '__main__':
 
     parser = ArgumentParser(prog="PLIP", description=descript)
     pdbstructure = parser.add_mutually_exclusive_group(required=True)  # Needs either PDB ID or file
-    pdbstructure.add_argument("-f", "--file", dest="input")
-    pdbstructure.add_argument("-i", "--input", dest="pdbid")
+    pdbstructure.add_argument("-f", "--file", dest="input", nargs="+",
+                              help="One or several PDB files, several files are processed in batch mode. "
+                                   "Use - to read a single structure from stdin")
+    pdbstructure.add_argument("-i", "--input", dest="pdbid", nargs="+",
+                              help="One or several PDB IDs, several IDs are processed in batch mode")
+    pdbstructure.add_argument("--render", dest="render", default=None, metavar="FILE",
+                              help="Render reports and visualizations from interaction sets saved with --sets "
+                                   "instead of analyzing a structure")
+    pdbstructure.add_argument("--serve", dest="serve", default=None, type=int, metavar="PORT",
+                              help="Run as a service answering analysis requests via HTTP on the given port")
     parser.add_argument("-o", "--out", dest="outpath", default="./")
     parser.add_argument("-v", "--verbose", dest="verbose", default=False, help="Set verbose mode", action="store_true")
     parser.add_argument("-p", "--pics", dest="pics", default=False, help="Additional pictures", action="store_true")
     parser.add_argument("-x", "--xml", dest="xml", default=False, help="Additional XML output for reports",
                         action="store_true")
+    parser.add_argument("-O", "--stdout", dest="stdout", default=False, action="store_true",
+                        help="Write the report to stdout instead of the output folder (XML report with -x)")
+    parser.add_argument("--compact-xml", dest="compact", default=False, action="store_true",
+                        help="Write coordinates as attributes in the XML report")
+    parser.add_argument("--jsonl", dest="jsonl", default=False, action="store_true",
+                        help="Additional JSON Lines output with one line per binding site (collected in "
+                             "plip-report.jsonl.gz in batch mode)")
+    parser.add_argument("--tables", dest="tables", default=None, metavar="DIR",
+                        help="Add the interactions to columnar tables in a folder, one table per interaction type")
+    parser.add_argument("--db", dest="database", default=None, metavar="FILE",
+                        help="Store the results in a SQLite database, which can be shared by several runs")
+    parser.add_argument("--fingerprints", dest="fingerprints", default=None, metavar="DIR",
+                        help="Add interaction fingerprints of all binding sites to a fingerprint store")
+    parser.add_argument("--sets", dest="sets", default=False, action="store_true",
+                        help="Save the interaction sets (interactions.plipsets) for rendering with --render")
     parser.add_argument("-y", "--pymol", dest="pymol", default=False, help="Additional PyMOL session files",
                         action="store_true")
+    parser.add_argument("--single-session", dest="single_session", default=False, action="store_true",
+                        help="Visualize all binding sites in one PyMOL session with one scene per site, the session "
+                             "is saved as PDBID.pse")
     parser.add_argument("--maxthreads", dest="maxthreads", default=1,
                         help="Set maximum number of main threads (number of binding sites processed simultaneously)",
                         type=int)
+    parser.add_argument("--timeout", dest="timeout", default=None, type=float,
+                        help="Maximum time in seconds for the visualization of a single binding site (of all sites "
+                             "with --single-session) or for a single analysis in service mode")
+    parser.add_argument("--cache", dest="cache", default=None, metavar="DIR",
+                        help="Reuse results of earlier runs with identical input and settings stored in this folder")
+    parser.add_argument("--cache-size", dest="cache_size", default=1024, type=float, metavar="MB",
+                        help="Maximum size of the result cache in megabytes")
+    parser.add_argument("--pdb-mirror", dest="mirror", default=None, metavar="DIR",
+                        help="Local mirror of PDB files, searched before downloading (also divided wwPDB layout)")
+    parser.add_argument("--pdb-cache", dest="pdbcache", default=None, metavar="DIR",
+                        help="Folder for caching downloaded PDB files")
+    parser.add_argument("--pdb-url", dest="pdburl", default=DEFAULT_URL, metavar="URL",
+                        help="Base URL of the PDB server")
+    parser.add_argument("--connections", dest="connections", default=4, type=int,
+                        help="Number of simultaneous connections for downloading PDB files")
+    parser.add_argument("--profile", dest="profile", default=False, action="store_true",
+                        help="Write timings of all analysis stages and call counts to profile.json")
+    parser.add_argument("--profile-swig", dest="swig", default=False, action="store_true",
+                        help="Profile as with --profile and additionally count the calls of OpenBabel methods, "
+                             "which slows down the analysis")
+    parser.add_argument("--profile-memory", dest="memory", default=False, action="store_true",
+                        help="Profile as with --profile and additionally record the memory usage of all stages and "
+                             "binding sites, with a summary for batch runs in memory-summary.json")
+    parser.add_argument("--sweep", dest="sweep", default=None, metavar="FILE",
+                        help="Analyze with all threshold settings from a JSON file, writing reports for each setting")
+    parser.add_argument("--journal", dest="journal", default=None, metavar="FILE",
+                        help="Journal of finished and failed structures in batch mode "
+                             "(default: plip-journal.jsonl in the output folder)")
+    parser.add_argument("--resume", dest="resume", default=False, action="store_true",
+                        help="Resume an interrupted batch run, skipping structures which are already finished")
+    parser.add_argument("--max-retries", dest="max_retries", default=2, type=int,
+                        help="Number of retries for failed structures when resuming a batch run")
+    parser.add_argument("--host", dest="host", default="127.0.0.1", help="Address to listen on in service mode")
+    parser.add_argument("--workers", dest="workers", default=None, type=int,
+                        help="Number of pre-forked worker processes in service mode (default: number of cores)")
     # Optional threshold arguments, not shown in help
     thr = namedtuple('threshold', 'name type')
     thresholds = [thr(name='aromatic_planarity', type='angle'),
@@ -263,7 +515,9 @@ if __name__ == '__main__':
                             help=argparse.SUPPRESS)
 
     arguments = parser.parse_args()
-    # Assign values to global thresholds
+    # Collect thresholds given on the command line, all others keep their default values from the config module
+    given = {}
+    bs_dist = config.BS_DIST
     for t in thresholds:
         tvalue = getattr(arguments, t.name)
         if tvalue is not None:
@@ -272,16 +526,54 @@ if __name__ == '__main__':
             if t.type == 'distance':
                 if tvalue > 10:  # Check value for angle thresholds
                     parser.error("Threshold for distances must not be larger than 10 Angstrom.")
-                elif tvalue > config.BS_DIST+1:  # Dynamically adapt the search space for binding site residues
-                    config.BS_DIST = tvalue + 1
-            setattr(config, t.name.upper(), tvalue)
+                elif tvalue > bs_dist+1:  # Dynamically adapt the search space for binding site residues
+                    bs_dist = tvalue + 1
+                    given['bs_dist'] = bs_dist
+            given[t.name] = tvalue
+    settings = config.Settings(**given)
+    if arguments.input is not None and '-' in arguments.input and \
+            (len(arguments.input) > 1 or arguments.journal is not None or arguments.resume):
+        parser.error("Only a single structure can be read from stdin, batch mode is not available.")
+    if arguments.stdout:
+        if arguments.verbose or arguments.pics or arguments.pymol or arguments.sweep is not None or \
+                arguments.tables is not None or arguments.database is not None or arguments.fingerprints is not None:
+            parser.error("Output to stdout can't be combined with verbose mode, pictures, PyMOL sessions, sweeps, "
+                         "tables, databases or fingerprints.")
+        if arguments.pdbid is not None and len(arguments.pdbid) > 1 or arguments.input is not None and \
+                len(arguments.input) > 1 or arguments.journal is not None or arguments.resume:
+            parser.error("Output to stdout is only possible for a single structure.")
     # Check additional conditions for interdependent thresholds
-    if not config.HALOGEN_ACC_ANGLE > config.HALOGEN_ANGLE_DEV:
+    if not settings.HALOGEN_ACC_ANGLE > settings.HALOGEN_ANGLE_DEV:
         parser.error("The halogen acceptor angle has to be larger than the halogen angle deviation.")
-    if not config.HALOGEN_DON_ANGLE > config.HALOGEN_ANGLE_DEV:
+    if not settings.HALOGEN_DON_ANGLE > settings.HALOGEN_ANGLE_DEV:
         parser.error("The halogen donor angle has to be larger than the halogen angle deviation.")
-    if not config.WATER_BRIDGE_MINDIST < config.WATER_BRIDGE_MAXDIST:
+    if not settings.WATER_BRIDGE_MINDIST < settings.WATER_BRIDGE_MAXDIST:
         parser.error("The water bridge minimum distance has to be smaller than the water bridge maximum distance.")
-    if not config.WATER_BRIDGE_OMEGA_MIN < config.WATER_BRIDGE_OMEGA_MAX:
+    if not settings.WATER_BRIDGE_OMEGA_MIN < settings.WATER_BRIDGE_OMEGA_MAX:
         parser.error("The water bridge omega minimum angle has to be smaller than the water bridge omega maximum angle")
-    main(arguments)  # Start main script
+    if arguments.render is not None and (arguments.sweep is not None or arguments.sets or arguments.cache is not None):
+        parser.error("Saved interaction sets can't be rendered with sweeps, saved again or cached.")
+    sweep = None
+    if arguments.sweep is not None:
+        if arguments.tables is not None or arguments.database is not None or arguments.fingerprints is not None:
+            parser.error("Sweeps can't be added to tables, databases or fingerprints, as each binding site has "
+                         "results for several settings.")
+        from modules.sweep import read_grid, loosest
+        try:
+            sweep = read_grid(arguments.sweep, settings)
+            loosest(sweep)
+        except (IOError, ValueError, TypeError) as e:
+            parser.error("Invalid threshold settings for sweep: %s" % e)
+    if arguments.serve is not None:
+        from modules.service import PLIPService, serve
+        # All jobs use the same settings
+        service = PLIPService(__version__, workers=arguments.workers, timeout=arguments.timeout, settings=settings)
+        if arguments.verbose:
+            sys.stdout.write('PLIP v%s service with %i workers listening on %s:%i\n'
+                             % (__version__, service.workers, arguments.host, arguments.serve))
+        serve(service, host=arguments.host, port=arguments.serve, verbose=arguments.verbose)
+    else:
+        try:
+            main(arguments, settings, sweep)  # Start main script
+        except UnsupportedStructure as e:  # Batch runs record the error in the journal instead
+            sysexit(6, 'Error: %s' % e)
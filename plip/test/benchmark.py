@@ -0,0 +1,165 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+benchmark.py - Benchmark of the full analysis and its stages over the test structures.
+Run from the test folder, e.g.
+    python benchmark.py --repetitions 5 --save-baseline
+    python benchmark.py --threshold 0.1  # Exits with code 1 if any structure got more than 10 % slower
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Python standard library
+import os
+import sys
+import json
+import glob
+import time
+import socket
+import resource
+import multiprocessing
+from argparse import ArgumentParser
+
+HISTORY_FILE = 'benchmark-history.jsonl'
+BASELINE_FILE = 'benchmark-baseline.json'
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+
+def analyze(path, xml):
+    """Full pipeline without visualization: analysis and generation of the reports in memory."""
+    from plip.modules.preparation import PDBComplex
+    from plip.modules.report import StructureReport
+    from StringIO import StringIO
+    mol = PDBComplex()
+    mol.load_pdb(path)
+    report = StructureReport(mol, 'benchmark')
+    report.stream_txt(StringIO())
+    if xml:
+        report.stream_xml(StringIO())
+
+
+def run_structure(path, warmup, repetitions, xml, queue):
+    """Runs in a fresh child process, so the peak memory usage belongs to this structure only."""
+    from plip.modules import profiling
+    try:
+        for i in range(warmup):
+            analyze(path, xml)
+        walltimes, stages = [], {}
+        for i in range(repetitions):
+            profiler = profiling.enable()
+            start = time.time()
+            analyze(path, xml)
+            walltimes.append(time.time() - start)
+            profiling.disable()
+            for name, stats in profiler.stages.items():
+                stages.setdefault(name, []).append(stats['seconds'])
+        # ru_maxrss is given in kilobytes on Linux and in bytes on OS X
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_kb = peak // 1024 if sys.platform == 'darwin' else peak
+        queue.put({'wall': median(walltimes), 'wall_min': min(walltimes), 'wall_max': max(walltimes),
+                   'stages': {name: median(times) for name, times in stages.items()}, 'peak_rss_kb': peak_kb})
+    except (Exception, SystemExit) as e:
+        queue.put({'error': str(e) or type(e).__name__})
+
+
+def benchmark(paths, warmup=1, repetitions=5, xml=True, verbose=True):
+    """Benchmarks each structure in its own child process and returns a dictionary with the results by name."""
+    results = {}
+    for path in paths:
+        name = os.path.basename(path).split('.')[0]
+        queue = multiprocessing.Queue()
+        child = multiprocessing.Process(target=run_structure, args=(path, warmup, repetitions, xml, queue))
+        child.start()
+        child.join()  # The result is small enough for the pipe buffer
+        result = queue.get() if not queue.empty() else {'error': 'exit code %s' % child.exitcode}
+        results[name] = result
+        if verbose:
+            if 'error' in result:
+                sys.stdout.write('%-6s failed: %s\n' % (name, result['error']))
+            else:
+                sys.stdout.write('%-6s %8.3f s %8i kB\n' % (name, result['wall'], result['peak_rss_kb']))
+    return results
+
+
+def revision():
+    """Current git revision of the working copy, if available."""
+    import subprocess
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(results, baseline, threshold):
+    """Returns a message for each structure whose wall time or peak memory exceeds the baseline by more than the
+    threshold (as fraction, e.g. 0.1 for 10 %)."""
+    messages = []
+    for name, result in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None or 'error' in reference:
+            continue
+        if 'error' in result:
+            messages.append('%s failed: %s' % (name, result['error']))
+            continue
+        for key, unit in [('wall', 's'), ('peak_rss_kb', 'kB')]:
+            if result[key] > reference[key] * (1 + threshold):
+                messages.append('%s: %s %.3f %s exceeds baseline %.3f %s by more than %i %%'
+                                % (name, key, result[key], unit, reference[key], unit, threshold * 100))
+    return messages
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark of PLIP over the test structures.')
+    parser.add_argument('structures', nargs='*', help='PDB files (default: all files in ./pdb)')
+    parser.add_argument('-n', '--repetitions', type=int, default=5, help='Timed runs per structure')
+    parser.add_argument('-w', '--warmup', type=int, default=1, help='Untimed runs per structure before timing')
+    parser.add_argument('--no-xml', dest='xml', default=True, action='store_false',
+                        help='Generate only the rST report')
+    parser.add_argument('--history', default=HISTORY_FILE, help='File to which results of each run are appended')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Results to compare with')
+    parser.add_argument('--save-baseline', default=False, action='store_true',
+                        help='Store the results as new baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Accepted slowdown or memory increase against the baseline (fraction)')
+    args = parser.parse_args()
+    paths = args.structures or sorted(glob.glob('./pdb/*.pdb'))
+    results = benchmark(paths, args.warmup, args.repetitions, args.xml)
+    run = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': revision(), 'host': socket.gethostname(),
+           'python': sys.version.split()[0], 'warmup': args.warmup, 'repetitions': args.repetitions,
+           'structures': results}
+    with open(args.history, 'a') as f:
+        f.write(json.dumps(run, sort_keys=True) + '\n')
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        return 0
+    if not os.path.exists(args.baseline):
+        sys.stdout.write('No baseline found, use --save-baseline to store one.\n')
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    messages = regressions(results, baseline, args.threshold)
+    for message in messages:
+        sys.stderr.write('Regression: %s\n' % message)
+    return 1 if messages else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+differential.py - Compare the interactions of a candidate engine with the reference for all test structures.
+Run from the test folder, e.g.
+    python differential.py parallel --perturbations 3
+    python differential.py mymodule:fast_engine ./pdb/1vsn.pdb
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+# Python standard library
+import sys
+import glob
+from argparse import ArgumentParser
+
+# Own modules
+from plip.modules.equivalence import check_equivalence, get_engine, DISTANCE_TOLERANCE, ANGLE_TOLERANCE
+
+
+def main():
+    parser = ArgumentParser(description='Differential test of a candidate engine against the reference engine.')
+    parser.add_argument('candidate', help='Built-in engine (parallel, pickled, saved, sweep) or module:function')
+    parser.add_argument('structures', nargs='*', help='PDB files (default: all files in ./pdb)')
+    parser.add_argument('--reference', default='reference', help='Engine to compare with')
+    parser.add_argument('--perturbations', type=int, default=0,
+                        help='Number of additional runs with randomly perturbed coordinates per structure')
+    parser.add_argument('--magnitude', type=float, default=0.1, help='Maximum perturbation per axis in Angstrom')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--distance-tolerance', type=float, default=DISTANCE_TOLERANCE)
+    parser.add_argument('--angle-tolerance', type=float, default=ANGLE_TOLERANCE)
+    args = parser.parse_args()
+    candidate, reference = get_engine(args.candidate), get_engine(args.reference)
+    failed = 0
+    for path in args.structures or sorted(glob.glob('./pdb/*.pdb')):
+        with open(path) as f:
+            pdbstring = f.read()
+        results = check_equivalence(pdbstring, candidate, reference, perturbations=args.perturbations,
+                                    magnitude=args.magnitude, seed=args.seed, distance_tol=args.distance_tolerance,
+                                    angle_tol=args.angle_tolerance)
+        for variant, differences in sorted(results.items()):
+            sys.stdout.write('%s %s: %s\n' % (path, variant, 'OK' if not differences else
+                                              '%i differences' % len(differences)))
+            for d in differences:
+                sys.stdout.write('  %s %s %s\n' % (d.site, d.kind, d.detail))
+            failed += bool(differences)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
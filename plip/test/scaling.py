@@ -0,0 +1,117 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+scaling.py - Benchmark of the scaling of all stages with the number of atoms, ligands or waters.
+Run from the test folder, e.g.
+    python scaling.py chains --sizes 1 2 4 8
+    python scaling.py waters --structure ./pdb/1osn.pdb --output scaling.json
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+# Python standard library
+import os
+import sys
+import json
+import math
+import shutil
+import tempfile
+from argparse import ArgumentParser
+
+# Own modules
+from benchmark import benchmark
+import synthetic
+
+WATERS_PER_STEP = 1000  # Water molecules added per size step
+SUPERLINEAR = 1.2  # Exponents above this value are marked
+
+
+def generate(struct, dimension, size):
+    """Returns a synthetic complex and its size (number of atoms, ligands or added water molecules)."""
+    if dimension == 'chains':
+        result = synthetic.replicate(struct, size)
+        return result, len(result.atoms)
+    if dimension == 'ligands':
+        existing = len(synthetic.ligand_residues(struct))
+        result = synthetic.add_ligands(struct, existing * (size - 1))
+        return result, existing * size
+    result = synthetic.add_water_shell(struct, WATERS_PER_STEP * size)
+    return result, WATERS_PER_STEP * size
+
+
+def scaling_exponent(sizes, times):
+    """Slope of the least-squares line through log(time) over log(size), e.g. 1 for linear and 2 for quadratic."""
+    points = [(math.log(s), math.log(t)) for s, t in zip(sizes, times) if t > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, y in points) / len(points)
+    mean_y = sum(y for x, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, y in points)
+    if variance == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def main():
+    parser = ArgumentParser(description='Scaling benchmark of PLIP with synthetic complexes.')
+    parser.add_argument('dimension', choices=['chains', 'ligands', 'waters'],
+                        help='Replicate the whole complex, multiply the ligands or add water molecules')
+    parser.add_argument('--structure', default='./pdb/1vsn.pdb', help='Structure the complexes are generated from')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 2, 4, 8], help='Size steps')
+    parser.add_argument('-n', '--repetitions', type=int, default=3, help='Timed runs per size')
+    parser.add_argument('-w', '--warmup', type=int, default=1, help='Untimed runs per size before timing')
+    parser.add_argument('--output', default=None, help='JSON file for the timings and exponents')
+    args = parser.parse_args()
+
+    struct = synthetic.read_structure(args.structure)
+    tmpdir = tempfile.mkdtemp(prefix='plip-scaling')
+    sizes, paths = [], []
+    try:
+        for step in args.sizes:
+            generated, size = generate(struct, args.dimension, step)
+            path = os.path.join(tmpdir, '%s-%i.pdb' % (args.dimension, step))
+            with open(path, 'w') as f:
+                f.write(synthetic.write_structure(generated))
+            sizes.append(size)
+            paths.append(path)
+        results = benchmark(paths, args.warmup, args.repetitions, xml=False, verbose=False)
+    finally:
+        shutil.rmtree(tmpdir)
+    runs = [results['%s-%i' % (args.dimension, step)] for step in args.sizes]
+    failed = [run['error'] for run in runs if 'error' in run]
+    if failed:
+        sys.stderr.write('Error: %s\n' % failed[0])
+        return 1
+
+    stages = sorted(set.intersection(*[set(run['stages']) for run in runs]))
+    timings = {'total': [run['wall'] for run in runs]}
+    timings.update({stage: [run['stages'][stage] for run in runs] for stage in stages})
+    exponents = {name: scaling_exponent(sizes, times) for name, times in timings.items()}
+    sys.stdout.write('%-24s %s  exponent\n' % ('size (%s)' % args.dimension, ' '.join('%9i' % s for s in sizes)))
+    for name in ['total'] + stages:
+        exponent = exponents[name]
+        mark = ' !' if exponent is not None and exponent > SUPERLINEAR else ''
+        sys.stdout.write('%-24s %s  %s%s\n' % (name, ' '.join('%9.4f' % t for t in timings[name]),
+                                               '%.2f' % exponent if exponent is not None else '-', mark))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump({'dimension': args.dimension, 'structure': args.structure, 'sizes': sizes,
+                       'peak_rss_kb': [run['peak_rss_kb'] for run in runs], 'timings': timings,
+                       'exponents': exponents}, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+synthetic.py - Generate large synthetic complexes from the test structures for scaling benchmarks.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+
+# Python standard library
+import math
+import random
+from collections import namedtuple, defaultdict
+
+# Chain IDs available for replicated chains
+CHAIN_IDS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+CLASH_DIST = 2.6  # Minimum distance of added atoms to all other atoms
+
+# One ATOM/HETATM record. Key identifies the atom across copies, line is the original record (for all other columns).
+atomrecord = namedtuple('atomrecord', 'key hetatm resn chain resi x y z line')
+# Atoms in file order and bonds from CONECT records as pairs of atom keys
+structure = namedtuple('structure', 'atoms bonds')
+
+
+def read_structure(path):
+    """Reads the atoms of the first model and the CONECT records of a PDB file."""
+    atoms, bonds = [], []
+    with open(path) as f:
+        for line in f:
+            if line.startswith(('ATOM', 'HETATM')):
+                atoms.append(atomrecord(key=int(line[6:11]), hetatm=line.startswith('HETATM'), resn=line[17:20].strip(),
+                                        chain=line[21], resi=int(line[22:26]), x=float(line[30:38]),
+                                        y=float(line[38:46]), z=float(line[46:54]), line=line.rstrip('\r\n')))
+            elif line.startswith('CONECT'):
+                serials = [int(line[i:i+5]) for i in range(6, 31, 5) if line[i:i+5].strip()]
+                bonds.extend((serials[0], partner) for partner in serials[1:] if serials[0] < partner)
+            elif line.startswith('ENDMDL'):
+                break
+    return structure(atoms=atoms, bonds=bonds)
+
+
+def write_structure(struct):
+    """Returns the structure in PDB format. Atoms are numbered continuously (wrapping at 100000), with TER records at
+    the end of each protein chain, which take a number as in files from the PDB."""
+    serial, lines, conect = {}, [], []
+    number = 0
+    for n, atom in enumerate(struct.atoms):
+        number += 1
+        serial[atom.key] = number % 100000
+        lines.append('%s%5i%s%s%4i%s%8.3f%8.3f%8.3f%s' % (atom.line[:6], serial[atom.key], atom.line[11:21],
+                                                          atom.chain, atom.resi, atom.line[26:30], atom.x, atom.y,
+                                                          atom.z, atom.line[54:]))
+        following = struct.atoms[n + 1] if n + 1 < len(struct.atoms) else None
+        if not atom.hetatm and (following is None or following.hetatm or following.chain != atom.chain):
+            number += 1
+            lines.append('TER   %5i      %s %s%4i' % (number % 100000, atom.resn, atom.chain, atom.resi))
+    partners = defaultdict(list)
+    for a, b in struct.bonds:
+        partners[a].append(b)
+        partners[b].append(a)
+    for atom in struct.atoms:
+        for i in range(0, len(partners[atom.key]), 4):
+            conect.append('CONECT%5i%s' % (serial[atom.key],
+                                           ''.join('%5i' % serial[b] for b in partners[atom.key][i:i+4])))
+    return '\n'.join(lines + conect + ['END', ''])
+
+
+############
+# Geometry #
+############
+
+def centroid(atoms):
+    return tuple(sum(getattr(a, axis) for a in atoms) / len(atoms) for axis in 'xyz')
+
+
+def random_rotation(rng):
+    """Uniformly distributed rotation matrix from a random unit quaternion."""
+    u1, u2, u3 = rng.random(), rng.random(), rng.random()
+    a, b = math.sqrt(1 - u1), math.sqrt(u1)
+    w, x, y, z = a * math.sin(2 * math.pi * u2), a * math.cos(2 * math.pi * u2), \
+        b * math.sin(2 * math.pi * u3), b * math.cos(2 * math.pi * u3)
+    return [[1 - 2*(y*y + z*z), 2*(x*y - z*w), 2*(x*z + y*w)],
+            [2*(x*y + z*w), 1 - 2*(x*x + z*z), 2*(y*z - x*w)],
+            [2*(x*z - y*w), 2*(y*z + x*w), 1 - 2*(x*x + y*y)]]
+
+
+class SpatialHash():
+    """Grid of atom positions for fast clash checks."""
+
+    def __init__(self, positions=(), cell=CLASH_DIST):
+        self.cell = cell
+        self.cells = defaultdict(list)
+        for position in positions:
+            self.add(position)
+
+    def index(self, position):
+        return tuple(int(math.floor(c / self.cell)) for c in position)
+
+    def add(self, position):
+        self.cells[self.index(position)].append(position)
+
+    def clashes(self, position, distance=CLASH_DIST):
+        ix, iy, iz = self.index(position)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for other in self.cells.get((ix + dx, iy + dy, iz + dz), ()):
+                        if sum((p - o) ** 2 for p, o in zip(position, other)) < distance ** 2:
+                            return True
+        return False
+
+
+##############
+# Generators #
+##############
+
+def replicate(struct, copies, gap=10.0):
+    """Places copies of the whole complex (protein, ligands and water) side by side along the x axis. Each copy gets
+    its own chain IDs, so all ligands stay separate binding sites."""
+    chains = sorted(set(atom.chain for atom in struct.atoms))
+    if len(chains) * copies > len(CHAIN_IDS):
+        raise ValueError('Not more than %i chains possible, got %i' % (len(CHAIN_IDS), len(chains) * copies))
+    width = max(a.x for a in struct.atoms) - min(a.x for a in struct.atoms) + gap
+    atoms, bonds = [], []
+    for copy in range(copies):
+        chainmap = {chain: CHAIN_IDS[copy * len(chains) + i] for i, chain in enumerate(chains)}
+        atoms.extend(atom._replace(key=(copy, atom.key), chain=chainmap[atom.chain], x=atom.x + copy * width)
+                     for atom in struct.atoms)
+        bonds.extend(((copy, a), (copy, b)) for a, b in struct.bonds)
+    return structure(atoms=atoms, bonds=bonds)
+
+
+def ligand_residues(struct):
+    """Atoms of all ligands (HETATM residues other than water) by (resn, chain, resi)."""
+    residues = defaultdict(list)
+    for atom in struct.atoms:
+        if atom.hetatm and atom.resn not in ('HOH', 'WAT', 'DOD'):
+            residues[(atom.resn, atom.chain, atom.resi)].append(atom)
+    return [residues[key] for key in sorted(residues) if len(residues[key]) > 1]  # Ions aren't multiplied
+
+
+def add_ligands(struct, count, seed=0, attempts=200):
+    """Adds randomly rotated copies of the ligands at the protein surface, without clashes. Covalent bonds to the
+    protein are not copied."""
+    rng = random.Random(seed)
+    ligands = ligand_residues(struct)
+    if not ligands:
+        raise ValueError('The structure contains no ligand to multiply.')
+    protein = [atom for atom in struct.atoms if not atom.hetatm]
+    center = centroid(protein)
+    grid = SpatialHash((a.x, a.y, a.z) for a in struct.atoms)
+    atoms, bonds = list(struct.atoms), list(struct.bonds)
+    resi = max(atom.resi for atom in struct.atoms) + 1
+    for n in range(count):
+        ligand = ligands[n % len(ligands)]
+        keys = set(atom.key for atom in ligand)
+        lig_center = centroid(ligand)
+        radius = max(math.sqrt(sum((getattr(a, axis) - c) ** 2 for axis, c in zip('xyz', lig_center))) for a in ligand)
+        for attempt in range(attempts):
+            anchor = rng.choice(protein)
+            direction = [getattr(anchor, axis) - c for axis, c in zip('xyz', center)]
+            norm = math.sqrt(sum(d * d for d in direction)) or 1.0
+            target = [getattr(anchor, axis) + d / norm * (radius + 3.5) for axis, d in zip('xyz', direction)]
+            rotation = random_rotation(rng)
+            placed = []
+            for atom in ligand:
+                rel = [getattr(atom, axis) - c for axis, c in zip('xyz', lig_center)]
+                placed.append(tuple(t + sum(r * v for r, v in zip(row, rel)) for t, row in zip(target, rotation)))
+            if not any(grid.clashes(position) for position in placed):
+                break
+        else:
+            raise ValueError('No free position found for ligand %i.' % (n + 1))
+        for position in placed:
+            grid.add(position)
+        atoms.extend(atom._replace(key=('ligand', n, atom.key), resi=resi % 10000, x=x, y=y, z=z)
+                     for atom, (x, y, z) in zip(ligand, placed))
+        bonds.extend((('ligand', n, a), ('ligand', n, b)) for a, b in struct.bonds if a in keys and b in keys)
+        resi += 1
+    return structure(atoms=atoms, bonds=bonds)
+
+
+def add_water_shell(struct, count, thickness=3.5, seed=0, attempts=1000):
+    """Adds water molecules (oxygen only, as in crystal structures) within the given distance of random atoms of the
+    complex or of water added before, without clashes. Many molecules give dense shells of several layers."""
+    rng = random.Random(seed)
+    grid = SpatialHash((a.x, a.y, a.z) for a in struct.atoms)
+    template = 'HETATM    0  O   HOH A   0       0.000   0.000   0.000  1.00 20.00           O  '
+    chain = struct.atoms[0].chain
+    resi = max(atom.resi for atom in struct.atoms) + 1
+    atoms = list(struct.atoms)
+    for n in range(count):
+        for attempt in range(attempts):
+            anchor = rng.choice(atoms)
+            direction = [rng.gauss(0, 1) for axis in 'xyz']
+            norm = math.sqrt(sum(d * d for d in direction)) or 1.0
+            distance = rng.uniform(CLASH_DIST, thickness)
+            position = tuple(getattr(anchor, axis) + d / norm * distance for axis, d in zip('xyz', direction))
+            if not grid.clashes(position):
+                break
+        else:
+            raise ValueError('The water shell is full after %i molecules.' % n)
+        grid.add(position)
+        atoms.append(atomrecord(key=('water', n), hetatm=True, resn='HOH', chain=chain, resi=(resi + n) % 10000,
+                                x=position[0], y=position[1], z=position[2], line=template))
+    return structure(atoms=atoms, bonds=list(struct.bonds))
@@ -0,0 +1,93 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_cache.py - Unit Tests for the result cache.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from plip.modules.preparation import PDBComplex
+from plip.modules.report import StructureReport
+from plip.modules.cache import ResultCache
+from plip.modules.serialization import SETS_FILE
+from plip.modules import config
+
+
+class ResultCacheTest(unittest.TestCase):
+    """Checks storage, retrieval and eviction of cached results."""
+
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+        self.outdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir)
+        shutil.rmtree(self.outdir)
+
+    def test_roundtrip(self):
+        """Cached interaction sets give the same report as the original analysis."""
+        cache = ResultCache(self.cachedir)
+        key = cache.key('./pdb/1vsn.pdb', 'test')
+        self.assertIsNone(cache.load(key))
+        mol = PDBComplex()
+        mol.load_pdb('./pdb/1vsn.pdb')
+        StructureReport(mol, 'test').write_txt(self.outdir)
+        cache.store(key, mol, self.outdir, ['report.rst.txt'])
+        cached = cache.load(key)
+        self.assertEqual(sorted(cached.interaction_sets), sorted(mol.interaction_sets))
+        self.assertEqual(StructureReport(cached, 'test').construct_txt_file(),
+                         StructureReport(mol, 'test').construct_txt_file())
+
+    def test_key_depends_on_thresholds(self):
+        """Changing a threshold must not reuse results."""
+        cache = ResultCache(self.cachedir)
+        key = cache.key('./pdb/1vsn.pdb', 'test')
+        original = config.HBOND_DIST_MAX
+        config.HBOND_DIST_MAX = original + 0.5
+        try:
+            self.assertNotEqual(key, cache.key('./pdb/1vsn.pdb', 'test'))
+        finally:
+            config.HBOND_DIST_MAX = original
+
+    def test_key_depends_on_report_format(self):
+        """Reports in another format must not be restored."""
+        cache = ResultCache(self.cachedir)
+        self.assertEqual(cache.key('./pdb/1vsn.pdb', 'test'), cache.key('./pdb/1vsn.pdb', 'test', options={}))
+        self.assertNotEqual(cache.key('./pdb/1vsn.pdb', 'test', options={'compact': False}),
+                            cache.key('./pdb/1vsn.pdb', 'test', options={'compact': True}))
+
+    def test_eviction(self):
+        """Least recently used entries are removed when the cache is full."""
+        mol = PDBComplex()
+        mol.load_pdb('./pdb/1vsn.pdb')
+        cache = ResultCache(self.cachedir, max_size=1)
+        cache.store(cache.key('./pdb/1vsn.pdb', 'a'), mol, self.outdir, [])
+        self.assertIsNone(cache.load(cache.key('./pdb/1vsn.pdb', 'a')))
+
+    def test_damaged_entry(self):
+        """Entries which can't be read are cache misses."""
+        mol = PDBComplex()
+        mol.load_pdb('./pdb/1vsn.pdb')
+        cache = ResultCache(self.cachedir)
+        key = cache.key('./pdb/1vsn.pdb', 'test')
+        cache.store(key, mol, self.outdir, [])
+        self.assertIsNotNone(cache.load(key))
+        with open(os.path.join(cache.entry_path(key), SETS_FILE), 'wb') as f:
+            f.write('\x80\x02cos\nsystem\n')  # e.g. a pickle
+        self.assertIsNone(cache.load(key))
@@ -0,0 +1,65 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_compressed.py - Unit Tests for compressed input files.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+
+import os
+import bz2
+import gzip
+import shutil
+import tempfile
+import unittest
+from plip.modules.preparation import PDBComplex
+
+
+class CompressedInputTest(unittest.TestCase):
+    """Checks that compressed structures give the same results as uncompressed ones."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        with open('./pdb/1vsn.pdb') as f:
+            content = f.read()
+        with gzip.open(os.path.join(self.tmpdir, '1vsn.pdb.gz'), 'wb') as g:
+            g.write(content)
+        with open(os.path.join(self.tmpdir, '1vsn.pdb.bz2'), 'wb') as g:
+            g.write(bz2.compress(content))
+        self.reference = PDBComplex()
+        self.reference.load_pdb('./pdb/1vsn.pdb')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def check_same_results(self, path):
+        mol = PDBComplex()
+        mol.load_pdb(path)
+        self.assertEqual(mol.pymol_name, '1vsn')
+        self.assertEqual(mol.idx_to_pdb_mapping, self.reference.idx_to_pdb_mapping)
+        self.assertEqual(sorted(mol.interaction_sets), sorted(self.reference.interaction_sets))
+        for site, pli in mol.interaction_sets.items():
+            reference = self.reference.interaction_sets[site]
+            self.assertEqual(len(pli.hbonds_pdon + pli.hbonds_ldon), len(reference.hbonds_pdon + reference.hbonds_ldon))
+            self.assertEqual(len(pli.hydrophobic_contacts), len(reference.hydrophobic_contacts))
+
+    def test_gzip(self):
+        """Structure compressed with gzip."""
+        self.check_same_results(os.path.join(self.tmpdir, '1vsn.pdb.gz'))
+
+    def test_bzip2(self):
+        """Structure compressed with bzip2."""
+        self.check_same_results(os.path.join(self.tmpdir, '1vsn.pdb.bz2'))
@@ -0,0 +1,62 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_database.py - Unit Tests for the SQLite result store.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from plip.modules.preparation import PDBComplex
+from plip.modules.report import StructureReport, ReportWriter
+from plip.modules.database import ResultStore
+
+
+class ResultStoreTest(unittest.TestCase):
+    """Checks that results can be queried from the database and are replaced by later runs."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.mol = PDBComplex()
+        self.mol.load_pdb('./pdb/1vsn.pdb')
+        self.store = ResultStore(os.path.join(self.tmpdir, 'results.db'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmpdir)
+
+    def write(self):
+        writer = ReportWriter('test', store=self.store)
+        for site in sorted(self.mol.interaction_sets):
+            writer.add_site(self.mol, site, self.mol.interaction_sets[site])
+        writer.finish(self.mol)
+
+    def test_store(self):
+        """Binding sites, members and interactions can be queried, later runs replace earlier results."""
+        self.write()
+        self.write()
+        self.assertEqual(self.store.query('SELECT pdbid FROM structures'), [('1VSN', )])
+        self.assertEqual(self.store.query('SELECT hetid FROM bindingsites'), [('NFT', )])
+        output = StructureReport(self.mol, 'test').output(sorted(self.mol.interaction_sets)[0])
+        hbonds = self.store.query('SELECT h.resnr, h.dist_d_a FROM hydrogen_bonds h JOIN bindingsites b '
+                                  'ON h.site_id = b.id WHERE b.hetid = ? ORDER BY h.rowid', ('NFT', ))
+        self.assertEqual(len(hbonds), len(output.hbond_info))
+        self.assertEqual(hbonds[0][0], output.hbond_info[0][0])
+        self.assertAlmostEqual(hbonds[0][1], output.hbond_info[0][5])
+        counts = dict(self.store.query('SELECT type, COUNT(*) FROM interactions GROUP BY type'))
+        self.assertEqual(counts['hydrophobic_interactions'], len(output.hydrophobic_info))
@@ -0,0 +1,58 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_equivalence.py - Unit Tests for the differential comparison of detection engines.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+
+import glob
+import unittest
+from plip.modules.equivalence import check_equivalence, compare_complexes, reference_engine, parallel_engine, \
+    pickled_engine, saved_engine, sweep_engine, perturb
+
+
+class EquivalenceTest(unittest.TestCase):
+    """Checks the comparison itself and the equivalence of the alternative engines with the reference."""
+
+    def setUp(self):
+        with open('./pdb/1vsn.pdb') as f:
+            self.pdbstring = f.read()
+
+    def test_detects_differences(self):
+        """Perturbed coordinates give different distances, missing sites are reported."""
+        reference = reference_engine(self.pdbstring)
+        self.assertEqual(compare_complexes(reference, reference_engine(self.pdbstring)), [])
+        differences = compare_complexes(reference, reference_engine(perturb(self.pdbstring, 0.05)))
+        self.assertNotEqual(differences, [])
+        candidate = reference_engine(self.pdbstring)
+        candidate.interaction_sets.pop(sorted(candidate.interaction_sets)[0])
+        self.assertEqual([d.kind for d in compare_complexes(reference, candidate)], ['site'])
+
+    def test_all_structures(self):
+        """Parallel analysis and cached results are equivalent to the sequential analysis."""
+        for path in sorted(glob.glob('./pdb/*.pdb')):
+            with open(path) as f:
+                pdbstring = f.read()
+            for engine in [parallel_engine, pickled_engine, saved_engine]:
+                results = check_equivalence(pdbstring, engine)
+                self.assertEqual(results['original'], [], '%s %s' % (path, engine.__name__))
+
+    def test_perturbed(self):
+        """Filtered results of sweep mode are equivalent, also for perturbed coordinates."""
+        results = check_equivalence(self.pdbstring, sweep_engine, perturbations=2)
+        for variant, differences in results.items():
+            self.assertEqual(differences, [], variant)
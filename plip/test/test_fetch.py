@@ -0,0 +1,141 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_fetch.py - Unit Tests for retrieving structures from a mirror, the download cache and the PDB server.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+import os
+import gzip
+import shutil
+import tempfile
+import threading
+import unittest
+import BaseHTTPServer
+import SocketServer
+from urlparse import urlparse, parse_qs
+from plip.modules.fetch import StructureFetcher, FetchError
+
+STATUS = {'1vsn': ('CURRENT', None), '1abc': ('OBSOLETE', '1vsn'), '2reg': ('CURRENT', None),
+          '5err': ('CURRENT', None)}
+
+
+class PDBHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Local stand-in for the PDB server. 2reg has no file in PDB format, status requests for 9err and downloads of
+    5err fail."""
+    protocol_version = 'HTTP/1.1'  # Keep connections open
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        PDBHandler.requests.append(url.path)
+        if url.path == '/pdb/rest/idStatus' and '9ERR' in url.query.upper():
+            self.respond(503, 'Service unavailable')
+        elif url.path == '/pdb/rest/idStatus':
+            records = []
+            for pdbid in parse_qs(url.query)['structureId'][0].split(','):
+                status, replaced = STATUS.get(pdbid, ('UNKNOWN', None))
+                extra = ' replacedBy="%s"' % replaced.upper() if replaced else ''
+                records.append('<record structureId="%s" status="%s"%s/>' % (pdbid.upper(), status, extra))
+            self.respond(200, '<idStatus>%s</idStatus>' % ''.join(records))
+        elif url.path == '/pdb/files/5err.pdb':
+            self.respond(500, 'Internal server error')
+        elif url.path == '/pdb/files/1vsn.pdb':
+            with open('./pdb/1vsn.pdb') as f:
+                self.respond(200, f.read())
+        else:
+            self.respond(404, 'Not found')
+
+    def respond(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PDBServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True  # Persistent connections of the fetcher are served in parallel
+
+
+class StructureFetcherTest(unittest.TestCase):
+    """Checks lookup order, status handling and caching of downloaded structures."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.server = PDBServer(('127.0.0.1', 0), PDBHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%i/pdb' % self.server.server_address[1]
+        PDBHandler.requests = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_download_status(self):
+        """Current and obsolete entries are downloaded, unknown and unavailable ones are reported."""
+        fetcher = StructureFetcher(base_url=self.url)
+        results = fetcher.fetch(['1VSN', '1abc', '2reg', 'xxxx'])
+        self.assertEqual(results['1vsn'].status, 'CURRENT')
+        self.assertEqual(results['1abc'].status, 'OBSOLETE')
+        self.assertEqual(results['1abc'].current, '1vsn')
+        self.assertEqual(results['1abc'].content, results['1vsn'].content)
+        self.assertEqual(results['2reg'].status, 'UNAVAILABLE')
+        self.assertEqual(results['xxxx'].status, 'UNKNOWN')
+        self.assertEqual(PDBHandler.requests.count('/pdb/rest/idStatus'), 1)  # One status request for all IDs
+
+    def test_server_error(self):
+        """Failed status requests are raised instead of reporting the IDs as unknown."""
+        fetcher = StructureFetcher(base_url=self.url)
+        self.assertRaises(FetchError, fetcher.fetch, ['1vsn', '9err'])
+        self.assertRaises(FetchError, StructureFetcher(base_url='http://127.0.0.1:1/pdb').fetch, ['1vsn'])
+
+    def test_failed_download(self):
+        """A failed download is reported for its entry only."""
+        results = StructureFetcher(base_url=self.url).fetch(['5err', '1vsn'])
+        self.assertEqual(results['1vsn'].status, 'CURRENT')
+        self.assertEqual(results['5err'].status, 'FAILED')
+        self.assertIn('500', results['5err'].error)
+
+    def test_cache(self):
+        """Cached entries are not requested again."""
+        cachedir = os.path.join(self.tmpdir, 'cache')
+        first = StructureFetcher(cache=cachedir, base_url=self.url).fetch(['1abc'])['1abc']
+        PDBHandler.requests = []
+        second = StructureFetcher(cache=cachedir, base_url=self.url).fetch(['1abc', '1vsn'])
+        self.assertEqual(PDBHandler.requests, [])
+        self.assertEqual(second['1abc'].status, 'OBSOLETE')
+        self.assertEqual(second['1abc'].path, first.path)
+        self.assertEqual(second['1vsn'].status, 'CURRENT')
+
+    def test_mirror(self):
+        """Entries in a local mirror with divided layout are used without any request."""
+        mirror = os.path.join(self.tmpdir, 'mirror')
+        os.makedirs(os.path.join(mirror, 'vs'))
+        with open('./pdb/1vsn.pdb') as f:
+            content = f.read()
+        with gzip.open(os.path.join(mirror, 'vs', 'pdb1vsn.ent.gz'), 'wb') as g:
+            g.write(content)
+        result = StructureFetcher(mirror=mirror, base_url=self.url).fetch(['1vsn'])['1vsn']
+        self.assertEqual(result.content, None)  # Read only when the structure is processed
+        with gzip.open(result.path) as g:
+            self.assertEqual(g.read(), content)
+        self.assertEqual(PDBHandler.requests, [])
@@ -0,0 +1,117 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_fingerprints.py - Unit Tests for interaction fingerprints and similarity searches.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from plip.modules.preparation import PDBComplex
+from plip.modules.report import ReportWriter
+from plip.modules.fingerprints import FingerprintLayout, FingerprintStore, FingerprintIndex, fingerprint, popcount, \
+    tanimoto, dice, unpack
+
+
+class FingerprintTest(unittest.TestCase):
+    """Checks fingerprint layout, similarity measures and the fingerprint store."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.mol = PDBComplex()
+        self.mol.load_pdb('./pdb/1vsn.pdb')
+        self.pli = self.mol.interaction_sets[sorted(self.mol.interaction_sets)[0]]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_fingerprint(self):
+        """Each interaction sets the bit of its residue type and interaction type."""
+        layout = FingerprintLayout()
+        fp = fingerprint(self.pli, layout)
+        self.assertEqual(fp.dtype, np.uint64)
+        self.assertEqual(len(fp), layout.nwords)
+        for hbond in self.pli.hbonds_pdon:
+            bit = layout.bit(1, hbond)
+            self.assertTrue(int(fp[bit // 64]) >> (bit % 64) & 1)
+        residues = set((hbond.resnr, hbond.reschain) for hbond in self.pli.hbonds_pdon + self.pli.hbonds_ldon)
+        self.assertEqual(popcount(fingerprint(self.pli, FingerprintLayout([(0, 'X')]))), 0)
+        self.assertGreater(popcount(fingerprint(self.pli, FingerprintLayout(sorted(residues)))), 0)
+
+    def test_similarity(self):
+        """Vectorized Tanimoto and Dice coefficients are the same as for single bit sets."""
+        rng = np.random.RandomState(0)
+        fps = rng.randint(0, 2**62, size=(1000, 4)).astype(np.uint64)
+        fps[0] = 0
+        query = fps[1]
+        t, d = tanimoto(query, fps, chunk_size=64), dice(query, fps)
+        for i in [0, 1, 500]:
+            a = set(j for j in range(256) if int(query[j // 64]) >> (j % 64) & 1)
+            b = set(j for j in range(256) if int(fps[i][j // 64]) >> (j % 64) & 1)
+            self.assertAlmostEqual(t[i], float(len(a & b)) / len(a | b) if a | b else 0.0)
+            self.assertAlmostEqual(d[i], 2.0 * len(a & b) / (len(a) + len(b)) if a or b else 0.0)
+
+    def test_store(self):
+        """Fingerprints written with the reports can be searched in the memory-mapped store."""
+        store = FingerprintStore(self.tmpdir)
+        for _ in range(2):
+            writer = ReportWriter('test', fingerprints=store)
+            for site in sorted(self.mol.interaction_sets):
+                writer.add_site(self.mol, site, self.mol.interaction_sets[site])
+            writer.finish(self.mol)
+        store = FingerprintStore(self.tmpdir)
+        self.assertEqual(store.fingerprints().shape, (2, store.layout.nwords))
+        hits = store.search(fingerprint(self.pli, store.layout), k=1)
+        self.assertEqual(hits[0], (('1VSN', sorted(self.mol.interaction_sets)[0]), 1.0))
+        self.assertRaises(ValueError, FingerprintStore, self.tmpdir, FingerprintLayout([(1, 'A')]))
+
+    def test_interrupted_add(self):
+        """Fingerprints and IDs left incomplete by an interrupted process are removed before adding."""
+        store = FingerprintStore(self.tmpdir)
+        fp = fingerprint(self.pli, store.layout)
+        store.add([('1VSN', 'A', fp)])
+        with open(store.data_path, 'ab') as f:  # Orphan fingerprint and part of the next one
+            f.write(np.array(fp, dtype='<u8').tobytes() + b'\x01\x02')
+        with open(store.ids_path, 'a') as f:
+            f.write('1VSN\tB')
+        store.add([('1VSN', 'C', np.zeros_like(fp))])
+        self.assertEqual(store.ids(), [('1VSN', 'A'), ('1VSN', 'C')])
+        self.assertEqual(os.path.getsize(store.data_path), 2 * store.layout.nwords * 8)
+        self.assertFalse(store.fingerprints()[1].any())
+
+    def test_index(self):
+        """The index finds similar fingerprints added in several runs, scored like an exhaustive search."""
+        store = FingerprintStore(self.tmpdir)
+        rng = np.random.RandomState(0)
+        bits = rng.rand(100, store.layout.nwords * 64) < 0.1
+        bits[:, store.layout.nbits:] = False
+        bits[50:] = bits[:50] ^ (rng.rand(50, store.layout.nwords * 64) < 0.01) & bits[:50]  # Similar pairs
+        fps = np.packbits(bits.reshape(100, -1, 8)[:, :, ::-1], axis=2).reshape(100, -1).view('<u8')
+        self.assertTrue((unpack(fps) == bits).all())
+        store.add([('%04d' % i, '1', fp) for i, fp in enumerate(fps[:50])])
+        index = FingerprintIndex(store, bands=16, rows=2)
+        self.assertEqual(index.update(), 50)
+        store.add([('%04d' % i, '1', fp) for i, fp in enumerate(fps[50:], 50)])
+        size = os.path.getsize(index.keys_path)
+        hits = FingerprintIndex(store).search(fps[53], k=2)  # Parameters of the existing index are used
+        self.assertEqual(hits, store.search(fps[53], k=2))
+        self.assertIn((('0053', '1'), 1.0), hits)  # Not indexed yet
+        self.assertEqual(os.path.getsize(index.keys_path), size)  # Searches don't write to the store
+        self.assertEqual(FingerprintIndex(store).update(), 50)
+        self.assertEqual(FingerprintIndex(store).search(fps[53], k=2), hits)
@@ -0,0 +1,78 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_journal.py - Unit Tests for the journal of batch runs.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from plip.modules.journal import Journal
+from plip.modules.supplemental import atomic_write
+
+
+class JournalTest(unittest.TestCase):
+    """Checks resuming of batch runs and atomic output."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'journal.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_resume(self):
+        """Finished entries are skipped, failed and interrupted ones are retried up to the limit."""
+        journal = Journal(self.path)
+        for entry in ['1vsn', '1osn', '2reg', '3pxf']:
+            journal.start(entry)
+        journal.done('1vsn')
+        journal.fail('1osn', 'exit code 4')
+        journal.fail('2reg', 'exit code 4')
+        journal.close()  # 3pxf was interrupted
+        with open(self.path, 'a') as f:
+            f.write('{"entry": "2reg", "sta')  # Incomplete record after a crash
+        journal = Journal(self.path, resume=True)
+        self.assertTrue(journal.skip('1vsn', max_retries=1))
+        self.assertFalse(journal.skip('1osn', max_retries=1))
+        self.assertFalse(journal.skip('3pxf', max_retries=1))
+        self.assertFalse(journal.skip('1eve', max_retries=1))
+        journal.start('1osn')
+        journal.fail('1osn', 'exit code 4')
+        self.assertTrue(journal.skip('1osn', max_retries=1))
+        journal.close()
+        journal = Journal(self.path, resume=True)  # Records written after the incomplete one are complete
+        self.assertEqual(journal.attempts['1osn'], 2)
+        self.assertEqual(journal.state['1osn'], 'failed')
+        journal.close()
+        self.assertFalse(Journal(self.path).skip('1vsn', max_retries=1))  # Without resume, the journal starts anew
+
+    def test_atomic_write(self):
+        """Files are only replaced after writing was successful."""
+        path = os.path.join(self.tmpdir, 'report.rst.txt')
+        with atomic_write(path) as f:
+            f.write('complete')
+        try:
+            with atomic_write(path) as f:
+                f.write('partial')
+                raise IOError
+        except IOError:
+            pass
+        self.assertEqual(open(path).read(), 'complete')
+        self.assertEqual(os.listdir(self.tmpdir), ['report.rst.txt'])
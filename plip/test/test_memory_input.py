@@ -0,0 +1,73 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_memory_input.py - Unit Tests for structures given as strings, file objects or molecules.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+
+import gzip
+import unittest
+from StringIO import StringIO
+from plip.modules.preparation import PDBComplex
+from plip.modules.supplemental import readmol
+
+
+class MemoryInputTest(unittest.TestCase):
+    """Checks that structures given in memory give the same results as files."""
+
+    def setUp(self):
+        with open('./pdb/1vsn.pdb') as f:
+            self.content = f.read()
+        self.reference = PDBComplex()
+        self.reference.load_pdb('./pdb/1vsn.pdb')
+
+    def check_same_results(self, mol):
+        self.assertEqual(mol.sourcefiles['pdbcomplex'], None)
+        self.assertEqual(sorted(mol.interaction_sets), sorted(self.reference.interaction_sets))
+        for site, pli in mol.interaction_sets.items():
+            reference = self.reference.interaction_sets[site]
+            self.assertEqual(len(pli.hbonds_pdon + pli.hbonds_ldon), len(reference.hbonds_pdon + reference.hbonds_ldon))
+            self.assertEqual(len(pli.hydrophobic_contacts), len(reference.hydrophobic_contacts))
+
+    def test_string(self):
+        """Structure given as string, also compressed."""
+        mol = PDBComplex()
+        mol.load_pdb(self.content, as_string=True)
+        self.check_same_results(mol)
+        self.assertEqual(mol.pymol_name, '1vsn')
+        self.assertEqual(mol.idx_to_pdb_mapping, self.reference.idx_to_pdb_mapping)
+        self.assertEqual(mol.sourcefiles['pdbstring'], self.content)
+        compressed = StringIO()
+        with gzip.GzipFile(fileobj=compressed, mode='wb') as g:
+            g.write(self.content)
+        mol = PDBComplex()
+        mol.load_pdb(compressed.getvalue(), as_string=True)
+        self.check_same_results(mol)
+
+    def test_file_object(self):
+        """Structure read from a file-like object, the name is used if there is no HEADER."""
+        content = ''.join(line for line in self.content.splitlines(True) if not line.startswith('HEADER'))
+        mol = PDBComplex()
+        mol.load_pdb(StringIO(content), name='1abc')
+        self.check_same_results(mol)
+        self.assertEqual(mol.pymol_name, '1abc')
+
+    def test_molecule(self):
+        """Structure given as Pybel molecule."""
+        mol = PDBComplex()
+        mol.load_pdb(readmol('pdb', './pdb/1vsn.pdb'))
+        self.check_same_results(mol)
@@ -0,0 +1,187 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_mmcif.py - Unit Tests for reading structures in mmCIF format.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from plip.modules.preparation import PDBComplex
+from plip.modules.supplemental import parse_pdb, get_altconf_atoms
+from plip.modules.report import TextOutput
+from plip.modules.mmcif import parse_mmcif, read_categories, rename_residues, UnsupportedStructure
+
+ATOM_SITE = ['group_PDB', 'id', 'type_symbol', 'auth_atom_id', 'label_alt_id', 'auth_comp_id', 'auth_asym_id',
+             'auth_seq_id', 'pdbx_PDB_ins_code', 'Cartn_x', 'Cartn_y', 'Cartn_z', 'occupancy', 'B_iso_or_equiv',
+             'pdbx_formal_charge', 'pdbx_PDB_model_num']
+STRUCT_CONN = ['id', 'conn_type_id', 'ptnr1_auth_comp_id', 'ptnr1_auth_asym_id', 'ptnr1_auth_seq_id',
+               'pdbx_ptnr1_label_alt_id', 'ptnr2_auth_comp_id', 'ptnr2_auth_asym_id', 'ptnr2_auth_seq_id',
+               'pdbx_ptnr2_label_alt_id']
+
+
+def quote(value):
+    """Quotes a value for mmCIF if necessary."""
+    if value == '':
+        return '?'
+    if ' ' in value or value[0] in '_#$\'"':
+        return '"%s"' % value if '"' not in value else "'%s'" % value
+    return value
+
+
+def renamed(chain, resnr, chains):
+    """Chain ID and residue number after renaming the chains given as dictionary to (new ID, residue number offset)."""
+    if chain not in chains:
+        return [chain, resnr]
+    return [chains[chain][0], str(int(resnr) + chains[chain][1])]
+
+
+def pdb_to_mmcif(pdbid, lines, chains=None):
+    """Converts the records of a PDB file which are used by PLIP to mmCIF format. Chains can be renamed and
+    renumbered, see renamed()."""
+    atoms, links, modres, chains = [], [], [], chains or {}
+    for line in lines:
+        if line.startswith(('ATOM', 'HETATM')):
+            charge = line[78:80].strip()
+            charge = '%s%s' % (charge[1], charge[0]) if charge else ''
+            atoms.append([line[0:6].strip(), line[6:11].strip(), line[76:78].strip(), line[12:16].strip(),
+                          line[16].strip() or '.', line[17:20].strip()] +
+                         renamed(line[21].strip(), line[22:26].strip(), chains) +
+                         [line[26].strip(), line[30:38].strip(), line[38:46].strip(), line[46:54].strip(),
+                          line[54:60].strip(), line[60:66].strip(), charge, '1'])
+        elif line.startswith('ENDMDL'):
+            break
+        elif line.startswith('LINK'):
+            links.append([str(len(links) + 1), 'covale', line[17:20].strip()] +
+                         renamed(line[21].strip(), line[22:26].strip(), chains) +
+                         [line[16].strip(), line[47:50].strip()] +
+                         renamed(line[51].strip(), line[52:56].strip(), chains) + [line[46].strip()])
+        elif line.startswith('MODRES'):
+            modres.append(line[12:15].strip())
+    cif = ['data_%s' % pdbid.upper(), '#', '_entry.id   %s' % pdbid.upper(), '#']
+    for category, columns, rows in [('_atom_site', ATOM_SITE, atoms), ('_struct_conn', STRUCT_CONN, links),
+                                    ('_pdbx_struct_mod_residue', ['id', 'auth_comp_id'],
+                                     [[str(i + 1), name] for i, name in enumerate(modres)])]:
+        if rows:
+            cif.append('loop_')
+            cif.extend(['%s.%s' % (category, column) for column in columns])
+            cif.extend([' '.join([quote(value) for value in row]) for row in rows])
+            cif.append('#')
+    return '\n'.join(cif) + '\n'
+
+
+def residues(output):
+    """Residue number, type and chain of all contacts in the report data of a binding site."""
+    return [[contact[:3] for contact in info] for _, _, _, info in output.sections]
+
+
+class MMCIFTest(unittest.TestCase):
+    """Checks that structures in mmCIF format give the same results as in PDB format."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_tokenizer(self):
+        """Quoted values, text fields and comments."""
+        cif = ['data_TEST', '_entry.id TEST # comment', '_struct.title', ';A text field', 'over two lines', ';',
+               'loop_', '_atom_site.id', '_atom_site.auth_atom_id', '1 "O5\'"', "2 'C1 A'", '3 N']
+        tables = read_categories(cif, {'_entry', '_struct', '_atom_site'})
+        self.assertEqual(tables['_entry'], (['id'], [['TEST']]))
+        self.assertEqual(tables['_struct'], (['title'], [['A text field\nover two lines']]))
+        self.assertEqual(tables['_atom_site'][1], [['1', "O5'"], ['2', 'C1 A'], ['3', 'N']])
+
+    def test_records(self):
+        """Mapping, modified residues, covalent linkages and alternate conformations."""
+        for pdbid in ['1vsn', '1xdn', '1eve']:
+            lines = open('./pdb/%s.pdb' % pdbid).readlines()
+            structure = parse_mmcif(pdb_to_mmcif(pdbid, lines).splitlines(True))
+            mapping, modres, covalent = parse_pdb(lines)
+            self.assertEqual(structure.pdbid, pdbid)
+            self.assertEqual(structure.idx_to_pdb, mapping)
+            self.assertEqual(structure.modres, modres)
+            self.assertEqual([tuple(link) for link in structure.covalent], [tuple(link) for link in covalent])
+            self.assertEqual(structure.altconf, get_altconf_atoms(lines))
+
+    def test_rename_residues(self):
+        """Chains which don't fit into PDB format get unused IDs, several chains share one if IDs run out."""
+        self.assertEqual(rename_residues([('A', ['1', '2']), ('B', ['9999'])]), {})
+        self.assertEqual(rename_residues([('A', ['1']), ('AA', ['1', '2']), ('B', ['10000'])]),
+                         {('AA', '1'): ('B', 1), ('AA', '2'): ('B', 2), ('B', '10000'): ('C', 1)})
+        long_chain = [str(i) for i in range(20000)]
+        mapping = rename_residues([('AA', long_chain)])
+        self.assertEqual((mapping[('AA', '9998')], mapping[('AA', '9999')]), (('A', 9999), ('B', 1)))
+        chains = [('%iX' % i, ['1', '2']) for i in range(100)]
+        mapping = rename_residues(chains)
+        self.assertEqual(len(set(mapping.values())), 200)
+        self.assertEqual((mapping[('0X', '1')], mapping[('1X', '2')]), (('A', 1), ('A', 4)))
+        self.assertRaises(UnsupportedStructure, rename_residues, [('AA', long_chain)] * 40)
+
+    def test_renamed_ids(self):
+        """Two-character chain IDs and residue numbers above 9999 are renamed for OpenBabel instead of being
+        truncated, the original IDs are kept."""
+        lines = open('./pdb/1vsn.pdb').readlines()
+        structure = parse_mmcif(pdb_to_mmcif('1vsn', lines, {'A': ('AA', 10000)}).splitlines(True))
+        self.assertEqual(structure.idx_to_pdb, parse_pdb(lines)[0])
+        self.assertTrue(structure.residue_ids)
+        for (chain, resnr), (original_chain, original_resnr) in structure.residue_ids.items():
+            self.assertEqual((len(chain), original_chain), (1, 'AA'))
+            self.assertTrue(resnr <= 9999 and original_resnr >= 10000)
+        atoms = [line for line in structure.pdbstring.splitlines() if line.startswith(('ATOM', 'HETATM'))]
+        self.assertEqual(len(atoms), len([line for line in lines if line.startswith(('ATOM', 'HETATM'))]))
+
+    def test_interactions(self):
+        """Same interactions as for the PDB file."""
+        cifpath = os.path.join(self.tmpdir, 'structure.cif')
+        with open(cifpath, 'w') as f:
+            f.write(pdb_to_mmcif('1vsn', open('./pdb/1vsn.pdb').readlines()))
+        reference, mol = PDBComplex(), PDBComplex()
+        reference.load_pdb('./pdb/1vsn.pdb')
+        mol.load_pdb(cifpath)
+        self.assertEqual(mol.input_format, 'mmcif')
+        self.assertEqual(mol.pymol_name, '1vsn')
+        self.assertEqual(sorted(mol.interaction_sets), sorted(reference.interaction_sets))
+        for site, pli in mol.interaction_sets.items():
+            expected = reference.interaction_sets[site]
+            self.assertEqual(len(pli.hbonds_pdon + pli.hbonds_ldon), len(expected.hbonds_pdon + expected.hbonds_ldon))
+            self.assertEqual(len(pli.hydrophobic_contacts), len(expected.hydrophobic_contacts))
+
+    def test_renamed_interactions(self):
+        """Structure with a two-character chain ID and residue numbers above 9999 gives the same interactions as the
+        PDB file, reported with the original IDs."""
+        cifpath = os.path.join(self.tmpdir, 'renamed.cif')
+        with open(cifpath, 'w') as f:
+            f.write(pdb_to_mmcif('1vsn', open('./pdb/1vsn.pdb').readlines(), {'A': ('AA', 10000)}))
+        reference, mol = PDBComplex(), PDBComplex()
+        reference.load_pdb('./pdb/1vsn.pdb')
+        mol.load_pdb(cifpath)
+        outputs = {}
+        for pli in mol.interaction_sets.values():
+            output = TextOutput(pli)
+            outputs[output.name] = output
+        self.assertEqual(sorted(outputs), ['NFT-AA-10283'])
+        for site, pli in reference.interaction_sets.items():
+            hetid, chain, position = site.split('-')
+            output = outputs['-'.join([hetid, 'AA', str(int(position) + 10000)])]
+            expected = [[(resnr + 10000, restype, 'AA') for resnr, restype, _ in section]
+                        for section in residues(TextOutput(pli))]
+            self.assertEqual(residues(output), expected)
+            self.assertEqual(output.lig_members, [(hetid, 'AA', int(position) + 10000)])
@@ -0,0 +1,100 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_parallel.py - Unit Tests for parallel analysis of binding sites.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+import time
+import unittest
+import multiprocessing
+from plip.modules.preparation import PDBComplex
+from plip.modules.parallel import JobScheduler, imap_shared
+
+
+def lookup(shared, key):
+    """Job function returning a value of the shared dictionary."""
+    return shared[key]
+
+
+def wait(shared, seconds):
+    """Job function taking the given time."""
+    time.sleep(seconds)
+    return seconds
+
+
+class ParallelAnalysisTest(unittest.TestCase):
+    """Checks that parallel analysis of binding sites gives the same results as sequential analysis."""
+
+    def test_3pxf_two_sites(self):
+        """Two ANS molecules bound to CDK2 (3pxf)"""
+        seqmol = PDBComplex()
+        seqmol.load_pdb('./pdb/3pxf.pdb')
+        parmol = PDBComplex()
+        parmol.load_pdb('./pdb/3pxf.pdb', maxthreads=2)
+        self.assertEqual(sorted(seqmol.interaction_sets), sorted(parmol.interaction_sets))
+        for site in seqmol.interaction_sets:
+            s, p = seqmol.interaction_sets[site], parmol.interaction_sets[site]
+            self.assertEqual(s.no_interactions, p.no_interactions)
+            for attr in ['hydrophobic_contacts', 'hbonds_pdon', 'hbonds_ldon', 'saltbridge_lneg', 'saltbridge_pneg',
+                         'pistacking', 'pication_laro', 'pication_paro', 'halogen_bonds', 'water_bridges']:
+                self.assertEqual(sorted((i.resnr, i.reschain) for i in getattr(s, attr)),
+                                 sorted((i.resnr, i.reschain) for i in getattr(p, attr)))
+            self.assertEqual(sorted(h.distance for h in s.hydrophobic_contacts),
+                             sorted(h.distance for h in p.hydrophobic_contacts))
+
+
+class SharedMapTest(unittest.TestCase):
+    """Checks the distribution of items over workers sharing data."""
+
+    def test_results_as_finished(self):
+        """Results are yielded in the order of the items as soon as they are finished, not after all items."""
+        start = time.time()
+        results = imap_shared(wait, None, [0.1, 0.2, 1.5], 3)
+        self.assertEqual(next(results), 0.1)
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(list(results), [0.2, 1.5])
+
+
+class JobSchedulerTest(unittest.TestCase):
+    """Checks the scheduling of jobs on shared data."""
+
+    def test_fresh_workers_see_later_data(self):
+        """Jobs submitted after the shared data changed use the changed data, also with more jobs than processes."""
+        shared = {}
+        scheduler = JobScheduler(lookup, shared, 2, fresh_workers=True)
+        for i in range(5):
+            shared[i] = i * i  # E.g. a binding site analyzed after the scheduler was created
+            scheduler.submit(i)
+        self.assertEqual(scheduler.join(), [0, 1, 4, 9, 16])
+
+    def test_errors(self):
+        """Errors of the workers are raised in the main process."""
+        for fresh_workers in [False, True]:
+            scheduler = JobScheduler(lookup, {}, 2, fresh_workers=fresh_workers)
+            scheduler.submit('missing')
+            self.assertRaises(KeyError, scheduler.join)
+
+    def test_timeout_per_job(self):
+        """The timeout applies to each job from its start, waiting for earlier jobs doesn't extend it."""
+        scheduler = JobScheduler(wait, None, 1, timeout=1, fresh_workers=True)
+        for seconds in [0.4, 0.4, 0.4]:  # Together longer than the timeout, but each job is fast enough
+            scheduler.submit(seconds)
+        self.assertEqual(scheduler.join(), [0.4, 0.4, 0.4])
+        scheduler = JobScheduler(wait, None, 2, timeout=1, fresh_workers=True)
+        for seconds in [0.8, 1.7]:  # Waiting for the first job must not add to the time of the second one
+            scheduler.submit(seconds)
+        self.assertRaises(multiprocessing.TimeoutError, scheduler.join)
@@ -0,0 +1,78 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_profiling.py - Unit Tests for stage timers and counters.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+
+import unittest
+from plip.modules.preparation import PDBComplex
+from plip.modules import profiling
+import pybel
+
+
+class ProfilingTest(unittest.TestCase):
+    """Checks the timers and counters collected while analyzing a structure."""
+
+    def setUp(self):
+        self.events = []
+        hook = lambda *event: self.events.append(event)
+        self.profiler = profiling.enable(profiling.Profiler(swig=True, hooks=[hook]))
+
+    def tearDown(self):
+        profiling.disable()
+
+    def test_stages_and_counters(self):
+        """All stages are timed, detectors accept at most their candidates."""
+        mol = PDBComplex()
+        mol.load_pdb('./pdb/1vsn.pdb', maxthreads=4)  # Sequential while profiling
+        result = self.profiler.as_dict()
+        for name in ['parse_structure', 'openbabel_read', 'add_polar_hydrogens', 'getligs', 'extract_bs',
+                     'ligand_perception', 'bindingsite_perception', 'detect.hbonds', 'refine']:
+            self.assertGreater(result['stages'][name]['calls'], 0)
+        self.assertEqual(result['counters']['binding_sites'], len(mol.interaction_sets))
+        for counts in result['detectors'].values():
+            self.assertLessEqual(counts['accepted'], counts['candidates'])
+        self.assertGreater(result['detectors']['hydrophobic']['accepted'], 0)
+        self.assertGreater(result['swig_calls_total'], 0)
+
+    def test_disable(self):
+        """Hooks get balanced events and OpenBabel classes are restored."""
+        mol = PDBComplex()
+        mol.load_pdb('./pdb/1vsn.pdb')
+        starts = [name for event, name, value in self.events if event == 'start']
+        ends = [name for event, name, value in self.events if event == 'end']
+        self.assertEqual(sorted(starts), sorted(ends))
+        getx = pybel.ob.OBAtom.GetX
+        profiling.disable()
+        self.assertNotEqual(pybel.ob.OBAtom.GetX, getx)
+        self.assertEqual(profiling.active(), None)
+
+    def test_memory(self):
+        """Memory is recorded for stages and binding sites, the summary suggests a number of workers."""
+        profiling.disable()
+        profiler = profiling.enable(profiling.Profiler(memory=True))
+        mol = PDBComplex()
+        mol.load_pdb('./pdb/1vsn.pdb')
+        profiling.disable()
+        result = profiler.as_dict()
+        self.assertEqual(sorted(result['sites']), sorted(mol.interaction_sets))
+        self.assertGreater(result['peak_rss_kb'], 0)
+        self.assertLessEqual(result['stages']['openbabel_read']['peak_rss_kb'], result['peak_rss_kb'])
+        summary = profiling.memory_summary({'1vsn': 1000, '1osn': 3000, '2reg': None}, available_kb=10000)
+        self.assertEqual(summary['max_peak_rss_kb'], 3000)
+        self.assertEqual(summary['suggested_workers'], 3)
@@ -0,0 +1,108 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_report_writer.py - Unit Tests for writing reports site by site.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+import lxml.etree as et
+from StringIO import StringIO
+from plip.modules.preparation import PDBComplex
+from plip.modules.report import StructureReport, ReportWriter, TextOutput, report_files, append_report
+
+
+class ReportWriterTest(unittest.TestCase):
+    """Checks that reports written incrementally are the same as reports generated as a whole."""
+
+    def setUp(self):
+        self.mol = PDBComplex()
+        self.mol.load_pdb('./pdb/1vsn.pdb')
+        self.report = StructureReport(self.mol, 'test')
+
+    def test_streamed_reports(self):
+        """Streamed XML and rST reports are the same as the complete tree and text."""
+        xml, txt = StringIO(), StringIO()
+        self.report.stream(txt=txt, xml=xml)
+        expected = StringIO()
+        et.ElementTree(self.report.construct_xml_tree()).write(expected, pretty_print=True, xml_declaration=True)
+        self.assertEqual(xml.getvalue(), expected.getvalue())
+        self.assertEqual(txt.getvalue(), ''.join(line + '\n' for line in self.report.construct_txt_file()))
+
+    def test_callback(self):
+        """Sites passed to the callback of load_pdb() can be written right away."""
+        xml = StringIO()
+        mol = PDBComplex()
+        writer = ReportWriter('test', xml=xml)
+        mol.load_pdb('./pdb/1vsn.pdb', callback=lambda site, pli: writer.add_site(mol, site, pli))
+        writer.finish(mol)
+        self.assertEqual([site for site, _ in writer.sites], sorted(self.mol.interaction_sets))
+        self.assertEqual(et.fromstring(xml.getvalue()).xpath('//bindingsite/@id'), ['1'])
+
+    def test_compact(self):
+        """Coordinates are given as attributes in the compact XML report."""
+        xml = StringIO()
+        self.report.stream_xml(xml, compact=True)
+        ligcoo = et.fromstring(xml.getvalue()).xpath('//hydrogen_bond/ligcoo')[0]
+        self.assertEqual(list(ligcoo), [])
+        self.assertEqual(sorted(ligcoo.attrib), ['x', 'y', 'z'])
+
+    def test_rst_table(self):
+        """Columns are padded to the widest cell, the header is separated by a double line."""
+        table = TextOutput.rst_table.__func__(None, [['A', 'BB'], ['CCC', 'D']])
+        self.assertEqual(table, '+-----+----+\n| A   | BB | \n+=====+====+\n| CCC | D  | \n+-----+----+\n')
+
+    def test_raw_values(self):
+        """Report data keeps raw numbers, which are formatted the same way in all reports."""
+        site = sorted(self.mol.interaction_sets)[0]
+        output = self.report.output(site)
+        self.assertIs(self.report.output(site), output)  # Gathered only once for all formats
+        distance = output.hbond_info[0][5]
+        self.assertIsInstance(distance, float)
+        self.assertEqual(output.generate_xml().xpath('//hydrogen_bond/dist_d-a')[0].text, '%.2f' % distance)
+        self.assertEqual(output.generate_record()['interactions']['hydrogen_bonds'][0]['dist_d-a'], distance)
+
+    def test_jsonl(self):
+        """One JSON object per binding site with numbers instead of formatted values."""
+        jsonl = StringIO()
+        self.report.stream_jsonl(jsonl)
+        records = [json.loads(line) for line in jsonl.getvalue().splitlines()]
+        self.assertEqual([record['bsid'] for record in records], sorted(self.mol.interaction_sets))
+        hbond = records[0]['interactions']['hydrogen_bonds'][0]
+        self.assertIsInstance(hbond['dist_d-a'], float)
+        self.assertIsInstance(hbond['resnr'], int)
+        self.assertEqual(len(hbond['ligcoo']), 3)
+        self.assertEqual(records[0]['pdbid'], '1VSN')
+
+    def test_collected_jsonl(self):
+        """Compressed reports of several structures are appended to one file."""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            with report_files(tmpdir, ['jsonl']) as files:
+                self.report.stream_jsonl(files['jsonl'])
+            collected = os.path.join(tmpdir, 'collected.jsonl.gz')
+            for _ in range(2):
+                append_report(os.path.join(tmpdir, 'report.jsonl.gz'), collected)
+            with gzip.open(collected) as f:
+                lines = f.read().splitlines()
+            self.assertEqual(len(lines), 2 * len(self.mol.interaction_sets))
+        finally:
+            shutil.rmtree(tmpdir)
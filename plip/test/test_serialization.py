@@ -0,0 +1,59 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_serialization.py - Unit Tests for saved interaction sets.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+import unittest
+from StringIO import StringIO
+from plip.modules.preparation import PDBComplex
+from plip.modules.report import StructureReport
+from plip.modules.serialization import dump_sets, load_sets, SETS_HEADER, SETS_MAGIC
+
+
+class SavedSetsTest(unittest.TestCase):
+    """Checks that reports can be rendered from saved interaction sets."""
+
+    def setUp(self):
+        self.mol = PDBComplex()
+        self.mol.load_pdb('./pdb/1vsn.pdb')
+        self.saved = StringIO()
+        dump_sets(self.mol, self.saved, 'test')
+        self.saved.seek(0)
+
+    def test_roundtrip(self):
+        """Saved interaction sets give the same reports and contain the structure."""
+        header, mol = load_sets(self.saved)
+        self.assertEqual(header['sites'], sorted(self.mol.interaction_sets))
+        self.assertEqual(header['pdbid'], '1VSN')
+        self.assertEqual(StructureReport(mol, 'test').construct_txt_file(),
+                         StructureReport(self.mol, 'test').construct_txt_file())
+        self.assertEqual(mol.idx_to_pdb_mapping, self.mol.idx_to_pdb_mapping)
+        for pli in mol.interaction_sets.values():  # Written once for the complex, not for each site
+            self.assertIs(pli.idx_to_pdb, mol.idx_to_pdb_mapping)
+            self.assertIs(pli.altconf, mol.altconf)
+        self.assertIsNone(mol.sourcefiles['pdbcomplex'])
+        with open('./pdb/1vsn.pdb') as f:
+            self.assertEqual(mol.sourcefiles['pdbstring'], f.read())
+
+    def test_format_checks(self):
+        """Other files and other format versions are rejected."""
+        self.assertRaises(ValueError, load_sets, StringIO('HEADER    HYDROLASE'))
+        data = self.saved.getvalue()
+        newer = SETS_HEADER.pack(SETS_MAGIC, 99, 0) + data[SETS_HEADER.size:]
+        self.assertRaises(ValueError, load_sets, StringIO(newer))
+        self.assertRaises(ValueError, load_sets, StringIO(data[:-100]))  # Truncated file
@@ -41,7 +41,8 @@ class SpecialCasesTest(unittest.TestCase):
         self.assertEqual(exitcode, 4)  # Specific exitcode 4
 
     def test_pdb_format_not_available(self):
-        """A valid PDB ID is provided, but there is no entry in PDB format from wwPDB"""
+        """A valid PDB ID is provided, but there is no entry in PDB format from wwPDB. The mmCIF file is used, its
+        two-character chain IDs are renamed for OpenBabel."""
         exitcode1 = subprocess.call('python ../plip-cmd.py -i 4v59 -o /tmp', shell=True)
-        self.assertEqual(exitcode1, 5)  # Specific exitcode 5
+        self.assertEqual(exitcode1, 0)
 
@@ -0,0 +1,49 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_startup.py - Benchmark and import checks for the startup of PLIP.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+import os
+import sys
+import time
+import unittest
+import subprocess
+
+# Maximum accepted startup time in seconds, can be adapted to slower machines
+MAX_STARTUP_TIME = float(os.environ.get('PLIP_MAX_STARTUP_TIME', 2.0))
+
+
+class StartupTest(unittest.TestCase):
+    """Guards against regressions in the startup time of the command line tool."""
+
+    def test_no_heavy_imports(self):
+        """Modules needed for a text report must not import PyMOL or lxml."""
+        code = 'import sys; sys.path.insert(0, ".."); import modules.preparation, modules.report; ' \
+               'print(" ".join(sys.modules))'
+        modules = subprocess.check_output([sys.executable, '-c', code]).split()
+        self.assertNotIn('pymol', modules)
+        self.assertNotIn('lxml', modules)
+
+    def test_startup_time(self):
+        """Best of three runs of the command line tool up to argument parsing."""
+        timings = []
+        for i in range(3):
+            start = time.time()
+            subprocess.check_call([sys.executable, '../plip-cmd.py', '-h'], stdout=open(os.devnull, 'w'))
+            timings.append(time.time() - start)
+        self.assertLess(min(timings), MAX_STARTUP_TIME)
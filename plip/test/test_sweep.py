@@ -0,0 +1,75 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_sweep.py - Unit Tests for threshold settings and sweeps.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from plip.modules.preparation import PDBComplex
+from plip.modules.sweep import read_grid, loosest, sweep, interaction_counts
+from plip.modules import config
+
+
+class SweepTest(unittest.TestCase):
+    """Checks that sweeps give the same interactions as separate runs with each setting."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_settings(self):
+        """Settings are independent of each other and of later changes to the config module."""
+        strict = config.Settings(hbond_dist_max=3.5)
+        self.assertEqual(strict.HBOND_DIST_MAX, 3.5)
+        self.assertEqual(strict.replace(HYDROPH_DIST_MAX=3.0).HBOND_DIST_MAX, 3.5)
+        self.assertEqual(config.Settings().HBOND_DIST_MAX, config.HBOND_DIST_MAX)
+        self.assertRaises(ValueError, config.Settings, hbond_distance=3.5)
+
+    def test_grid(self):
+        """Grids give all combinations, the loosest settings cover all of them."""
+        path = os.path.join(self.tmpdir, 'grid.json')
+        with open(path, 'w') as f:
+            json.dump({'hbond_dist_max': [3.5, 4.1], 'halogen_acc_angle': [110, 130], 'halogen_angle_dev': [20]}, f)
+        settings = read_grid(path)
+        self.assertEqual(len(settings), 4)
+        loose = loosest(settings)
+        self.assertEqual(loose.HBOND_DIST_MAX, 4.1)
+        self.assertTrue(loose.HALOGEN_ACC_ANGLE - loose.HALOGEN_ANGLE_DEV <= 90)
+        self.assertTrue(loose.HALOGEN_ACC_ANGLE + loose.HALOGEN_ANGLE_DEV >= 150)
+        self.assertRaises(ValueError, loosest, [config.Settings(aromatic_planarity=5.0), config.Settings()])
+        self.assertRaises(ValueError, loosest, [config.Settings(bs_dist=8.0), config.Settings()])
+
+    def test_same_as_separate_runs(self):
+        """Filtered interactions are identical to those of a full analysis with the respective settings."""
+        settings = [config.Settings(hydroph_dist_max=3.6, hbond_dist_max=3.5, hbond_don_angle_min=120),
+                    config.Settings(), config.Settings(pistack_dist_max=6.0, pistack_ang_dev=20,
+                                                       saltbridge_dist_max=4.5, water_bridge_maxdist=3.6)]
+        for pdbid in ['1vsn', '1eve', '2reg']:
+            mol = PDBComplex(loosest(settings))
+            mol.load_pdb('./pdb/%s.pdb' % pdbid)
+            for s, result in zip(settings, sweep(mol, settings)):
+                reference = PDBComplex(s)
+                reference.load_pdb('./pdb/%s.pdb' % pdbid)
+                for site, pli in reference.interaction_sets.items():
+                    self.assertEqual(interaction_counts(result.interaction_sets[site]), interaction_counts(pli))
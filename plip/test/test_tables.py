@@ -0,0 +1,68 @@
+# coding=utf-8
+"""
+Protein-Ligand Interaction Profiler - Analyze and visualize protein-ligand interactions in PDB files.
+test_tables.py - Unit Tests for columnar interaction tables.
+Copyright 2014 Sebastian Salentin
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+import shutil
+import tempfile
+import unittest
+from plip.modules.preparation import PDBComplex
+from plip.modules.report import StructureReport, ReportWriter
+from plip.modules.tables import TableWriter, read_table, columns
+
+
+class TableWriterTest(unittest.TestCase):
+    """Checks that the interactions of several runs end up in typed columns."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.mol = PDBComplex()
+        self.mol.load_pdb('./pdb/1vsn.pdb')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, chunk_size):
+        tables = TableWriter(self.tmpdir, chunk_size=chunk_size, fmt='npz')
+        writer = ReportWriter('test', tables=tables)
+        for site in sorted(self.mol.interaction_sets):
+            writer.add_site(self.mol, site, self.mol.interaction_sets[site])
+        writer.finish(self.mol)
+        tables.close()
+
+    def test_append(self):
+        """Rows of several runs are appended, the columns have the types of the schema."""
+        self.write(chunk_size=2)
+        self.write(chunk_size=100)
+        hbonds = read_table(self.tmpdir, 'hydrogen_bonds')
+        output = StructureReport(self.mol, 'test').output(sorted(self.mol.interaction_sets)[0])
+        self.assertEqual(len(hbonds['pdbid']), 2 * len(output.hbond_info))
+        self.assertEqual(sorted(hbonds), sorted(name for name, _ in columns('hydrogen_bonds')))
+        self.assertEqual(hbonds['dist_d_a'].dtype.kind, 'f')
+        self.assertEqual(hbonds['resnr'].dtype.kind, 'i')
+        self.assertEqual(set(hbonds['pdbid']), {'1VSN'})
+        self.assertAlmostEqual(hbonds['dist_d_a'][0], output.hbond_info[0][5])
+
+    def test_failed_structure(self):
+        """Sites of structures which were not finished are not added."""
+        tables = TableWriter(self.tmpdir, fmt='npz')
+        writer = ReportWriter('test', tables=tables)
+        site = sorted(self.mol.interaction_sets)[0]
+        writer.add_site(self.mol, site, self.mol.interaction_sets[site])
+        tables.close()
+        self.assertEqual(len(read_table(self.tmpdir, 'hydrogen_bonds')['pdbid']), 0)